@@ -0,0 +1,224 @@
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+import base64
+import binascii
+import codecs
+from machine import RotorMachine
+
+# Text is encrypted (and armored) this many characters at a time
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# name -> (input bytes per block, output characters per block, encode, decode).
+# Whole blocks are converted as they arrive and the remainder is carried to
+# the next chunk, so a stream armors to exactly what its concatenation would.
+# hex and base64 are binascii's C codecs; the stdlib has no C base85, so it
+# uses base64.b85encode/b85decode, which still run well ahead of the machine.
+# Every decoder rejects characters outside its alphabet: binascii's base64
+# decoder would silently drop them, so b64decode validates first.
+ARMORS: Dict[str, Tuple[int, int, Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    'hex': (1, 2, binascii.b2a_hex, binascii.a2b_hex),
+    'base64': (3, 4, lambda data: binascii.b2a_base64(data, newline=False),
+               lambda text: base64.b64decode(text, validate=True)),
+    'base85': (4, 5, base64.b85encode, base64.b85decode),
+}
+
+_WHITESPACE = b' \t\r\n\v\f'
+
+
+def _codec(armor: str) -> Tuple[int, int, Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    try:
+        return ARMORS[armor]
+    except KeyError:
+        raise ValueError(f"Unknown armor {armor!r}; expected one of {', '.join(ARMORS)}")
+
+
+class ArmorEncoder:
+    """Incremental binary-to-text encoder for one of ARMORS."""
+
+    def __init__(self, armor: str = 'base64', line_length: Optional[int] = None):
+        """
+        Args:
+            armor: Name from ARMORS
+            line_length: Wrap the output at this many characters (None for one line)
+        """
+        self.armor = armor
+        self._block, _, self._encode, _ = _codec(armor)
+        if line_length is not None and line_length < 1:
+            raise ValueError("line_length must be a positive integer")
+        self.line_length = line_length
+        self._pending = b''
+        self._column = 0
+
+    def update(self, data: bytes) -> bytes:
+        """Encode the whole blocks available so far."""
+        if self._pending:
+            data = self._pending + data
+        whole = len(data) - len(data) % self._block
+        self._pending = data[whole:]
+        return self._wrap(self._encode(data[:whole])) if whole else b''
+
+    def finish(self) -> bytes:
+        """Encode the remainder (padded as the codec requires) and end the last line."""
+        text = self._wrap(self._encode(self._pending)) if self._pending else b''
+        self._pending = b''
+        if self.line_length is not None and self._column:
+            text += b'\n'
+            self._column = 0
+        return text
+
+    def _wrap(self, text: bytes) -> bytes:
+        if self.line_length is None:
+            return text
+        pieces = []
+        position = 0
+        while position < len(text):
+            if self._column == self.line_length:
+                pieces.append(b'\n')
+                self._column = 0
+            take = min(self.line_length - self._column, len(text) - position)
+            pieces.append(text[position:position + take])
+            position += take
+            self._column += take
+        return b''.join(pieces)
+
+
+class ArmorDecoder:
+    """Incremental decoder for ArmorEncoder's output; whitespace is ignored."""
+
+    def __init__(self, armor: str = 'base64'):
+        """
+        Args:
+            armor: Name from ARMORS
+        """
+        self.armor = armor
+        _, self._group, _, self._decode = _codec(armor)
+        self._pending = b''
+
+    def update(self, text: Union[str, bytes]) -> bytes:
+        """Decode the whole groups available so far."""
+        if isinstance(text, str):
+            text = text.encode('ascii')
+        text = self._pending + text.translate(None, _WHITESPACE)
+        whole = len(text) - len(text) % self._group
+        self._pending = text[whole:]
+        return self._convert(text[:whole]) if whole else b''
+
+    def finish(self) -> bytes:
+        """Decode the final, possibly short, group."""
+        text, self._pending = self._pending, b''
+        return self._convert(text) if text else b''
+
+    def _convert(self, text: bytes) -> bytes:
+        try:
+            return self._decode(text)
+        except (binascii.Error, ValueError) as e:
+            raise ValueError(f"Invalid {self.armor} armor: {e}")
+
+
+def armor_stream(chunks: Iterable[bytes], armor: str = 'base64',
+                 line_length: Optional[int] = None) -> Iterator[bytes]:
+    """Armor a stream of byte chunks."""
+    encoder = ArmorEncoder(armor, line_length)
+    for chunk in chunks:
+        text = encoder.update(chunk)
+        if text:
+            yield text
+    text = encoder.finish()
+    if text:
+        yield text
+
+
+def unarmor_stream(chunks: Iterable[Union[str, bytes]], armor: str = 'base64') -> Iterator[bytes]:
+    """Decode a stream of armored chunks back to bytes."""
+    decoder = ArmorDecoder(armor)
+    for chunk in chunks:
+        data = decoder.update(chunk)
+        if data:
+            yield data
+    data = decoder.finish()
+    if data:
+        yield data
+
+
+def encrypt_text_stream(machine: RotorMachine, chunks: Iterable[str], armor: str = 'base64',
+                        line_length: Optional[int] = None) -> Iterator[str]:
+    """
+    Encrypt text as UTF-8 and armor the result, chunk by chunk.
+
+    Unlike RotorMachine.process_text, every character is encrypted (as its
+    UTF-8 bytes) and the output is printable. Characters split across chunks
+    are handled by the incremental UTF-8 encoder.
+
+    Args:
+        machine: The machine to encrypt with; its rotors advance as usual
+        chunks: Plaintext pieces
+        armor: Name from ARMORS
+        line_length: Wrap the armored output at this many characters
+    """
+    utf8 = codecs.getincrementalencoder('utf-8')()
+    encoder = ArmorEncoder(armor, line_length)
+    for chunk in chunks:
+        data = utf8.encode(chunk)
+        if data:
+            text = encoder.update(machine.process_bytes(data))
+            if text:
+                yield text.decode('ascii')
+    text = encoder.finish()
+    if text:
+        yield text.decode('ascii')
+
+
+def decrypt_text_stream(machine: RotorMachine, chunks: Iterable[Union[str, bytes]],
+                        armor: str = 'base64', errors: str = 'strict') -> Iterator[str]:
+    """
+    Reverse encrypt_text_stream: decode the armor, decrypt, decode UTF-8.
+
+    Args:
+        machine: The machine to decrypt with, at the encryption's start positions
+        chunks: Armored pieces, split anywhere
+        armor: Name from ARMORS
+        errors: UTF-8 error handling, e.g. 'replace' to survive a wrong key
+    """
+    utf8 = codecs.getincrementaldecoder('utf-8')(errors)
+    for data in unarmor_stream(chunks, armor):
+        text = utf8.decode(machine.process_bytes(data))
+        if text:
+            yield text
+    text = utf8.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def encrypt_text(machine: RotorMachine, text: str, armor: str = 'base64',
+                 line_length: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    """Encrypt a whole text as UTF-8 and return it armored."""
+    chunks = (text[i:i + chunk_size] for i in range(0, len(text), chunk_size))
+    return ''.join(encrypt_text_stream(machine, chunks, armor, line_length))
+
+
+def decrypt_text(machine: RotorMachine, armored: str, armor: str = 'base64',
+                 errors: str = 'strict', chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    """Decrypt the output of encrypt_text."""
+    chunks = (armored[i:i + chunk_size] for i in range(0, len(armored), chunk_size))
+    return ''.join(decrypt_text_stream(machine, chunks, armor, errors))
+
+
+if __name__ == "__main__":
+    import os
+    import time
+
+    def per_byte(function, data, repeats=5):
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            function(data)
+            best = min(best, time.perf_counter() - start)
+        return best / len(data) * 1e9
+
+    data = os.urandom(1 << 20)
+    machine = RotorMachine()
+    print(f"{'encrypt':>8s}: {per_byte(machine.process_bytes, data, 1):7.1f} ns/byte")
+    for name in ARMORS:
+        armored = b''.join(armor_stream([data], name))
+        encode = per_byte(lambda d: b''.join(armor_stream([d], name)), data)
+        decode = per_byte(lambda a: b''.join(unarmor_stream([a], name)), armored)
+        print(f"{name:>8s}: {encode:7.1f} ns/byte to armor, {decode:7.1f} ns/byte to decode")
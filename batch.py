@@ -0,0 +1,412 @@
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from machine import RotorMachine
+from stepping import SteppingStrategy
+
+# Files larger than this are split into segments that can run on different
+# workers
+DEFAULT_SEGMENT_SIZE = 4 << 20
+
+MANIFEST_NAME = 'manifest.jsonl'
+PART_SUFFIX = '.part'
+
+# Bytes of randomness in a generated per-file seed
+SEED_BYTES = 16
+
+
+class _FileJob:
+    """One file of a batch: where it goes, its key and its unfinished segments."""
+
+    def __init__(self, path: str, source: str, target: str, size: int, mtime_ns: int, key: dict):
+        self.path = path
+        self.source = source
+        self.target = target
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.key = key
+        self.lock = threading.Lock()
+        self.prepared = False
+        self.remaining = 0
+        self.seconds = 0.0
+        self.error: Optional[str] = None
+
+    @property
+    def part(self) -> str:
+        return self.target + PART_SUFFIX
+
+    def segments(self, segment_size: int) -> List[Tuple['_FileJob', int, int, List[int]]]:
+        """
+        Split the file into (job, offset, length, start positions) tasks;
+        empty files get one.
+
+        The start positions come from one walk over the file, so no worker
+        has to fast-forward from byte 0, which with some steppings costs
+        time linear in the offset.
+        """
+        cursor = RotorMachine.from_key(self.key)
+        tasks = []
+        for offset in range(0, self.size, segment_size):
+            length = min(segment_size, self.size - offset)
+            tasks.append((self, offset, length, cursor.get_rotor_positions()))
+            cursor.advance(length)
+        if not tasks:
+            tasks.append((self, 0, 0, cursor.get_rotor_positions()))
+        self.remaining = len(tasks)
+        return tasks
+
+    def prepare(self) -> None:
+        """Create the output's part file, full size, before its first segment is written."""
+        with self.lock:
+            if self.prepared:
+                return
+            os.makedirs(os.path.dirname(self.target), exist_ok=True)
+            with open(self.part, 'wb') as f:
+                f.truncate(self.size)
+            self.prepared = True
+
+
+class BatchRunner:
+    """
+    Encrypt (or decrypt) every file under a directory tree, each file with
+    its own key.
+
+    Files are split into segments of at most segment_size bytes, each
+    starting from the rotor positions at its offset.
+    Segments are dealt to one deque per worker, smallest files first; a
+    worker takes from the front of its own deque and, once that is empty,
+    steals from the back of the longest other one. Small files therefore
+    finish early on their owners, and the tail segments of large files are
+    spread over whichever workers run out of work first.
+
+    Each output is written to a part file and renamed into place when all its
+    segments are done, and only then appended (with its key) to the manifest.
+    A rerun skips the files the manifest lists as complete for the current
+    source size and mtime and redoes the rest. Since the manifest holds every
+    file's key, it is refused inside the target directory, next to the
+    ciphertexts, unless that is explicitly allowed.
+    """
+
+    def __init__(self, source_dir: str, target_dir: str, manifest_path: str,
+                 workers: Optional[int] = None,
+                 segment_size: int = DEFAULT_SEGMENT_SIZE, num_rotors: int = 3,
+                 stepping: Optional[SteppingStrategy] = None,
+                 master_seed: Optional[bytes] = None,
+                 keys: Optional[Dict[str, dict]] = None,
+                 allow_manifest_in_target: bool = False):
+        """
+        Args:
+            source_dir: Tree of files to process
+            target_dir: Where the outputs go, at the same relative paths
+            manifest_path: Manifest file, holding each finished file's key
+            workers: Worker processes (default: one per core)
+            segment_size: Largest piece of a file handled as one task
+            num_rotors: Rotors in each generated key
+            stepping: Stepping of each generated key (default: EnigmaStepping)
+            master_seed: Derive each file's seed from this and its relative
+                path instead of drawing it at random, so keys are reproducible
+            keys: Relative path -> key to use instead of generating keys,
+                e.g. load_manifest() of an earlier run, to decrypt its output
+            allow_manifest_in_target: Accept a manifest_path inside target_dir
+        """
+        if segment_size < 1:
+            raise ValueError("segment_size must be a positive integer")
+        self.source_dir = os.path.abspath(source_dir)
+        self.target_dir = os.path.abspath(target_dir)
+        if self.source_dir == self.target_dir:
+            raise ValueError("Source and target directories must differ")
+        self.manifest_path = os.path.abspath(manifest_path)
+        if not allow_manifest_in_target and _inside(self.manifest_path, self.target_dir):
+            raise ValueError("The manifest holds the keys and must not be inside the target "
+                             "directory (pass allow_manifest_in_target=True to override)")
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.segment_size = segment_size
+        self.num_rotors = num_rotors
+        self.stepping = stepping
+        self.master_seed = master_seed
+        self.keys = keys
+        self._lock = threading.Lock()
+
+    def key_for(self, path: str) -> Optional[dict]:
+        """The key a file is processed with, or None if keys were given and lack it."""
+        if self.keys is not None:
+            return self.keys.get(path)
+        if self.master_seed is not None:
+            seed = hmac.new(self.master_seed, path.encode(), hashlib.sha256).digest()[:SEED_BYTES]
+        else:
+            seed = secrets.token_bytes(SEED_BYTES)
+        return RotorMachine.seeded_key(seed, self.num_rotors, self.stepping)
+
+    def run(self, progress: Optional[Callable[[int, int, int, int], None]] = None) -> dict:
+        """
+        Process every file not already complete.
+
+        Args:
+            progress: Called from worker threads with (files done, files,
+                bytes done, bytes) after each file
+
+        Returns:
+            Report with file and byte counts, elapsed time, throughput,
+            steals, per-worker bytes, skipped files and failures
+        """
+        start = time.perf_counter()
+        os.makedirs(self.target_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        jobs, skipped, missing = self._plan()
+        jobs.sort(key=lambda job: job.size)
+        tasks = [job.segments(self.segment_size) for job in jobs]
+        workers = max(1, min(self.workers, sum(map(len, tasks))))
+        queues: List[Deque[Tuple[_FileJob, int, int, List[int]]]] = [deque() for _ in range(workers)]
+        for i, segments in enumerate(tasks):
+            queues[i % workers].extend(segments)
+
+        state = {
+            'files_total': len(jobs), 'bytes_total': sum(job.size for job in jobs),
+            'files_done': 0, 'bytes_done': 0, 'steals': 0,
+            'worker_bytes': [0] * workers, 'failed': {},
+        }
+        pool: Optional[Executor] = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            threads = [threading.Thread(target=self._work, args=(i, queues, pool, state, progress),
+                                        daemon=True) for i in range(workers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        elapsed = time.perf_counter() - start
+        return {
+            'files': state['files_done'],
+            'bytes': state['bytes_done'],
+            'seconds': elapsed,
+            'bytes_per_second': state['bytes_done'] / elapsed if elapsed > 0 else None,
+            'files_per_second': state['files_done'] / elapsed if elapsed > 0 else None,
+            'workers': workers,
+            'steals': state['steals'],
+            'worker_bytes': state['worker_bytes'],
+            'skipped': skipped,
+            'missing_keys': missing,
+            'failed': state['failed'],
+        }
+
+    def _plan(self) -> Tuple[List[_FileJob], int, List[str]]:
+        """Files still to do, the number already complete, and files without a key."""
+        done = load_manifest(self.manifest_path) if os.path.exists(self.manifest_path) else {}
+        jobs = []
+        skipped = 0
+        missing = []
+        # A manifest in the source tree belongs to the run that produced it
+        skip = (self.target_dir, self.manifest_path, os.path.join(self.source_dir, MANIFEST_NAME))
+        for path, source in _walk(self.source_dir, skip):
+            stat = os.stat(source)
+            target = os.path.join(self.target_dir, *path.split('/'))
+            entry = done.get(path)
+            if (entry is not None and entry['size'] == stat.st_size
+                    and entry['mtime_ns'] == stat.st_mtime_ns and os.path.exists(target)):
+                skipped += 1
+                continue
+            key = self.key_for(path)
+            if key is None:
+                missing.append(path)
+                continue
+            jobs.append(_FileJob(path, source, target, stat.st_size, stat.st_mtime_ns, key))
+        return jobs, skipped, missing
+
+    def _work(self, index: int, queues: List[Deque[Tuple[_FileJob, int, int, List[int]]]],
+              pool: Optional[Executor], state: dict,
+              progress: Optional[Callable[[int, int, int, int], None]]) -> None:
+        own = queues[index]
+        while True:
+            with self._lock:
+                if own:
+                    job, offset, length, positions = own.popleft()
+                else:
+                    victim = max(queues, key=len)
+                    if not victim:
+                        return
+                    job, offset, length, positions = victim.pop()
+                    state['steals'] += 1
+            seconds = 0.0
+            error = None
+            if job.error is None:
+                try:
+                    job.prepare()
+                    args = (job.key, positions, job.source, job.part, offset, length)
+                    if pool is None:
+                        seconds = _process_segment(*args)
+                    else:
+                        seconds = pool.submit(_process_segment, *args).result()
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+            with job.lock:
+                if error is not None and job.error is None:
+                    job.error = error
+                job.seconds += seconds
+                job.remaining -= 1
+                finished = job.remaining == 0
+            with self._lock:
+                if error is None:
+                    state['worker_bytes'][index] += length
+            if finished:
+                self._finish(job, state, progress)
+
+    def _finish(self, job: _FileJob, state: dict,
+                progress: Optional[Callable[[int, int, int, int], None]]) -> None:
+        """Move a completed output into place and record it in the manifest."""
+        if job.error is None:
+            try:
+                with open(job.part, 'r+b') as f:
+                    os.fsync(f.fileno())
+                os.replace(job.part, job.target)
+            except OSError as e:
+                job.error = f"{type(e).__name__}: {e}"
+        if job.error is not None:
+            try:
+                os.remove(job.part)
+            except OSError:
+                pass
+            with self._lock:
+                state['failed'][job.path] = job.error
+            return
+        entry = {'path': job.path, 'size': job.size, 'mtime_ns': job.mtime_ns,
+                 'key': job.key, 'seconds': job.seconds}
+        with self._lock:
+            with open(self.manifest_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            state['files_done'] += 1
+            state['bytes_done'] += job.size
+            counts = (state['files_done'], state['files_total'],
+                      state['bytes_done'], state['bytes_total'])
+        if progress is not None:
+            progress(*counts)
+
+
+def load_manifest(path: str) -> Dict[str, dict]:
+    """
+    Read a batch manifest into relative path -> entry (with its 'key').
+
+    A torn last line from a crash mid-append is ignored, and later entries
+    for a path override earlier ones.
+    """
+    entries = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and 'path' in entry:
+                entries[entry['path']] = entry
+    return entries
+
+
+def _inside(path: str, directory: str) -> bool:
+    """Whether path is directory or lies under it, following symlinks."""
+    path, directory = os.path.realpath(path), os.path.realpath(directory)
+    return os.path.commonpath([path, directory]) == directory
+
+
+def _walk(root: str, skip: Tuple[str, ...] = ()) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (relative path with '/' separators, full path) for the files under
+    root, leaving out the directories and files listed in skip.
+    """
+    for directory, subdirs, files in os.walk(root):
+        subdirs[:] = sorted(d for d in subdirs if os.path.join(directory, d) not in skip)
+        for name in sorted(files):
+            full = os.path.join(directory, name)
+            if full not in skip and os.path.isfile(full):
+                yield os.path.relpath(full, root).replace(os.sep, '/'), full
+
+
+# Worker-side machine for the last key seen, so the segments of one file
+# don't rebuild it (and its tables) each time
+_worker_key: Optional[dict] = None
+_worker_machine: Optional[RotorMachine] = None
+
+
+def _process_segment(key: dict, positions: List[int], source: str, part: str,
+                     offset: int, length: int) -> float:
+    """
+    Process length bytes of source at offset, starting from the given rotor
+    positions, into the part file; returns seconds taken.
+    """
+    global _worker_key, _worker_machine
+    start = time.perf_counter()
+    if key != _worker_key:
+        _worker_machine = RotorMachine.from_key(key)
+        _worker_key = key
+    if length:
+        with open(source, 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+        if len(data) != length:
+            raise ValueError("Source file shrank while it was being processed")
+        _worker_machine.set_rotor_positions(positions)
+        output = _worker_machine.process_bytes(data)
+        with open(part, 'r+b') as f:
+            f.seek(offset)
+            f.write(output)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Encrypt a directory tree with one key per file, resumably.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    encrypt = commands.add_parser('encrypt', help="Encrypt with fresh per-file keys")
+    encrypt.add_argument('--rotors', type=int, default=3)
+    encrypt.add_argument('--master-seed', help="Hex seed to derive per-file keys from")
+    decrypt = commands.add_parser('decrypt', help="Decrypt with the keys of an earlier run")
+    decrypt.add_argument('--keys', required=True, help="Manifest of the encrypting run")
+    for command in (encrypt, decrypt):
+        command.add_argument('source')
+        command.add_argument('target')
+        command.add_argument('--manifest', required=True,
+                             help="Where to record finished files and their keys; "
+                                  "keep it outside the target directory")
+        command.add_argument('--allow-manifest-in-target', action='store_true')
+        command.add_argument('--workers', type=int)
+        command.add_argument('--segment-size', type=int, default=DEFAULT_SEGMENT_SIZE)
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'encrypt':
+            runner = BatchRunner(args.source, args.target, args.manifest, args.workers,
+                                 args.segment_size, num_rotors=args.rotors,
+                                 master_seed=bytes.fromhex(args.master_seed) if args.master_seed else None,
+                                 allow_manifest_in_target=args.allow_manifest_in_target)
+        else:
+            keys = {path: entry['key'] for path, entry in load_manifest(args.keys).items()}
+            runner = BatchRunner(args.source, args.target, args.manifest, args.workers,
+                                 args.segment_size, keys=keys,
+                                 allow_manifest_in_target=args.allow_manifest_in_target)
+    except ValueError as e:
+        parser.error(str(e))
+
+    def show(files_done, files, bytes_done, total):
+        print(f"\r{files_done}/{files} files, {bytes_done / 1e6:.1f}/{total / 1e6:.1f} MB",
+              end='', flush=True)
+
+    report = runner.run(show)
+    print()
+    rate = report['bytes_per_second']
+    print(f"{report['files']} files, {report['bytes'] / 1e6:.1f} MB in {report['seconds']:.1f} s"
+          f" ({rate / 1e6 if rate else 0:.2f} MB/s), {report['skipped']} already done,"
+          f" {report['steals']} steals, {len(report['failed'])} failed")
+    for path, error in report['failed'].items():
+        print(f"  {path}: {error}")
@@ -0,0 +1,190 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import hashlib
+import json
+import mmap
+import os
+from rotor import Rotor, build_shift_tables
+from machine import RotorMachine
+from stepping import SteppingStrategy
+
+# Compiled rotor file layout: wiring | reverse wiring | forward | backward
+ROTOR_TABLE_SIZE = 256 + 256 + 65536 + 65536
+REFLECTOR_TABLE_SIZE = 256
+
+
+class RotorCatalog:
+    """
+    Named rotors, reflectors and machines backed by precompiled table files.
+
+    The source definitions live in a JSON file. Each rotor and reflector is
+    compiled once into a flat binary file holding its wiring, inverse wiring
+    and per-shift lookup tables, named after a hash of its definition so that
+    editing a definition invalidates the old tables. Table files are opened
+    read-only with mmap, so loading a machine copies nothing and processes
+    using the same catalog share the pages through the OS page cache.
+    """
+
+    def __init__(self, path: str, cache_dir: Optional[str] = None):
+        """
+        Open (or start) a catalog.
+
+        Args:
+            path: Path of the JSON source definitions
+            cache_dir: Directory for compiled tables (default: <path>.cache)
+        """
+        self.path = path
+        self.cache_dir = cache_dir if cache_dir is not None else path + ".cache"
+        self.rotors: Dict[str, dict] = {}
+        self.reflectors: Dict[str, dict] = {}
+        self.machines: Dict[str, dict] = {}
+        self._mapped: Dict[str, memoryview] = {}
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                source = json.load(f)
+            self.rotors = source.get('rotors', {})
+            self.reflectors = source.get('reflectors', {})
+            self.machines = source.get('machines', {})
+
+    def save(self) -> None:
+        """Write the source definitions back to disk."""
+        source = {'rotors': self.rotors, 'reflectors': self.reflectors,
+                  'machines': self.machines}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(source, f, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def add_rotor(self, name: str, wiring: Sequence[int], notches: Iterable[int]) -> None:
+        """Add or replace a named rotor definition."""
+        wiring = [int(v) % 256 for v in wiring]
+        if sorted(wiring) != list(range(256)):
+            raise ValueError("Rotor wiring must be a permutation of 0-255")
+        self.rotors[name] = {'wiring': wiring, 'notches': sorted({n % 256 for n in notches})}
+
+    def add_reflector(self, name: str, mapping: Sequence[int]) -> None:
+        """Add or replace a named reflector (an involutory permutation of 0-255)."""
+        mapping = [int(v) % 256 for v in mapping]
+        if len(mapping) != 256 or any(mapping[mapping[i]] != i for i in range(256)):
+            raise ValueError("Reflector must be an involution of 0-255")
+        self.reflectors[name] = {'mapping': mapping}
+
+    def add_machine(self, name: str, rotors: List[str], reflector: str) -> None:
+        """Add or replace a named machine made of catalog rotors (leftmost first)."""
+        for rotor_name in rotors:
+            if rotor_name not in self.rotors:
+                raise KeyError(f"Unknown rotor: {rotor_name}")
+        if reflector not in self.reflectors:
+            raise KeyError(f"Unknown reflector: {reflector}")
+        self.machines[name] = {'rotors': list(rotors), 'reflector': reflector}
+
+    def add_from_machine(self, name: str, machine: RotorMachine) -> None:
+        """Store an existing machine's rotors and reflector under a name."""
+        rotor_names = []
+        for i, rotor in enumerate(machine.rotors):
+            rotor_name = f"{name}.rotor{i}"
+            self.add_rotor(rotor_name, rotor.wiring, rotor.notches)
+            rotor_names.append(rotor_name)
+        self.add_reflector(f"{name}.reflector", [machine.reflector[i] for i in range(256)])
+        self.add_machine(name, rotor_names, f"{name}.reflector")
+
+    def load_rotor(self, name: str, position: int = 0, ring_setting: int = 0) -> Rotor:
+        """Create a rotor from its compiled tables."""
+        table = self._table('rotor', name, self.rotors[name])
+        forward = table[512:512 + 65536]
+        backward = table[512 + 65536:]
+        return Rotor(wiring=table[:256], position=position, ring_setting=ring_setting,
+                     notches=self.rotors[name]['notches'], reverse_wiring=table[256:512],
+                     shift_tables=(forward, backward))
+
+    def load_reflector(self, name: str) -> Dict[int, int]:
+        """Get a reflector mapping from its compiled table."""
+        return dict(enumerate(self._table('reflector', name, self.reflectors[name])))
+
+    def load_machine(self, name: str, positions: Optional[List[int]] = None,
+                     ring_settings: Optional[List[int]] = None,
+                     stepping: Optional[SteppingStrategy] = None) -> RotorMachine:
+        """
+        Build a machine from the catalog.
+
+        Args:
+            name: Machine name
+            positions: Optional initial rotor positions
+            ring_settings: Optional ring settings
+            stepping: Optional stepping strategy
+        """
+        definition = self.machines[name]
+        rotors = [self.load_rotor(rotor_name) for rotor_name in definition['rotors']]
+        machine = RotorMachine(stepping=stepping, rotors=rotors,
+                               reflector=self.load_reflector(definition['reflector']))
+        if positions is not None:
+            machine.set_rotor_positions(positions)
+        if ring_settings is not None:
+            machine.set_ring_settings(ring_settings)
+        return machine
+
+    def compile_all(self) -> None:
+        """Make sure every rotor and reflector has up-to-date compiled tables."""
+        for name, definition in self.rotors.items():
+            self._table('rotor', name, definition)
+        for name, definition in self.reflectors.items():
+            self._table('reflector', name, definition)
+
+    def _table(self, kind: str, name: str, definition: dict) -> memoryview:
+        """Get the mapped table for a definition, compiling it if stale or missing."""
+        digest = definition_hash(definition)
+        key = f"{kind}:{name}:{digest}"
+        table = self._mapped.get(key)
+        if table is not None:
+            return table
+
+        size = ROTOR_TABLE_SIZE if kind == 'rotor' else REFLECTOR_TABLE_SIZE
+        path = os.path.join(self.cache_dir, f"{kind}-{_safe_name(name)}-{digest[:16]}.tbl")
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            self._compile(kind, definition, path)
+            self._remove_stale(kind, name, path)
+
+        with open(path, 'rb') as f:
+            table = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        self._mapped[key] = table
+        return table
+
+    def _compile(self, kind: str, definition: dict, path: str) -> None:
+        """Write the compiled tables for a definition (atomically)."""
+        if kind == 'rotor':
+            wiring = definition['wiring']
+            reverse_wiring = [0] * 256
+            for i, val in enumerate(wiring):
+                reverse_wiring[val] = i
+            forward, backward = build_shift_tables(wiring, reverse_wiring)
+            data = bytes(wiring) + bytes(reverse_wiring) + forward + backward
+        else:
+            data = bytes(definition['mapping'])
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _remove_stale(self, kind: str, name: str, current: str) -> None:
+        """Delete table files left over from older versions of a definition."""
+        prefix = f"{kind}-{_safe_name(name)}-"
+        for entry in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, entry)
+            if entry.startswith(prefix) and entry.endswith(".tbl") and path != current:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def definition_hash(definition: dict) -> str:
+    """Hash of a source definition, used to invalidate compiled tables."""
+    canonical = json.dumps(definition, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _safe_name(name: str) -> str:
+    """Make a catalog name usable as part of a file name."""
+    return ''.join(c if c.isalnum() or c in '._' else '_' for c in name)
@@ -0,0 +1,207 @@
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import os
+import struct
+import zlib
+from machine import RotorMachine
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Chunk layout: magic | index | chunk count | rotor count | positions | length |
+# cipher CRC | header CRC | ciphertext. The header CRC covers everything before
+# it. Every chunk records how many the stream has, so a lost tail shows up.
+# There is no plaintext checksum: stored in the clear it would leak a
+# property of the plaintext to anyone holding the stream.
+MAGIC = b'RCK2'
+_FIXED = struct.Struct('>4sIIB')
+_TRAILER = struct.Struct('>II')
+_HEADER_CRC = struct.Struct('>I')
+
+
+class Chunk(NamedTuple):
+    index: int
+    count: int  # Number of chunks in the stream
+    positions: List[int]
+    ciphertext: bytes
+    cipher_crc: int
+    offset: int  # Byte offset of the chunk header in the stream
+
+
+class ChunkResult(NamedTuple):
+    index: int
+    count: int  # Number of chunks in the stream
+    ok: bool
+    data: Optional[bytes]  # Plaintext, or None if the chunk is damaged
+
+
+def pack_chunk(index: int, count: int, positions: List[int], ciphertext: bytes) -> bytes:
+    """Serialize one chunk with its start state and checksums."""
+    header = (_FIXED.pack(MAGIC, index, count, len(positions)) + bytes(positions)
+              + _TRAILER.pack(len(ciphertext), zlib.crc32(ciphertext)))
+    return header + _HEADER_CRC.pack(zlib.crc32(header)) + ciphertext
+
+
+def encrypt_chunked(machine: RotorMachine, data: bytes,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    workers: Optional[int] = None) -> bytes:
+    """
+    Encrypt data into self-describing chunks.
+
+    Each chunk records the rotor positions it starts from, so chunks can be
+    verified and decrypted independently and in parallel. The machine ends up
+    in the same state as after process_bytes(data).
+
+    Args:
+        machine: The machine to encrypt with
+        data: Plaintext
+        chunk_size: Plaintext bytes per chunk
+        workers: Worker processes (default: one per core)
+    """
+    # Empty input still gets one (empty) chunk, so an empty stream can only
+    # mean a truncated one
+    count = max(1, -(-len(data) // chunk_size))
+    parts = []
+    for index in range(count):
+        part = data[index * chunk_size:(index + 1) * chunk_size]
+        parts.append((index, count, machine.get_rotor_positions(), part))
+        machine.advance(len(part))
+
+    results = _map(machine, _encrypt_chunk, parts, workers)
+    return b''.join(results)
+
+
+def iter_chunks(stream: bytes) -> Iterator[Chunk]:
+    """
+    Parse chunks out of a chunked stream.
+
+    A chunk whose header is damaged is skipped by scanning forward to the
+    next magic marker, so one bad chunk doesn't hide the ones after it.
+    """
+    offset = 0
+    end = len(stream)
+    while offset < end:
+        chunk = _parse_chunk(stream, offset)
+        if chunk is None:
+            offset = stream.find(MAGIC, offset + 1)
+            if offset < 0:
+                return
+            continue
+        yield chunk
+        offset = chunk.offset + _header_size(len(chunk.positions)) + len(chunk.ciphertext)
+
+
+def verify_chunked(stream: bytes, workers: Optional[int] = None) -> List[Tuple[int, bool]]:
+    """
+    Check every chunk's ciphertext checksum, without needing the key.
+
+    Returns:
+        List of (chunk index, intact) pairs for the chunks that could be parsed
+    """
+    chunks = list(iter_chunks(stream))
+    checks = [(chunk.ciphertext, chunk.cipher_crc) for chunk in chunks]
+    intact = _map(None, _check_crc, checks, workers)
+    return [(chunk.index, ok) for chunk, ok in zip(chunks, intact)]
+
+
+def decrypt_chunks(machine: RotorMachine, stream: bytes,
+                   workers: Optional[int] = None) -> List[ChunkResult]:
+    """
+    Decrypt each chunk independently from its recorded start state.
+
+    The given machine supplies the key (wirings, ring settings, plugboard,
+    stepping) and is not modified. Chunks whose ciphertext fails its
+    checksum are reported with ok=False and no data.
+    """
+    chunks = list(iter_chunks(stream))
+    jobs = [(chunk.positions, chunk.ciphertext, chunk.cipher_crc) for chunk in chunks]
+    results = _map(machine, _decrypt_chunk, jobs, workers)
+    return [ChunkResult(chunk.index, chunk.count, data is not None, data)
+            for chunk, data in zip(chunks, results)]
+
+
+def decrypt_chunked(machine: RotorMachine, stream: bytes,
+                    workers: Optional[int] = None) -> Tuple[bytes, List[int]]:
+    """
+    Decrypt a chunked stream, recovering every intact chunk.
+
+    Returns:
+        The concatenated plaintext of the intact chunks, and the indices of
+        the missing or damaged chunks, including any lost off the end
+    """
+    results = decrypt_chunks(machine, stream, workers)
+    seen = {result.index for result in results if result.ok}
+    # Every header records the chunk count; with no parseable header at all,
+    # the stream had at least one chunk
+    total = max((result.count for result in results), default=1)
+    damaged = [index for index in range(total) if index not in seen]
+    data = b''.join(result.data for result in sorted(results, key=lambda r: r.index) if result.ok)
+    return data, damaged
+
+
+def _header_size(num_rotors: int) -> int:
+    return _FIXED.size + num_rotors + _TRAILER.size + _HEADER_CRC.size
+
+
+def _parse_chunk(stream: bytes, offset: int) -> Optional[Chunk]:
+    """Parse the chunk at offset, or return None if its header is damaged."""
+    if len(stream) - offset < _FIXED.size:
+        return None
+    magic, index, count, num_rotors = _FIXED.unpack_from(stream, offset)
+    header_size = _header_size(num_rotors)
+    if magic != MAGIC or num_rotors == 0 or index >= count or len(stream) - offset < header_size:
+        return None
+    crc_offset = offset + header_size - _HEADER_CRC.size
+    (header_crc,) = _HEADER_CRC.unpack_from(stream, crc_offset)
+    if zlib.crc32(stream[offset:crc_offset]) != header_crc:
+        return None
+
+    positions_offset = offset + _FIXED.size
+    positions = list(stream[positions_offset:positions_offset + num_rotors])
+    length, cipher_crc = _TRAILER.unpack_from(stream, positions_offset + num_rotors)
+    data_offset = offset + header_size
+    ciphertext = bytes(stream[data_offset:data_offset + length])
+    return Chunk(index, count, positions, ciphertext, cipher_crc, offset)
+
+
+# Worker side: the machine is sent to each process once, by the initializer
+
+_worker_machine: Optional[RotorMachine] = None
+
+
+def _init_worker(machine: Optional[RotorMachine]) -> None:
+    global _worker_machine
+    _worker_machine = machine
+
+
+def _map(machine: Optional[RotorMachine], func, jobs: list, workers: Optional[int]) -> list:
+    """Run func over jobs, in worker processes when more than one is useful."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(jobs))
+    if workers <= 1:
+        _init_worker(copy.deepcopy(machine))
+        try:
+            return [func(*job) for job in jobs]
+        finally:
+            _init_worker(None)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(machine,)) as pool:
+        return list(pool.map(func, *zip(*jobs)))
+
+
+def _encrypt_chunk(index: int, count: int, positions: List[int], plaintext: bytes) -> bytes:
+    _worker_machine.set_rotor_positions(positions)
+    ciphertext = _worker_machine.process_bytes(plaintext)
+    return pack_chunk(index, count, positions, ciphertext)
+
+
+def _check_crc(data: bytes, crc: int) -> bool:
+    return zlib.crc32(data) == crc
+
+
+def _decrypt_chunk(positions: List[int], ciphertext: bytes, cipher_crc: int) -> Optional[bytes]:
+    if zlib.crc32(ciphertext) != cipher_crc:
+        return None
+    _worker_machine.set_rotor_positions(positions)
+    return _worker_machine.process_bytes(ciphertext)
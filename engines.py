@@ -0,0 +1,437 @@
+from typing import Callable, Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import json
+import os
+import time
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+# Engines take a machine and a block of bytes, return the processed bytes and
+# leave the machine's rotors where a per-character run would have left them.
+Engine = Callable[..., bytes]
+
+# Inputs are split into parts of at least this many bytes per worker process
+MIN_PARALLEL_PART = 64 * 1024
+
+# Engines whose per-byte cost doesn't grow with the number of rotors
+FLAT_ENGINES = {'composite'}
+
+# Rough costs (seconds fixed, seconds per byte per pass) on a typical
+# desktop, used until the dispatcher is calibrated. The parallel engine is
+# left out, so it is never picked without calibration.
+DEFAULT_COSTS = {
+    'python': {'fixed': 1e-6, 'per_byte': 2e-7},
+    'table': {'fixed': 2e-5, 'per_byte': 1e-7},
+    'composite': {'fixed': 1e-5, 'per_byte': 1e-7},
+    'numpy': {'fixed': 3e-5, 'per_byte': 5e-8},
+}
+
+
+def encrypt_python(machine, data: bytes) -> bytes:
+    """Reference engine: one RotorMachine.encrypt call per byte."""
+    encrypt = machine.encrypt
+    return bytes([encrypt(byte) for byte in data])
+
+
+def encrypt_table(machine, data: bytes) -> bytes:
+    """
+    Table-driven engine.
+
+    Rotor positions come from the stepping strategy's bulk schedule, and each
+    rotor pass is a single lookup in its precompiled per-shift tables.
+    """
+    count = len(data)
+    if not count:
+        return b''
+    rotors = machine.rotors
+    n = len(rotors)
+    schedule = machine.step_schedule(count)
+    forward = [rotor.shift_tables()[0] for rotor in rotors]
+    backward = [rotor.shift_tables()[1] for rotor in rotors]
+    rings = [rotor.ring_setting for rotor in rotors]
+    right_to_left = list(range(n - 1, -1, -1))
+    left_to_right = list(range(n))
+    plugboard = machine.plugboard
+    reflector = machine.reflector
+
+    out = bytearray(count)
+    row = 0
+    for k, byte in enumerate(data):
+        bases = [((schedule[row + i] - rings[i]) % 256) << 8 for i in left_to_right]
+        result = plugboard[byte]
+        for i in right_to_left:
+            result = forward[i][bases[i] + result]
+        result = reflector[result]
+        for i in left_to_right:
+            result = backward[i][bases[i] + result]
+        out[k] = plugboard[result]
+        row += n
+
+    machine.set_rotor_positions(list(schedule[-n:]))
+    return bytes(out)
+
+
+def encrypt_composite(machine, data: bytes) -> bytes:
+    """
+    Composite-table engine: per-byte work independent of the rotor count.
+
+    Between carries only the rotor that steps on every character moves, so
+    all the other rotors, the plugboard and the reflector are folded into
+    the machine's cached composite tables and each byte costs five lookups.
+    Steps that may move another rotor (as reported by the stepping
+    strategy's quiet_steps) fall back to a full walk.
+    """
+    count = len(data)
+    if not count:
+        return b''
+    rotors = machine.rotors
+    n = len(rotors)
+    stepping = machine.stepping
+    fast = (stepping.every_char if stepping.every_char is not None else -1) % n
+    fast_forward, fast_backward = rotors[fast].shift_tables()
+    fast_ring = rotors[fast].ring_setting
+    positions = machine.get_rotor_positions()
+
+    out = bytearray(count)
+    k = 0
+    while k < count:
+        run = stepping.quiet_steps(positions, rotors, count - k)
+        if not run:
+            stepping.advance(positions, rotors)
+            out[k] = _walk(machine, data[k], positions)
+            k += 1
+            continue
+        outer_in, inner, outer_out = machine.composite_tables(positions, fast)
+        shift = (positions[fast] - fast_ring) % 256
+        for byte in data[k:k + run]:
+            shift = (shift + 1) & 255
+            base = shift << 8
+            out[k] = outer_out[fast_backward[base + inner[fast_forward[base + outer_in[byte]]]]]
+            k += 1
+        positions[fast] = (positions[fast] + run) % 256
+
+    machine.set_rotor_positions(positions)
+    return bytes(out)
+
+
+def _walk(machine, byte: int, positions: List[int]) -> int:
+    """Encrypt one byte at the given positions through every rotor."""
+    rotors = machine.rotors
+    bases = [((position - rotor.ring_setting) % 256) << 8
+             for rotor, position in zip(rotors, positions)]
+    result = machine.plugboard[byte]
+    for i in range(len(rotors) - 1, -1, -1):
+        result = rotors[i].shift_tables()[0][bases[i] + result]
+    result = machine.reflector[result]
+    for i in range(len(rotors)):
+        result = rotors[i].shift_tables()[1][bases[i] + result]
+    return machine.plugboard[result]
+
+
+def encrypt_numpy(machine, data: bytes) -> bytes:
+    """
+    Vectorized engine: every rotor pass is one gather over the whole block.
+
+    Requires NumPy.
+    """
+    if np is None:
+        raise RuntimeError("The numpy engine requires NumPy")
+    count = len(data)
+    if not count:
+        return b''
+    rotors = machine.rotors
+    n = len(rotors)
+    schedule = np.frombuffer(bytes(machine.step_schedule(count)), dtype=np.uint8).reshape(count, n)
+    rings = np.array([rotor.ring_setting for rotor in rotors], dtype=np.int64)
+    bases = ((schedule.astype(np.int64) - rings) % 256) << 8
+    plugboard = np.array(machine.plugboard, dtype=np.uint8)
+    reflector = np.array([machine.reflector[i] for i in range(256)], dtype=np.uint8)
+
+    result = plugboard[np.frombuffer(data, dtype=np.uint8)]
+    for i in range(n - 1, -1, -1):
+        table = np.frombuffer(rotors[i].shift_tables()[0], dtype=np.uint8)
+        result = table[bases[:, i] + result]
+    result = reflector[result]
+    for i in range(n):
+        table = np.frombuffer(rotors[i].shift_tables()[1], dtype=np.uint8)
+        result = table[bases[:, i] + result]
+    result = plugboard[result]
+
+    machine.set_rotor_positions([int(p) for p in schedule[-1]])
+    return result.tobytes()
+
+
+def encrypt_parallel(machine, data: bytes, workers: Optional[int] = None) -> bytes:
+    """
+    Multi-process engine.
+
+    The input is cut into one part per worker. Each worker gets a copy of the
+    machine fast-forwarded to the start of its part and runs the best
+    single-process engine on it; the machine ends up after the last part.
+    """
+    count = len(data)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, count // MIN_PARALLEL_PART))
+    if workers == 1:
+        return _best_single_engine(machine)(machine, data)
+
+    part_size = -(-count // workers)
+    parts = []
+    for start in range(0, count, part_size):
+        part = copy.deepcopy(machine)
+        parts.append((part, data[start:start + part_size]))
+        machine.advance(min(part_size, count - start))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_encrypt_part, *zip(*parts)))
+    return b''.join(results)
+
+
+def _encrypt_part(machine, data: bytes) -> bytes:
+    """Worker entry point for encrypt_parallel."""
+    return _best_single_engine(machine)(machine, data)
+
+
+def _best_single_engine(machine) -> Engine:
+    if np is not None:
+        return encrypt_numpy
+    return encrypt_composite if machine.stepping.has_quiet_runs else encrypt_table
+
+
+def passes(engine: str, num_rotors: int) -> int:
+    """Rotor traversals per byte in the cost model (one for flat engines)."""
+    return 1 if engine in FLAT_ENGINES else 2 * num_rotors + 1
+
+
+ENGINES: Dict[str, Engine] = {
+    'python': encrypt_python,
+    'table': encrypt_table,
+    'composite': encrypt_composite,
+    'numpy': encrypt_numpy,
+    'parallel': encrypt_parallel,
+}
+
+
+def available_engines() -> List[str]:
+    """Names of the engines usable in this environment."""
+    names = ['python', 'table', 'composite']
+    if np is not None:
+        names.append('numpy')
+    if (os.cpu_count() or 1) > 1:
+        names.append('parallel')
+    return names
+
+
+def calibration_path() -> str:
+    """Where calibration results are stored (override with ROTOR_MACHINE_CALIBRATION)."""
+    path = os.environ.get('ROTOR_MACHINE_CALIBRATION')
+    if path:
+        return path
+    return os.path.join(os.path.expanduser('~'), '.cache', 'rotor-machine', 'calibration.json')
+
+
+class EngineDispatcher:
+    """
+    Picks the engine for each bulk call from a simple cost model.
+
+    Every engine is modelled as a fixed overhead plus a per-byte, per-pass
+    cost, where a pass is one rotor traversal (two per rotor, plus the
+    reflector); engines in FLAT_ENGINES count a single pass whatever the
+    number of rotors.
+
+    Both figures come from calibration results persisted in a JSON file if
+    there are any for this core count and NumPy availability, and from the
+    static DEFAULT_COSTS otherwise. Calibration times the engines (starting
+    a process pool for the parallel one) and writes the file, so it only
+    runs when asked for: calibrate(), `python engines.py`, or auto_calibrate
+    (ROTOR_MACHINE_CALIBRATE=1), which calibrates on first use when nothing
+    is stored. The parallel engine's per-byte cost is the best
+    single-process cost divided by the number of cores.
+    """
+
+    def __init__(self, path: Optional[str] = None, auto_calibrate: Optional[bool] = None):
+        """
+        Args:
+            path: Calibration file (default: calibration_path())
+            auto_calibrate: Calibrate on first use if nothing is stored
+                (default: whether ROTOR_MACHINE_CALIBRATE is set to 1)
+        """
+        self.path = path if path is not None else calibration_path()
+        if auto_calibrate is None:
+            auto_calibrate = os.environ.get('ROTOR_MACHINE_CALIBRATE') == '1'
+        self.auto_calibrate = auto_calibrate
+        self.calibration: Optional[dict] = None
+        self.counts: Dict[str, int] = {}
+
+    def environment(self) -> dict:
+        return {'cpu_count': os.cpu_count() or 1, 'numpy': np is not None}
+
+    def load(self) -> Optional[dict]:
+        """Load persisted calibration results if they match this environment."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                calibration = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if calibration.get('environment') != self.environment():
+            return None
+        if not set(available_engines()) <= set(calibration.get('engines', {})):
+            return None
+        return calibration
+
+    def default_calibration(self) -> dict:
+        """The static cost model, in the same form as calibrate()'s results."""
+        return {'environment': self.environment(),
+                'engines': {name: dict(costs) for name, costs in DEFAULT_COSTS.items()}}
+
+    def calibrate(self, small: int = 64, large: int = 16 * 1024) -> dict:
+        """
+        Time each available engine on a small and a large input and persist
+        the fitted overhead and per-byte costs.
+        """
+        from machine import RotorMachine
+
+        machine = RotorMachine(num_rotors=3)
+        # Compile the tables up front so their one-off cost isn't measured
+        for rotor in machine.rotors:
+            rotor.shift_tables()
+        sizes = (small, large)
+        engines = {}
+        for name in available_engines():
+            if name == 'parallel':
+                continue
+            timings = [self._time(ENGINES[name], machine, size) for size in sizes]
+            engine_passes = passes(name, machine.num_rotors)
+            per_byte = max((timings[1] - timings[0]) / (large - small), 0.0) / engine_passes
+            fixed = max(timings[0] - per_byte * engine_passes * small, 0.0)
+            engines[name] = {'fixed': fixed, 'per_byte': per_byte}
+
+        if 'parallel' in available_engines():
+            # Process start-up dominates the parallel engine's fixed cost
+            start = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=2) as pool:
+                list(pool.map(_encrypt_part, [machine, machine], [b'', b'']))
+            fixed = time.perf_counter() - start
+            best = min((costs for name, costs in engines.items() if name not in FLAT_ENGINES),
+                       key=lambda e: e['per_byte'])
+            engines['parallel'] = {'fixed': fixed,
+                                   'per_byte': best['per_byte'] / self.environment()['cpu_count']}
+
+        calibration = {'environment': self.environment(), 'engines': engines}
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(calibration, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # Keep the in-memory results if the cache isn't writable
+        self.calibration = calibration
+        return calibration
+
+    @staticmethod
+    def _time(engine: Engine, machine, size: int, repeat: int = 3) -> float:
+        data = bytes(range(256)) * (size // 256) + bytes(range(size % 256))
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            engine(machine, data)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    def choose(self, size: int, num_rotors: int, quiet_runs: bool = True) -> str:
+        """
+        Name of the engine predicted to be fastest for this workload.
+
+        quiet_runs says whether the machine's stepping strategy has runs in
+        which a single rotor moves; without them the composite engine
+        degrades to a full walk per byte and isn't considered.
+        """
+        if self.calibration is None:
+            self.calibration = self.load()
+        if self.calibration is None:
+            self.calibration = self.calibrate() if self.auto_calibrate else self.default_calibration()
+        engines = self.calibration['engines']
+        candidates = [name for name in available_engines() if name in engines]
+        if size < 2 * MIN_PARALLEL_PART and 'parallel' in candidates:
+            candidates.remove('parallel')
+        if not quiet_runs:
+            candidates = [name for name in candidates if name not in FLAT_ENGINES]
+        return min(candidates, key=lambda name: engines[name]['fixed']
+                   + engines[name]['per_byte'] * passes(name, num_rotors) * size)
+
+    def run(self, machine, data: bytes, engine: Optional[str] = None) -> bytes:
+        """
+        Process data with the given engine, or the predicted fastest one.
+
+        The engine used is recorded in the machine's last_engine attribute
+        and counted in counts.
+        """
+        if engine is None:
+            engine = (self.choose(len(data), len(machine.rotors), machine.stepping.has_quiet_runs)
+                      if data else 'python')
+        elif engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine}")
+        result = ENGINES[engine](machine, data)
+        machine.last_engine = engine
+        self.counts[engine] = self.counts.get(engine, 0) + 1
+        return result
+
+
+_default_dispatcher: Optional[EngineDispatcher] = None
+
+
+def default_dispatcher() -> EngineDispatcher:
+    """The shared dispatcher used by RotorMachine bulk calls."""
+    global _default_dispatcher
+    if _default_dispatcher is None:
+        _default_dispatcher = EngineDispatcher()
+    return _default_dispatcher
+
+
+def benchmark(rotor_counts=(3, 4, 8, 16, 32), size: int = 64 * 1024,
+              engines: Optional[List[str]] = None) -> Dict[str, Dict[int, float]]:
+    """
+    Measure each engine's cost per byte for machines of different sizes.
+
+    Returns:
+        {engine: {num_rotors: seconds per byte}}
+    """
+    from machine import RotorMachine
+
+    if engines is None:
+        engines = [name for name in available_engines() if name not in ('python', 'parallel')]
+    results: Dict[str, Dict[int, float]] = {name: {} for name in engines}
+    for num_rotors in rotor_counts:
+        machine = RotorMachine(num_rotors=num_rotors)
+        for rotor in machine.rotors:
+            rotor.shift_tables()
+        for name in engines:
+            start_positions = machine.get_rotor_positions()
+            seconds = EngineDispatcher._time(ENGINES[name], machine, size)
+            machine.set_rotor_positions(start_positions)
+            results[name][num_rotors] = seconds / size
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    if '--bench' in sys.argv:
+        results = benchmark()
+        counts = sorted(next(iter(results.values())))
+        print("ns per byte  " + "".join(f"{n:>8d}" for n in counts) + "  rotors")
+        for name, timings in results.items():
+            print(f"  {name:10s}" + "".join(f"{timings[n] * 1e9:8.0f}" for n in counts))
+    else:
+        dispatcher = default_dispatcher()
+        results = dispatcher.calibrate()
+        print(f"Calibration saved to {dispatcher.path}")
+        for name, costs in results['engines'].items():
+            print(f"  {name:9s} fixed={costs['fixed'] * 1e6:9.1f} us  "
+                  f"per byte/pass={costs['per_byte'] * 1e9:8.2f} ns")
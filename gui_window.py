@@ -3,36 +3,73 @@ from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                            QGroupBox, QFrame, QScrollArea, QSizePolicy, QProgressBar,
                            QTextEdit, QDesktopWidget, QGridLayout, QGraphicsView,
                            QGraphicsScene, QGraphicsLineItem, QGraphicsSimpleTextItem,
-                           QGraphicsRectItem, QGraphicsEllipseItem, QGraphicsPathItem)
-from PyQt5.QtCore import Qt, QTimer, QSize, QPropertyAnimation, QEasingCurve, pyqtProperty, QPointF, QRectF, QLineF
-from PyQt5.QtGui import QFont, QPalette, QColor, QTextCursor, QPainter, QPen, QBrush, QPainterPath, QFontMetrics
+                           QGraphicsRectItem, QGraphicsEllipseItem, QGraphicsPathItem,
+                           QFileDialog, QMessageBox, QSlider, QComboBox)
+from PyQt5.QtCore import Qt, QTimer, QSize, QPropertyAnimation, QEasingCurve, pyqtProperty, pyqtSignal, QPointF, QRectF, QLineF
+from PyQt5.QtGui import QFont, QPalette, QColor, QTextCursor, QPainter, QPen, QBrush, QPainterPath, QFontMetrics, QPixmap
 from machine import RotorMachine, Rotor
+from hex_viewer import HexViewerWindow
+from startup_timing import startup_timer
+from live import LiveEncryptor, code_point_index, utf16_length
+from signal_trace import load_json
+from pipeline import ThreadedRunner
+from armor import encrypt_text_stream, decrypt_text_stream
 import random
 import math
+import os
 
 class RotorDisk(QFrame):
+    # Indicator dot centre for each position, computed once instead of per paint
+    INDICATOR_POINTS = [(60 + 40 * math.cos(math.radians(p * (360/256))),
+                         60 - 40 * math.sin(math.radians(p * (360/256)))) for p in range(256)]
+    
     def __init__(self, label, parent=None):
         super().__init__(parent)
         self.setFixedSize(120, 120)  # Slightly larger for better visibility
         self.position = 0
-        self.notch = 0
+        self.notches = [0]
         self.label = label
         self.highlight = False
+        self._static_layer = None
+        
+    @property
+    def notch(self):
+        return self.notches[0] if self.notches else None
         
     def set_position(self, position):
+        if position == self.position:
+            return
         self.position = position
         self.update()
         
     def set_notch(self, notch):
-        self.notch = notch
+        self.set_notches([] if notch is None else [notch])
+        
+    def set_notches(self, notches):
+        notches = list(notches)
+        if notches == self.notches:
+            return
+        self.notches = notches
+        self._static_layer = None
         self.update()
         
     def set_highlight(self, highlight):
+        if highlight == self.highlight:
+            return
         self.highlight = highlight
         self.update()
         
-    def paintEvent(self, event):
-        painter = QPainter(self)
+    def resizeEvent(self, event):
+        self._static_layer = None
+        super().resizeEvent(event)
+        
+    def _build_static_layer(self, ratio):
+        """Render the parts that don't move with the rotor: ring, notches, ticks and label."""
+        pixmap = QPixmap(int(self.width() * ratio), int(self.height() * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        
+        painter = QPainter(pixmap)
         painter.setRenderHint(QPainter.Antialiasing)
         
         # Draw outer circle
@@ -41,49 +78,55 @@ class RotorDisk(QFrame):
         painter.setBrush(QColor("#2b2b2b"))
         painter.drawEllipse(10, 10, 100, 100)
         
-        # Draw position indicator
-        if self.highlight:
-            painter.setBrush(QColor("#ff4a4a"))
-        else:
-            painter.setBrush(QColor("#4a9cff"))
-            
-        # Calculate angle (360/256 = 1.40625 degrees per step)
-        angle_deg = self.position * (360/256)
-        angle_rad = math.radians(angle_deg)
-        x = 60 + 40 * math.cos(angle_rad)
-        y = 60 - 40 * math.sin(angle_rad)
-        painter.drawEllipse(int(x) - 5, int(y) - 5, 10, 10)
-        
-        # Draw notch position
-        if self.notch is not None:
-            notch_angle_deg = self.notch * (360/256)
-            notch_angle_rad = math.radians(notch_angle_deg)
+        # Draw notch positions
+        pen = QPen(QColor("#ff8c00"), 3)
+        painter.setPen(pen)
+        for notch in self.notches:
+            notch_angle_rad = math.radians(notch * (360/256))
             x1 = 60 + 50 * math.cos(notch_angle_rad)
             y1 = 60 - 50 * math.sin(notch_angle_rad)
             x2 = 60 + 60 * math.cos(notch_angle_rad)
             y2 = 60 - 60 * math.sin(notch_angle_rad)
-            
-            pen = QPen(QColor("#ff8c00"), 3)
-            painter.setPen(pen)
             painter.drawLine(int(x1), int(y1), int(x2), int(y2))
         
         # Draw tick marks for every 32 positions (8 major ticks)
         pen = QPen(QColor("#4a9cff"), 1)
         painter.setPen(pen)
         for i in range(0, 256, 32):
-            angle_deg = i * (360/256)
-            angle_rad = math.radians(angle_deg)
+            angle_rad = math.radians(i * (360/256))
             x1 = 60 + 45 * math.cos(angle_rad)
             y1 = 60 - 45 * math.sin(angle_rad)
             x2 = 60 + 50 * math.cos(angle_rad)
             y2 = 60 - 50 * math.sin(angle_rad)
             painter.drawLine(int(x1), int(y1), int(x2), int(y2))
         
-        # Draw label and position
+        # Draw label
         painter.setPen(QColor("#ffffff"))
         painter.drawText(0, 0, 120, 120, Qt.AlignCenter, self.label)
+        painter.end()
+        return pixmap
+        
+    def paintEvent(self, event):
+        # Rebuild the cached layer after a resize, notch change or DPI change
+        ratio = self.devicePixelRatioF()
+        if self._static_layer is None or self._static_layer.devicePixelRatio() != ratio:
+            self._static_layer = self._build_static_layer(ratio)
+        
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self._static_layer)
+        painter.setRenderHint(QPainter.Antialiasing)
+        
+        # Draw position indicator
+        painter.setPen(QPen(QColor("#4a9cff"), 2))
+        if self.highlight:
+            painter.setBrush(QColor("#ff4a4a"))
+        else:
+            painter.setBrush(QColor("#4a9cff"))
+        x, y = self.INDICATOR_POINTS[self.position % 256]
+        painter.drawEllipse(int(x) - 5, int(y) - 5, 10, 10)
         
         # Draw position value in hex
+        painter.setPen(QColor("#ffffff"))
         painter.setFont(QFont("Courier New", 10, QFont.Bold))
         painter.drawText(0, 100, 120, 20, Qt.AlignCenter, f"{self.position:02X}")
 
@@ -197,6 +240,10 @@ class RotorDisplay(QFrame):
         """Update the position display with animation."""
         if not hasattr(self, 'position_display'):
             return
+        # Skip relayout of the labels when nothing changed
+        if position == getattr(self, '_shown_position', None):
+            return
+        self._shown_position = position
             
         # Update the position display with both hex and decimal
         hex_val = f"{position:02X}"
@@ -213,6 +260,10 @@ class RotorDisplay(QFrame):
         """Update the notch position."""
         self.rotor_disk.set_notch(notch)
         
+    def set_notches(self, notches) -> None:
+        """Update the notch positions."""
+        self.rotor_disk.set_notches(notches)
+        
     def set_highlight(self, highlight: bool) -> None:
         """Set highlight state for the rotor."""
         self.rotor_disk.set_highlight(highlight)
@@ -290,6 +341,105 @@ class ASCIIViewer(QFrame):
                 self.cells[row][col].style().unpolish(self.cells[row][col])
                 self.cells[row][col].style().polish(self.cells[row][col])
 
+class PerformanceDashboard(QFrame):
+    """
+    Live performance figures for a machine, sampled from its stats on a timer.
+    
+    Rates are computed from the difference between two samples, so nothing
+    is measured per byte and the panel costs nothing while hidden.
+    """
+    SAMPLE_MS = 500
+    
+    def __init__(self, machine, parent=None):
+        super().__init__(parent)
+        self.machine = machine
+        self.setStyleSheet("""
+            QFrame {
+                background-color: #2b2b2b;
+                border: 1px solid #4a9cff;
+                border-radius: 4px;
+            }
+            QLabel {
+                border: none;
+                color: #ffffff;
+                font-family: 'Courier New', monospace;
+                font-size: 11px;
+            }
+        """)
+        
+        self.layout = QGridLayout(self)
+        self.layout.setContentsMargins(8, 4, 8, 4)
+        self.layout.setSpacing(2)
+        self.values = {}
+        rows = [("throughput", "Throughput"), ("latency", "Chunk latency"),
+                ("steps", "Rotor steps/s"), ("carries", "Carries/s"),
+                ("engine", "Engine"), ("cache", "Cache hit rate")]
+        for row, (key, title) in enumerate(rows):
+            name = QLabel(title)
+            name.setStyleSheet("color: #4a9cff; font-weight: bold;")
+            value = QLabel("-")
+            self.layout.addWidget(name, row, 0)
+            self.layout.addWidget(value, row, 1)
+            self.values[key] = value
+        
+        self._previous = None
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.SAMPLE_MS)
+        self.timer.timeout.connect(self.sample)
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._previous = self.machine.stats.snapshot()
+        self.timer.start()
+    
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+    
+    def sample(self):
+        """Refresh the figures from a new stats snapshot."""
+        current = self.machine.stats.snapshot()
+        previous = self._previous or current
+        self._previous = current
+        interval = max(current['time'] - previous['time'], 1e-9)
+        
+        byte_rate = (current['bytes'] - previous['bytes']) / interval
+        self.values["throughput"].setText(_format_rate(byte_rate, "B/s"))
+        
+        latency = current['latency']
+        if latency['p50'] is None:
+            self.values["latency"].setText("-")
+        else:
+            self.values["latency"].setText(
+                "p50 {:.2f} / p90 {:.2f} / p99 {:.2f} ms".format(
+                    latency['p50'] * 1000, latency['p90'] * 1000, latency['p99'] * 1000))
+        
+        before = previous['rotor_steps'] or [0] * len(current['rotor_steps'])
+        if len(before) != len(current['rotor_steps']):
+            before = [0] * len(current['rotor_steps'])
+        step_rates = [(a - b) / interval for a, b in zip(current['rotor_steps'], before)]
+        self.values["steps"].setText(" ".join(_format_rate(rate, "") for rate in step_rates) or "-")
+        # Every step of a rotor that doesn't move on every character is a carry
+        every_char = self.machine.stepping.every_char
+        carry_rates = [rate for i, rate in enumerate(step_rates)
+                       if every_char is None or i != every_char % len(step_rates)]
+        self.values["carries"].setText(_format_rate(sum(carry_rates), "/s"))
+        
+        self.values["engine"].setText(current['last_engine'] or "-")
+        lookups = current['cache_hits'] + current['cache_misses']
+        if lookups:
+            self.values["cache"].setText(f"{current['cache_hits'] / lookups:.1%} of {lookups}")
+        else:
+            self.values["cache"].setText("-")
+
+
+def _format_rate(value, unit):
+    """Format a rate with a k/M/G prefix."""
+    for prefix, scale in (("G", 1e9), ("M", 1e6), ("k", 1e3)):
+        if value >= scale:
+            return f"{value / scale:.1f} {prefix}{unit}"
+    return f"{value:.0f} {unit}".rstrip()
+
 class RotorVisualization(QGraphicsView):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -315,6 +465,11 @@ class RotorVisualization(QGraphicsView):
         self.animation_step = 0
         self.animation_path = []
         self.animation_timer = None
+        
+        # Trace replay
+        self.replay_records = []
+        self.replay_index = 0
+        self.replay_timer = None
     
     def init_components(self):
         # Clear existing items
@@ -618,32 +773,176 @@ class RotorVisualization(QGraphicsView):
             self.current_path = None
         self.animation_step = 0
         self.animation_path = []
+    
+    @staticmethod
+    def contact_y(value):
+        """Y coordinate of the contact a byte value falls on (16 values per contact)."""
+        return 170 + (value // 16) * 25
+    
+    def show_state(self, char, positions, path):
+        """
+        Show a recorded machine state: rotor positions and the real signal path.
+        
+        Args:
+            char: Input byte
+            positions: Rotor positions, leftmost rotor first
+            path: Values from RotorMachine.signal_path()
+        """
+        self.reset_animation()
+        n = len(positions)
+        boxes = min(n, len(self.rotor_boxes))
+        
+        # The rightmost rotor is the first the signal enters, nearest the input
+        for i in range(boxes):
+            rotor_index = n - 1 - i
+            self.rotor_labels[i].setPlainText(f"Rotor {rotor_index + 1}")
+            self.rotor_positions[i].setPlainText(f"{positions[rotor_index]:02X}")
+        
+        output = path[-1]
+        self.input_char.setPlainText(chr(char) if 32 <= char <= 126 else f"{char:02X}")
+        self.output_char.setPlainText(chr(output) if 32 <= output <= 126 else f"{output:02X}")
+        
+        y = self.contact_y
+        points = [(134, y(path[0]))]
+        for i in range(boxes):
+            x = 150 + i * 250
+            points += [(x, y(path[i])), (x + 100, y(path[i + 1]))]
+        points += [(900, y(path[n])), (900, y(path[n + 1]))]
+        # Offset the return leg a little so it doesn't hide the way in
+        for i in reversed(range(boxes)):
+            x = 150 + i * 250
+            j = n - 1 - i
+            points += [(x + 100, y(path[n + 1 + j]) + 5), (x, y(path[n + 2 + j]) + 5)]
+        points.append((134, y(output) + 5))
+        
+        painter_path = QPainterPath()
+        painter_path.moveTo(*points[0])
+        for point in points[1:]:
+            painter_path.lineTo(*point)
+        self.current_path = QGraphicsPathItem(painter_path)
+        self.current_path.setPen(QPen(self.highlight_color, 2))
+        self.scene.addItem(self.current_path)
+
+    def replay_trace(self, records, interval_ms=400):
+        """
+        Step through captured trace records (signal_trace.TraceRecord), one
+        every interval_ms, showing each with show_state().
+        """
+        self.stop_replay()
+        self.replay_records = list(records)
+        self.replay_index = 0
+        if not self.replay_records:
+            return
+        self.replay_timer = QTimer(self)
+        self.replay_timer.setInterval(interval_ms)
+        self.replay_timer.timeout.connect(self.replay_next)
+        self.replay_next()
+        self.replay_timer.start()
+
+    def replay_next(self):
+        if self.replay_index >= len(self.replay_records):
+            self.stop_replay()
+            return
+        record = self.replay_records[self.replay_index]
+        self.show_state(record.char, record.positions, record.path)
+        self.replay_index += 1
+
+    def stop_replay(self):
+        if self.replay_timer is not None:
+            self.replay_timer.stop()
+            self.replay_timer = None
+
+
+class LazyPanel(QWidget):
+    """
+    Placeholder for an expensive panel, which is only built when build() is called.
+    
+    The placeholder reserves the panel's size so the layout doesn't jump when
+    the real widget arrives.
+    """
+    built = pyqtSignal(object)
+    
+    def __init__(self, factory, name, size=None, parent=None):
+        super().__init__(parent)
+        self.factory = factory
+        self.name = name
+        self.widget = None
+        self._layout = QVBoxLayout(self)
+        self._layout.setContentsMargins(0, 0, 0, 0)
+        if size is not None:
+            self.setMinimumSize(size)
+    
+    def build(self):
+        """Create the real widget (once) and return it."""
+        if self.widget is None:
+            with startup_timer.phase(f"panel: {self.name}"):
+                self.widget = self.factory()
+                self._layout.addWidget(self.widget)
+            self.built.emit(self.widget)
+        return self.widget
 
 
 class RotorMachineGUI(QMainWindow):
+    # Emitted once every deferred panel has been built
+    panels_ready = pyqtSignal()
+    
     def __init__(self):
         super().__init__()
         self.setWindowTitle("256-Character Rotor Machine")
         self.setStyleSheet("background-color: #1e1e1e; color: #ffffff;")
         
         # Initialize the rotor machine
-        self.machine = RotorMachine(num_rotors=3)
+        with startup_timer.phase("machine construction"):
+            self.machine = RotorMachine(num_rotors=3)
         self.rotor_displays = []
         self.is_processing = False
+        self.live = None  # LiveEncryptor while live-typing mode is on
+        self._panels_scheduled = False
         
         # Set up the UI
-        self.init_ui()
-        
-        # Connect signals
-        self.connect_signals()
-        
-        # Initialize rotors
-        self.update_rotor_displays()
+        with startup_timer.phase("main window UI"):
+            self.init_ui()
+            
+            # Connect signals
+            self.connect_signals()
+            
+            # Initialize rotors
+            self.update_rotor_displays()
         
         # Set window size and position
         self.resize(1200, 800)
         self.center()
     
+    @property
+    def ascii_viewer(self):
+        """The ASCII viewer, or None until its panel has been built."""
+        return self.ascii_panel.widget
+    
+    @property
+    def visualization(self):
+        """The rotor visualization, or None until its panel has been built."""
+        return self.visualization_panel.widget
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        # Build the heavy panels in idle steps once the first frame is up
+        if not self._panels_scheduled:
+            self._panels_scheduled = True
+            QTimer.singleShot(0, self._first_frame_done)
+    
+    def _first_frame_done(self):
+        startup_timer.mark("first frame (interactive)")
+        self.build_next_panel()
+    
+    def build_next_panel(self):
+        """Build one deferred panel, then yield to the event loop before the next."""
+        for panel in (self.ascii_panel, self.visualization_panel):
+            if panel.widget is None:
+                panel.build()
+                QTimer.singleShot(0, self.build_next_panel)
+                return
+        self.panels_ready.emit()
+    
     def center(self):
         """Center the window on the screen."""
         frame_geometry = self.frameGeometry()
@@ -679,9 +978,12 @@ class RotorMachineGUI(QMainWindow):
         self.encrypt_btn = QPushButton("Encrypt")
         self.decrypt_btn = QPushButton("Decrypt")
         self.clear_btn = QPushButton("Clear")
+        self.live_btn = QPushButton("Live")
+        self.live_btn.setCheckable(True)
+        self.live_btn.setToolTip("Update the output as you type")
         
         for btn in [self.randomize_btn, self.reset_btn, self.encrypt_btn, 
-                   self.decrypt_btn, self.clear_btn]:
+                   self.decrypt_btn, self.clear_btn, self.live_btn]:
             btn.setStyleSheet("""
                 QPushButton {
                     background-color: #3a3a3a;
@@ -694,14 +996,64 @@ class RotorMachineGUI(QMainWindow):
                 QPushButton:hover {
                     background-color: #4a4a4a;
                 }
-                QPushButton:pressed {
+                QPushButton:pressed, QPushButton:checked {
                     background-color: #5a5a5a;
                 }
             """)
             btn_layout.addWidget(btn)
         
+        # Output format: raw bytes as latin-1 characters (the default, as
+        # before), or the text's UTF-8 bytes encrypted and armored so the
+        # output stays printable
+        self.armor_combo = QComboBox()
+        for label, armor in [("Raw", None), ("UTF-8 + hex", 'hex'),
+                             ("UTF-8 + base64", 'base64'), ("UTF-8 + base85", 'base85')]:
+            self.armor_combo.addItem(label, armor)
+        self.armor_combo.setToolTip("Output format for Encrypt (and input format for Decrypt)")
+        btn_layout.addWidget(self.armor_combo)
+        
         left_panel.addLayout(btn_layout)
         
+        # Large-file controls: files are streamed through the machine and
+        # browsed in a hex viewer instead of being loaded into the text areas
+        file_btn_layout = QHBoxLayout()
+        self.encrypt_file_btn = QPushButton("Encrypt File...")
+        self.view_file_btn = QPushButton("View File...")
+        self.replay_trace_btn = QPushButton("Replay Trace...")
+        for btn in [self.encrypt_file_btn, self.view_file_btn, self.replay_trace_btn]:
+            btn.setStyleSheet("""
+                QPushButton {
+                    background-color: #3a3a3a;
+                    color: white;
+                    border: 1px solid #555;
+                    border-radius: 4px;
+                    padding: 5px 10px;
+                    margin: 2px;
+                }
+                QPushButton:hover {
+                    background-color: #4a4a4a;
+                }
+                QPushButton:pressed {
+                    background-color: #5a5a5a;
+                }
+            """)
+            file_btn_layout.addWidget(btn)
+        
+        self.stats_btn = QPushButton("Stats")
+        self.stats_btn.setCheckable(True)
+        self.stats_btn.setStyleSheet(self.encrypt_file_btn.styleSheet())
+        file_btn_layout.addWidget(self.stats_btn)
+        
+        self.progress = QProgressBar()
+        self.progress.setRange(0, 100)
+        self.progress.setValue(0)
+        self.progress.setTextVisible(False)
+        self.progress.setMaximumHeight(8)
+        file_btn_layout.addWidget(self.progress, 1)
+        
+        left_panel.addLayout(file_btn_layout)
+        self.hex_windows = []
+        
         # Text areas
         text_layout = QHBoxLayout()
         
@@ -747,16 +1099,32 @@ class RotorMachineGUI(QMainWindow):
         
         left_panel.addLayout(text_layout, 1)
         
-        # Add ASCII viewer to the right
-        self.ascii_viewer = ASCIIViewer()
-        
-        # Add visualization
-        self.visualization = RotorVisualization()
+        # Timeline over the last Encrypt/Decrypt run
+        timeline_layout = QHBoxLayout()
+        self.timeline_slider = QSlider(Qt.Horizontal)
+        self.timeline_slider.setEnabled(False)
+        self.timeline_label = QLabel("Timeline: -")
+        self.timeline_label.setMinimumWidth(200)
+        timeline_layout.addWidget(self.timeline_slider, 1)
+        timeline_layout.addWidget(self.timeline_label)
+        left_panel.addLayout(timeline_layout)
+        self.timeline_log = None
+        
+        # Optional performance panel, created the first time it is shown
+        self.dashboard = None
+        self.dashboard_layout = QVBoxLayout()
+        left_panel.addLayout(self.dashboard_layout)
+        
+        # ASCII viewer and visualization hold hundreds of widgets and scene
+        # items, so they are created after the first frame (see showEvent)
+        self.ascii_panel = LazyPanel(ASCIIViewer, "ASCII viewer")
+        self.ascii_panel.built.connect(lambda _: self.update_rotor_displays())
+        self.visualization_panel = LazyPanel(RotorVisualization, "visualization", QSize(1000, 700))
         
         # Add everything to main layout
         main_layout.addLayout(left_panel, 3)
-        main_layout.addWidget(self.ascii_viewer, 2)
-        main_layout.addWidget(self.visualization, 2)
+        main_layout.addWidget(self.ascii_panel, 2)
+        main_layout.addWidget(self.visualization_panel, 2)
     
     def update_rotor_displays(self):
         """Update all rotor displays with current positions."""
@@ -765,11 +1133,12 @@ class RotorMachineGUI(QMainWindow):
             if i < len(self.machine.rotors):
                 rotor = self.machine.rotors[i]
                 display.set_position(rotor.position)
-                display.set_notch(rotor.notch)
+                display.set_notches(rotor.notches)
                 positions.append(rotor.position)
         
         # Update ASCII viewer highlights
-        self.ascii_viewer.highlight_positions(positions)
+        if self.ascii_viewer is not None:
+            self.ascii_viewer.highlight_positions(positions)
     
     def connect_signals(self):
         """Connect all UI signals to their respective slots."""
@@ -786,6 +1155,12 @@ class RotorMachineGUI(QMainWindow):
         self.encrypt_btn.clicked.connect(self.encrypt_text)
         self.decrypt_btn.clicked.connect(self.decrypt_text)
         self.clear_btn.clicked.connect(self.clear_text)
+        self.encrypt_file_btn.clicked.connect(self.process_file)
+        self.view_file_btn.clicked.connect(self.view_file)
+        self.replay_trace_btn.clicked.connect(self.replay_trace)
+        self.live_btn.toggled.connect(self.set_live_mode)
+        self.stats_btn.toggled.connect(self.show_dashboard)
+        self.timeline_slider.valueChanged.connect(self.scrub_timeline)
     
     def adjust_rotor(self, rotor_idx: int, delta: int) -> None:
         """Adjust a rotor's position and update the display."""
@@ -793,19 +1168,84 @@ class RotorMachineGUI(QMainWindow):
             current_pos = self.machine.rotors[rotor_idx].position
             new_pos = (current_pos + delta) % 256
             self.machine.rotors[rotor_idx].set_position(new_pos)
-            self.update_rotor_displays()
+            self.rotor_settings_changed()
     
     def randomize_rotors(self) -> None:
         """Randomize all rotor positions."""
         for rotor in self.machine.rotors:
             rotor.set_position(random.randint(0, 255))
-        self.update_rotor_displays()
+        self.rotor_settings_changed()
     
     def reset_rotors(self) -> None:
         """Reset all rotors to position 0."""
         for rotor in self.machine.rotors:
             rotor.set_position(0)
+        self.rotor_settings_changed()
+    
+    def show_dashboard(self, visible: bool) -> None:
+        """Show or hide the performance dashboard."""
+        if visible and self.dashboard is None:
+            self.dashboard = PerformanceDashboard(self.machine)
+            self.dashboard_layout.addWidget(self.dashboard)
+        if self.dashboard is not None:
+            self.dashboard.setVisible(visible)
+    
+    def rotor_settings_changed(self) -> None:
+        """Refresh after the rotor positions were changed by hand."""
         self.update_rotor_displays()
+        if self.live is not None:
+            # In live mode the positions are the start state for the whole text
+            self.live.restart(self.machine.get_rotor_positions())
+            self.live_update(0)
+    
+    def set_live_mode(self, enabled: bool) -> None:
+        """Turn live-typing mode on or off."""
+        document = self.input_text.document()
+        # Live mode always shows raw output
+        for btn in [self.encrypt_btn, self.decrypt_btn, self.encrypt_file_btn, self.armor_combo]:
+            btn.setEnabled(not enabled)
+        
+        if enabled:
+            self.live = LiveEncryptor(self.machine)
+            document.contentsChange.connect(self.on_input_changed)
+            self.output_text.clear()
+            self.live_update(0)
+        elif self.live is not None:
+            document.contentsChange.disconnect(self.on_input_changed)
+            self.live = None
+    
+    def on_input_changed(self, position: int, removed: int, added: int) -> None:
+        """Re-encrypt from the edited position onwards."""
+        self.live_update(position)
+    
+    def live_update(self, position=None) -> None:
+        """
+        Bring the output pane up to date with the input in live mode.
+        
+        Args:
+            position: Document position of the first change, if known
+        """
+        # Document positions count UTF-16 code units, so characters outside
+        # the BMP (emoji etc.) take two; the live encryptor counts characters
+        text = self.input_text.toPlainText()
+        change_start = None if position is None else code_point_index(text, position)
+        old_length = utf16_length(self.live.output)
+        start, suffix = self.live.update(text, change_start)
+        
+        # Patch only the changed tail of the output, unless the document's
+        # idea of its length has drifted from ours (e.g. control characters)
+        document = self.output_text.document()
+        if document.characterCount() - 1 == old_length:
+            cursor = QTextCursor(document)
+            cursor.setPosition(utf16_length(self.live.output[:start]))
+            cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+            cursor.insertText(suffix)
+        else:
+            self.output_text.setPlainText(self.live.output)
+        
+        # Keep the machine (and the displays) at the start state so that the
+        # rotor controls keep adjusting the key rather than the end state
+        self.machine.set_rotor_positions(self.live.start_positions)
     
     def process_text(self, encrypt: bool = True) -> None:
         """Process the input text (encrypt or decrypt)."""
@@ -822,39 +1262,33 @@ class RotorMachineGUI(QMainWindow):
             # Clear output
             self.output_text.clear()
             
+            # Record the rotor states for the timeline slider
+            self.machine.start_state_log()
+            
             # Process in chunks to keep the UI responsive
-            chunk_size = 100
-            total_chars = len(input_text)
-            processed = 0
-            
-            # Process text in chunks
-            while processed < total_chars:
-                chunk = input_text[processed:processed + chunk_size]
-                result = []
+            chunks = self.text_chunks(input_text, 1024)
+            armor = self.armor_combo.currentData()
+            if armor is None:
+                # The cipher is reciprocal, so encrypting and decrypting are
+                # the same bulk call
+                results = self.raw_chunks(chunks)
+            elif encrypt:
+                results = encrypt_text_stream(self.machine, chunks, armor, line_length=76)
+            else:
+                results = decrypt_text_stream(self.machine, chunks, armor, errors='replace')
+            
+            for result in results:
+                # Update rotor displays once per chunk rather than per character
+                for i, display in enumerate(self.rotor_displays):
+                    if i < len(self.machine.rotors):
+                        display.set_highlight(True)
+                        display.set_position(self.machine.rotors[i].position)
                 
-                for char in chunk:
-                    byte = ord(char)
-                    if 0 <= byte <= 255:  # Only process valid bytes
-                        if encrypt:
-                            processed_byte = self.machine.encrypt(byte)
-                        else:
-                            processed_byte = self.machine.decrypt(byte)
-                        result.append(chr(processed_byte))
-                        
-                        # Update rotor displays
-                        for i, display in enumerate(self.rotor_displays):
-                            if i < len(self.machine.rotors):
-                                display.set_highlight(True)
-                                display.set_position(self.machine.rotors[i].position)
-                    
-                    processed += 1
-                    # Update progress
-                    self.progress.setValue(int((processed / total_chars) * 100))
-                    QApplication.processEvents()  # Keep UI responsive
+                QApplication.processEvents()  # Keep UI responsive
                 
                 # Append result to output
                 self.output_text.moveCursor(QTextCursor.End)
-                self.output_text.insertPlainText(''.join(result))
+                self.output_text.insertPlainText(result)
                 
                 # Reset highlights
                 for display in self.rotor_displays:
@@ -867,6 +1301,54 @@ class RotorMachineGUI(QMainWindow):
             self.output_text.setPlainText(f"Error: {str(e)}")
         finally:
             self.is_processing = False
+            self.set_timeline(self.machine.stop_state_log())
+    
+    def text_chunks(self, text, chunk_size):
+        """Yield text a chunk at a time, advancing the progress bar."""
+        for start in range(0, len(text), chunk_size):
+            yield text[start:start + chunk_size]
+            self.progress.setValue(int(min(start + chunk_size, len(text)) / len(text) * 100))
+    
+    def raw_chunks(self, chunks):
+        """Process text chunks character by character, as RotorMachine.process_text."""
+        for chunk in chunks:
+            # Only process valid bytes
+            data = bytes(ord(char) for char in chunk if ord(char) <= 255)
+            yield self.machine.process_bytes(data).decode('latin-1')
+    
+    def set_timeline(self, log) -> None:
+        """Make a recorded run available on the timeline slider."""
+        self.timeline_log = log
+        self.timeline_slider.blockSignals(True)
+        if log is not None and len(log):
+            self.timeline_slider.setRange(0, len(log) - 1)
+            self.timeline_slider.setValue(len(log) - 1)
+            self.timeline_slider.setEnabled(True)
+            self.timeline_label.setText(f"Timeline: {len(log)} chars")
+        else:
+            self.timeline_slider.setRange(0, 0)
+            self.timeline_slider.setEnabled(False)
+            self.timeline_label.setText("Timeline: -")
+        self.timeline_slider.blockSignals(False)
+    
+    def scrub_timeline(self, index: int) -> None:
+        """Show the machine state at a character of the last run."""
+        log = self.timeline_log
+        if log is None or not 0 <= index < len(log):
+            return
+        positions = log.positions_at(index)
+        char = log.byte_at(index)
+        
+        for display, position in zip(self.rotor_displays, positions):
+            display.set_position(position)
+        if self.ascii_viewer is not None:
+            self.ascii_viewer.highlight_positions(positions)
+        
+        path = self.machine.signal_path(char, positions)
+        if self.visualization is not None:
+            self.visualization.show_state(char, positions, path)
+        self.timeline_label.setText(
+            f"#{index}: {char:02X} \u2192 {path[-1]:02X}  pos {' '.join(f'{p:02X}' for p in positions)}")
     
     def encrypt_text(self):
         """Encrypt the input text."""
@@ -881,6 +1363,73 @@ class RotorMachineGUI(QMainWindow):
         self.input_text.clear()
         self.output_text.clear()
         self.progress.setValue(0)
+    
+    def process_file(self) -> None:
+        """Stream a file through the machine into another file."""
+        if self.is_processing:
+            return
+            
+        source_path, _ = QFileDialog.getOpenFileName(self, "Select Input File")
+        if not source_path:
+            return
+        target_path, _ = QFileDialog.getSaveFileName(self, "Save Output As",
+                                                     source_path + ".rotor")
+        if not target_path:
+            return
+        if os.path.abspath(source_path) == os.path.abspath(target_path):
+            QMessageBox.warning(self, "Encrypt File", "Output must be a different file.")
+            return
+            
+        try:
+            self.is_processing = True
+            total = os.path.getsize(source_path)
+            
+            def show_progress(done):
+                # Refresh once per chunk, not per byte
+                self.progress.setValue(int(done * 100 / total))
+                self.update_rotor_displays()
+                QApplication.processEvents()
+            
+            # Reading and writing run on their own threads, overlapping the encryption
+            runner = ThreadedRunner(self.machine.process_bytes, buffer_count=3, buffer_size=256 * 1024)
+            with open(source_path, 'rb') as source, open(target_path, 'wb') as target:
+                runner.run(source, target, show_progress)
+            
+            self.progress.setValue(0)
+            self.open_hex_viewer(target_path)
+            
+        except OSError as e:
+            QMessageBox.critical(self, "Encrypt File", f"Error: {e}")
+        finally:
+            self.is_processing = False
+    
+    def view_file(self) -> None:
+        """Browse any file in the hex viewer."""
+        path, _ = QFileDialog.getOpenFileName(self, "Select File to View")
+        if path:
+            self.open_hex_viewer(path)
+    
+    def replay_trace(self) -> None:
+        """Replay a trace exported with signal_trace.export_json in the visualization."""
+        if self.visualization is None:
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Select Trace", "", "Trace files (*.json)")
+        if not path:
+            return
+        try:
+            records = load_json(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            QMessageBox.critical(self, "Replay Trace", f"Could not read trace:\n{e}")
+            return
+        self.visualization.replay_trace(records)
+    
+    def open_hex_viewer(self, path: str) -> None:
+        """Open a virtualized hex/ASCII view of a file in its own window."""
+        window = HexViewerWindow(path, self)
+        window.setAttribute(Qt.WA_DeleteOnClose)
+        window.destroyed.connect(lambda _=None, w=window: self.hex_windows.remove(w))
+        self.hex_windows.append(window)
+        window.show()
 
 
 if __name__ == "__main__":
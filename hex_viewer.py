@@ -0,0 +1,151 @@
+from PyQt5.QtWidgets import QTableView, QHeaderView, QAbstractItemView, QWidget, QVBoxLayout, QLabel
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
+from PyQt5.QtGui import QFont, QColor
+import mmap
+import os
+
+BYTES_PER_ROW = 16
+
+# Printable ASCII shown as-is, everything else as '.'
+_ASCII = bytes(i if 32 <= i <= 126 else ord('.') for i in range(256))
+
+
+class HexFileModel(QAbstractTableModel):
+    """
+    Table model exposing a file as rows of 16 bytes (hex and ASCII columns).
+
+    The file is memory-mapped and rows are formatted only when the view asks
+    for them, so only the visible rows are ever read or rendered, whatever
+    the file size.
+    """
+
+    HEX_COLUMN = 0
+    ASCII_COLUMN = 1
+
+    def __init__(self, path=None, parent=None):
+        super().__init__(parent)
+        self._file = None
+        self._map = None
+        self.size = 0
+        self.path = None
+        if path is not None:
+            self.open(path)
+
+    def open(self, path):
+        """Map a file for viewing (replaces any file already open)."""
+        self.beginResetModel()
+        self.close_file()
+        self.path = path
+        self.size = os.path.getsize(path)
+        if self.size:
+            self._file = open(path, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.endResetModel()
+
+    def close_file(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.size = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return (self.size + BYTES_PER_ROW - 1) // BYTES_PER_ROW
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 2
+
+    def row_bytes(self, row):
+        start = row * BYTES_PER_ROW
+        return self._map[start:start + BYTES_PER_ROW]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or self._map is None:
+            return QVariant()
+        if role == Qt.DisplayRole:
+            chunk = self.row_bytes(index.row())
+            if index.column() == self.HEX_COLUMN:
+                return chunk.hex(' ').upper()
+            return chunk.translate(_ASCII).decode('ascii')
+        if role == Qt.ForegroundRole and index.column() == self.ASCII_COLUMN:
+            return QColor("#4a9cff")
+        return QVariant()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return QVariant()
+        if orientation == Qt.Vertical:
+            return f"{section * BYTES_PER_ROW:08X}"
+        return "Hex" if section == self.HEX_COLUMN else "ASCII"
+
+
+class HexViewer(QTableView):
+    """Virtualized hex + ASCII view of a file of any size."""
+
+    def __init__(self, path=None, parent=None):
+        super().__init__(parent)
+        self.hex_model = HexFileModel(path, self)
+        self.setModel(self.hex_model)
+        self.setFont(QFont("Courier New", 10))
+        self.setSelectionMode(QAbstractItemView.ContiguousSelection)
+        self.setShowGrid(False)
+        self.setWordWrap(False)
+        self.setStyleSheet("""
+            QTableView {
+                background-color: #2a2a2a;
+                color: #ffffff;
+                border: 1px solid #4a9cff;
+                border-radius: 4px;
+                font-family: 'Courier New', monospace;
+            }
+            QHeaderView::section {
+                background-color: #2b2b2b;
+                color: #4a9cff;
+                font-weight: bold;
+                border: none;
+                padding: 2px 4px;
+            }
+        """)
+
+        # Fixed row heights let the view map scroll offsets to rows directly,
+        # without measuring every row of a multi-GB file
+        vertical = self.verticalHeader()
+        vertical.setSectionResizeMode(QHeaderView.Fixed)
+        vertical.setDefaultSectionSize(self.fontMetrics().height() + 4)
+        # Fixed hex column width, so no rows are sampled to size it
+        horizontal = self.horizontalHeader()
+        horizontal.setStretchLastSection(True)
+        self.setColumnWidth(HexFileModel.HEX_COLUMN,
+                            self.fontMetrics().horizontalAdvance("00 " * BYTES_PER_ROW) + 16)
+
+    def open(self, path):
+        self.hex_model.open(path)
+
+    def close_file(self):
+        self.hex_model.beginResetModel()
+        self.hex_model.close_file()
+        self.hex_model.endResetModel()
+
+
+class HexViewerWindow(QWidget):
+    """Top-level window showing a HexViewer for one file."""
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.setWindowTitle(f"Hex View - {os.path.basename(path)}")
+        self.setStyleSheet("background-color: #1e1e1e; color: #ffffff;")
+        self.resize(800, 600)
+
+        layout = QVBoxLayout(self)
+        self.info = QLabel(f"{path}  ({os.path.getsize(path):,} bytes)")
+        self.viewer = HexViewer(path)
+        layout.addWidget(self.info)
+        layout.addWidget(self.viewer, 1)
+
+    def closeEvent(self, event):
+        self.viewer.close_file()
+        super().closeEvent(event)
@@ -0,0 +1,104 @@
+from typing import List, Optional, Tuple
+from machine import RotorMachine
+
+class LiveEncryptor:
+    """
+    Keeps the encryption of an edited text up to date, keystroke by keystroke.
+
+    Every interval characters the rotor positions are recorded as a
+    checkpoint. After an edit, the machine is restored from the last
+    checkpoint before the first changed character and only the text from
+    there on is processed again, so typing at the end of a long document
+    costs the same as typing in a short one.
+    """
+
+    def __init__(self, machine: RotorMachine, interval: int = 256):
+        """
+        Args:
+            machine: The machine to use; its current positions are the start state
+            interval: Characters between checkpoints
+        """
+        if interval < 1:
+            raise ValueError("Checkpoint interval must be a positive integer")
+        self.machine = machine
+        self.interval = interval
+        self.restart(machine.get_rotor_positions())
+
+    def restart(self, start_positions: List[int]) -> None:
+        """Forget all text and checkpoints and start again from the given positions."""
+        self.text = ''
+        self.output = ''
+        # checkpoints[k] holds the positions before character k * interval
+        self.checkpoints: List[List[int]] = [list(start_positions)]
+        self.machine.set_rotor_positions(start_positions)
+
+    @property
+    def start_positions(self) -> List[int]:
+        return list(self.checkpoints[0])
+
+    def update(self, text: str, change_start: Optional[int] = None) -> Tuple[int, str]:
+        """
+        Bring the output in line with the new text.
+
+        Args:
+            text: The full new input text
+            change_start: Index of the first changed character, if the caller
+                knows it; otherwise it is found by comparing with the old text
+
+        Returns:
+            (start, suffix): output[start:] was replaced by suffix; output
+            before start is unchanged
+        """
+        if change_start is None:
+            change_start = _common_prefix_length(self.text, text)
+        change_start = max(0, min(change_start, len(self.text), len(text)))
+
+        # Resume from the last checkpoint at or before the change
+        index = min(change_start // self.interval, len(self.checkpoints) - 1)
+        start = index * self.interval
+        del self.checkpoints[index + 1:]
+        self.machine.set_rotor_positions(self.checkpoints[index])
+
+        pieces = []
+        for segment_start in range(start, len(text), self.interval):
+            segment = text[segment_start:segment_start + self.interval]
+            pieces.append(self.machine.process_text(segment))
+            if len(segment) == self.interval:
+                self.checkpoints.append(self.machine.get_rotor_positions())
+
+        suffix = ''.join(pieces)
+        self.text = text
+        self.output = self.output[:start] + suffix
+        return start, suffix
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    """Length of the common prefix of two strings, comparing in blocks."""
+    limit = min(len(a), len(b))
+    low = 0
+    block = 4096
+    # Skip equal blocks with C-level slice comparisons, then finish per character
+    while low + block <= limit and a[low:low + block] == b[low:low + block]:
+        low += block
+    while low < limit and a[low] == b[low]:
+        low += 1
+    return low
+
+
+def code_point_index(text: str, position: int) -> int:
+    """
+    Index into text of a position counted in UTF-16 code units, as Qt counts
+    document positions; characters outside the BMP take two units there.
+    """
+    if text.isascii():
+        return min(position, len(text))
+    # A position inside a surrogate pair rounds down to the character's start
+    return len(text.encode('utf-16-le', 'surrogatepass')[:2 * position]
+               .decode('utf-16-le', 'ignore'))
+
+
+def utf16_length(text: str) -> int:
+    """Length of text in UTF-16 code units, i.e. as a Qt document position."""
+    if text.isascii():
+        return len(text)
+    return len(text.encode('utf-16-le', 'surrogatepass')) // 2
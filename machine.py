@@ -1,34 +1,85 @@
-from typing import Dict, List, Optional, Tuple, Union
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple, Union
+from concurrent.futures import Executor
+import asyncio
+import hashlib
 import random
+import time
 from rotor import Rotor
+from stepping import SteppingStrategy, EnigmaStepping, stepping_from_dict
+from engines import EngineDispatcher, default_dispatcher
+from stats import MachineStats
+from state_log import StateLog
+from signal_trace import TraceBuffer, Tracer
+from canonical import CanonicalSetting, canonicalize
+from result_cache import EncryptionCache
+
+# Version of the export_key() format
+KEY_FORMAT_VERSION = 1
+
+# Prefixed to seeds before hashing, so a seed isn't used raw by other tools too
+SEED_DOMAIN = b'rotor-machine seeded key v1:'
 
 class RotorMachine:
-    def __init__(self, num_rotors: int = 3):
+    def __init__(self, num_rotors: int = 3, stepping: Optional[SteppingStrategy] = None,
+                 rotors: Optional[List[Rotor]] = None,
+                 reflector: Optional[Dict[int, int]] = None):
         """
         Initialize the rotor machine with the specified number of rotors.
         
         Args:
             num_rotors: Number of rotors to use (default: 3)
+            stepping: Rotor stepping strategy (default: EnigmaStepping)
+            rotors: Optional prebuilt rotors, leftmost first (overrides num_rotors)
+            reflector: Optional prebuilt reflector (involutory mapping of 0-255)
         """
+        if rotors is not None:
+            num_rotors = len(rotors)
         if not isinstance(num_rotors, int) or num_rotors < 1:
             raise ValueError("Number of rotors must be a positive integer")
             
         self.num_rotors = num_rotors
         self.rotors: List[Rotor] = []
-        self.reflector: Dict[int, int] = self._create_reflector()
+        self.reflector: Dict[int, int] = reflector if reflector is not None else self._create_reflector()
         self.plugboard: List[int] = [i for i in range(256)]  # Faster list-based plugboard
+        self.stepping: SteppingStrategy = stepping if stepping is not None else EnigmaStepping()
+        self.dispatcher: Optional[EngineDispatcher] = None  # None means the shared default
+        self.last_engine: Optional[str] = None
+        self.stats = MachineStats()
+        self.state_log: Optional[StateLog] = None
+        self.tracer: Optional[Tracer] = None
+        self.cache: Optional[EncryptionCache] = None
+        self._composite_levels: List[tuple] = []
+        self._composite_outer: Optional[tuple] = None
+        # (key state, value) pairs; see _key_state()
+        self._fingerprints: Dict[bool, tuple] = {}
+        self._phase_periods: Optional[tuple] = None
         
-        # Initialize rotors with random wirings and positions
-        for i in range(num_rotors):
-            # Space notches evenly
-            notch = (i * (256 // num_rotors)) % 256
-            self.rotors.append(Rotor(notch=notch))
-    
-    def _create_reflector(self) -> Dict[int, int]:
+        if rotors is not None:
+            self.rotors.extend(rotors)
+        else:
+            # Initialize rotors with random wirings and positions
+            for i in range(num_rotors):
+                # Space notches evenly
+                notch = (i * (256 // num_rotors)) % 256
+                self.rotors.append(Rotor(notch=notch))
+
+    def __getstate__(self) -> dict:
+        # Copies (e.g. the parallel engine's) don't inherit an active trace,
+        # whose predicate may not be picklable, a state log, which would be
+        # shipped whole to every worker only to record throwaway entries, or
+        # a result cache, which belongs to the process that attached it
+        state = self.__dict__.copy()
+        state['tracer'] = None
+        state['state_log'] = None
+        state['cache'] = None
+        return state
+
+    @staticmethod
+    def _create_reflector(rng: Optional[random.Random] = None) -> Dict[int, int]:
         """Create a reflector that maps each character to another (involutory permutation)."""
         # Create pairs of characters that map to each other
         chars = list(range(256))
-        random.shuffle(chars)
+        (rng or random).shuffle(chars)
         reflector = {}
         
         for i in range(0, 256, 2):
@@ -83,21 +134,76 @@ class RotorMachine:
             self.plugboard[b] = a
     
     def rotate_rotors(self) -> None:
-        """Rotate the rotors according to the Enigma machine's stepping mechanism."""
-        # Rightmost rotor always rotates
-        rotate_next = self.rotors[-1].rotate()
+        """Rotate the rotors according to the machine's stepping strategy."""
+        self.stepping.step(self.rotors)
+    
+    def advance(self, count: int) -> None:
+        """Step the rotors count times without encrypting anything."""
+        positions = self.get_rotor_positions()
+        self.stepping.jump(positions, self.rotors, count)
+        self.set_rotor_positions(positions)
+    
+    def step_schedule(self, count: int) -> bytearray:
+        """
+        Get the rotor positions for the next count characters without stepping.
+        
+        Returns:
+            bytearray: count rows of num_rotors positions, packed row-major
+        """
+        return self.stepping.schedule(self.rotors, count)
+    
+    def composite_tables(self, positions: List[int], fast: int) -> Tuple[bytes, bytes, bytes]:
+        """
+        Fold everything except one rotor into three byte mappings.
         
-        # Check for double-stepping (middle rotor)
-        if len(self.rotors) > 1 and self.rotors[-2].is_at_notch():
-            rotate_next = True
+        With the fast rotor at index f, encrypting c is
+        outer_out[backward_f(inner[forward_f(outer_in[c])])], where outer_in
+        is the plugboard followed by the rotors right of f, inner is the
+        rotors left of f, the reflector and the way back through them, and
+        outer_out is the way back through the rotors right of f and the
+        plugboard. The tables only depend on the positions of the other
+        rotors and are cached: inner is kept as one table per depth (the
+        reflector wrapped in rotors 0..j-1), so when a rotor steps only the
+        depths from that rotor inwards are rebuilt.
         
-        # Rotate middle rotor if needed
-        if len(self.rotors) > 1 and rotate_next:
-            rotate_next = self.rotors[-2].rotate()
+        Args:
+            positions: Rotor positions, leftmost first (positions[fast] is ignored)
+            fast: Index of the rotor left out
             
-            # If middle rotor was on a notch and rotated, rotate the left rotor too
-            if len(self.rotors) > 2 and rotate_next:
-                self.rotors[-3].rotate()
+        Returns:
+            (outer_in, inner, outer_out) as 256-byte translation tables
+        """
+        rotors = self.rotors
+        fast %= len(rotors)
+        shifts = [(position - rotor.ring_setting) % 256 for rotor, position in zip(rotors, positions)]
+        
+        # levels[j] = (rotor j-1, its shift, reflector wrapped in rotors 0..j-1)
+        levels = self._composite_levels
+        if not levels or levels[0][0] is not self.reflector:
+            levels = [(self.reflector, None, bytes(self.reflector.get(c, c) for c in range(256)))]
+        depth = 1
+        while (depth < len(levels) and depth <= fast
+               and levels[depth][0] is rotors[depth - 1] and levels[depth][1] == shifts[depth - 1]):
+            depth += 1
+        del levels[depth:]
+        for j in range(depth - 1, fast):
+            forward, backward = _shift_layers(rotors[j], shifts[j])
+            levels.append((rotors[j], shifts[j], forward.translate(levels[-1][2]).translate(backward)))
+        self._composite_levels = levels
+        inner = levels[fast][2]
+        
+        outer_key = (self.plugboard, [(rotors[i], shifts[i]) for i in range(fast + 1, len(rotors))])
+        cached = self._composite_outer
+        if cached is None or cached[0] is not outer_key[0] or cached[1] != outer_key[1]:
+            outer_in = bytes(self.plugboard)
+            outer_out = bytes(range(256))
+            for i in range(len(rotors) - 1, fast, -1):
+                outer_in = outer_in.translate(_shift_layers(rotors[i], shifts[i])[0])
+            for i in range(fast + 1, len(rotors)):
+                outer_out = outer_out.translate(_shift_layers(rotors[i], shifts[i])[1])
+            outer_out = outer_out.translate(bytes(self.plugboard))
+            cached = self._composite_outer = outer_key + (outer_in, outer_out)
+        return cached[2], inner, cached[3]
     
     def encrypt(self, char: int) -> int:
         """
@@ -163,16 +269,194 @@ class RotorMachine:
     
     def process_text(self, text: str) -> str:
         """Process text through the machine (encrypt/decrypt)."""
-        return ''.join(
-            chr(self.encrypt_char(ord(char))) 
-            if 0 <= ord(char) < 256 else char 
-            for char in text
-        )
+        # Characters outside 0-255 pass through without stepping the rotors,
+        # so the rest can be processed as one block
+        data = bytes(ord(char) for char in text if ord(char) < 256)
+        processed = iter(self.process_bytes(data).decode('latin-1'))
+        return ''.join(next(processed) if ord(char) < 256 else char for char in text)
     
     # Alias for backward compatibility
     encrypt_text = process_text
     decrypt_text = process_text
     
+    def process_bytes(self, data: bytes, engine: Optional[str] = None) -> bytes:
+        """
+        Process a block of bytes through the machine (encrypt/decrypt).
+        
+        Args:
+            data: The input bytes
+            engine: Engine name from engines.ENGINES, or None to let the
+                dispatcher pick one; the engine used is kept in last_engine
+                ('cache' when the result came from self.cache)
+        """
+        dispatcher = self.dispatcher if self.dispatcher is not None else default_dispatcher()
+        before = self.get_rotor_positions()
+        # Callers may pass memoryviews (e.g. the pipeline runners)
+        data = bytes(data)
+        if self.state_log is not None:
+            self.state_log.record(before, data)
+        if self.tracer is not None:
+            self.tracer.capture(self, before, data)
+        start = time.perf_counter()
+        cache = self.cache
+        if cache is not None:
+            # Keyed on the configuration's class, so equivalent positions and
+            # ring settings share entries; the rotor steps are the same for all
+            key = cache.key(self.key_fingerprint(rings=False), self.canonical_setting(), data)
+            hit = cache.get(key, len(data))
+            self.stats.record_cache(hit is not None)
+            if hit is not None:
+                result, steps = hit
+                after = [(p + s) % 256 for p, s in zip(before, steps)]
+                self.set_rotor_positions(after)
+                self.last_engine = 'cache'
+                self.stats.record(len(result), time.perf_counter() - start, self.last_engine,
+                                  before, after, self.stepping.every_char)
+                return result
+        result = dispatcher.run(self, data, engine)
+        after = self.get_rotor_positions()
+        if cache is not None:
+            cache.put(key, result, [(a - b) % 256 for a, b in zip(after, before)])
+        self.stats.record(len(result), time.perf_counter() - start, self.last_engine,
+                          before, after, self.stepping.every_char)
+        return result
+    
+    encrypt_bytes = process_bytes
+    decrypt_bytes = process_bytes
+    
+    async def aencrypt(self, chunks: AsyncIterable[bytes],
+                       executor: Optional[Executor] = None,
+                       max_in_flight: int = 4) -> AsyncIterator[bytes]:
+        """
+        Encrypt an async stream of byte chunks without blocking the event loop.
+        
+        Each chunk is processed on ``executor`` (the loop's default executor if
+        None) strictly in arrival order, so the rotor state carries over from
+        one chunk to the next exactly as with a single ``process_bytes`` call.
+        At most ``max_in_flight`` chunks are read ahead of the one being
+        processed, which bounds memory use for fast producers.
+        
+        Args:
+            chunks: Async iterable of bytes-like chunks
+            executor: Executor running the CPU-bound work
+            max_in_flight: Maximum number of chunks buffered ahead
+            
+        Yields:
+            The processed chunks, in input order
+        """
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be a positive integer")
+            
+        loop = asyncio.get_running_loop()
+        pending: asyncio.Queue = asyncio.Queue(maxsize=max_in_flight)
+        done = object()
+        
+        async def read_ahead() -> None:
+            cancelled = False
+            try:
+                async for chunk in chunks:
+                    await pending.put(bytes(chunk))
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            finally:
+                # Once cancelled nobody waits for the sentinel, and putting it
+                # on a full queue would never return
+                if not cancelled:
+                    await pending.put(done)
+        
+        reader = asyncio.ensure_future(read_ahead())
+        try:
+            while True:
+                chunk = await pending.get()
+                if chunk is done:
+                    break
+                yield await loop.run_in_executor(executor, self.process_bytes, chunk)
+            # Surface any error raised by the source iterable
+            await reader
+        finally:
+            reader.cancel()
+    
+    def adecrypt(self, chunks: AsyncIterable[bytes],
+                 executor: Optional[Executor] = None,
+                 max_in_flight: int = 4) -> AsyncIterator[bytes]:
+        """
+        Decrypt an async stream of byte chunks.
+        
+        Note: The cipher is reciprocal, so this is the same as aencrypt().
+        """
+        return self.aencrypt(chunks, executor, max_in_flight)
+    
+    def start_state_log(self, interval: int = 256, keep_data: bool = True) -> StateLog:
+        """
+        Start recording the rotor positions of every byte processed in bulk.
+        
+        Only process_bytes (and the calls built on it) are recorded, not
+        single-character encrypt() calls.
+        
+        Args:
+            interval: Maximum characters between stored checkpoints
+            keep_data: Also keep the input bytes
+        """
+        self.state_log = StateLog(self.rotors, self.stepping, interval, keep_data)
+        return self.state_log
+    
+    def stop_state_log(self) -> Optional[StateLog]:
+        """Stop recording and return the log."""
+        log, self.state_log = self.state_log, None
+        return log
+    
+    def start_trace(self, every: Optional[int] = None, values=None, predicate=None,
+                    capacity: int = 4096) -> TraceBuffer:
+        """
+        Start tracing the signal path of selected bytes processed in bulk.
+        
+        See signal_trace.Tracer for how bytes are selected; with no filter
+        every byte is traced. Only the most recent capacity records are kept.
+        
+        Returns:
+            The ring buffer the records are written to
+        """
+        buffer = TraceBuffer(self.num_rotors, capacity)
+        self.tracer = Tracer(buffer, every, values, predicate)
+        return buffer
+    
+    def stop_trace(self) -> Optional[TraceBuffer]:
+        """Stop tracing and return the trace buffer."""
+        tracer, self.tracer = self.tracer, None
+        return tracer.buffer if tracer is not None else None
+    
+    def signal_path(self, char: int, positions: Optional[List[int]] = None) -> List[int]:
+        """
+        Follow one character through the machine without stepping the rotors.
+        
+        Args:
+            char: The input character (0-255)
+            positions: Rotor positions to use (default: the current ones)
+            
+        Returns:
+            The value after the plugboard, after each rotor on the way in
+            (rightmost first), after the reflector, after each rotor on the
+            way back (leftmost first) and after the plugboard again
+        """
+        if positions is None:
+            positions = self.get_rotor_positions()
+        shifts = [(position - rotor.ring_setting) % 256
+                  for rotor, position in zip(self.rotors, positions)]
+        
+        result = self.plugboard[char]
+        path = [result]
+        for rotor, shift in zip(reversed(self.rotors), reversed(shifts)):
+            result = (rotor.wiring[(result + shift) % 256] - shift) % 256
+            path.append(result)
+        result = self.reflector[result]
+        path.append(result)
+        for rotor, shift in zip(self.rotors, shifts):
+            result = (rotor.reverse_wiring[(result + shift) % 256] - shift) % 256
+            path.append(result)
+        path.append(self.plugboard[result])
+        return path
+    
     def get_rotor_positions(self) -> List[int]:
         """Get current positions of all rotors."""
         return [rotor.position for rotor in self.rotors]
@@ -181,6 +465,151 @@ class RotorMachine:
         """Get ring settings of all rotors."""
         return [rotor.ring_setting for rotor in self.rotors]
     
+    def export_key(self) -> dict:
+        """
+        Serialize the machine's complete key and current rotor positions.
+        
+        The result is plain JSON data (byte tables as hex strings) and
+        from_key() rebuilds an identical machine from it.
+        """
+        return {
+            'version': KEY_FORMAT_VERSION,
+            'stepping': self.stepping.to_dict(),
+            'rotors': [{'wiring': bytes(rotor.wiring).hex(),
+                        'notches': rotor.notches,
+                        'ring_setting': rotor.ring_setting,
+                        'position': rotor.position} for rotor in self.rotors],
+            'reflector': bytes(self.reflector.get(c, c) for c in range(256)).hex(),
+            'plugboard': bytes(self.plugboard).hex(),
+        }
+    
+    @classmethod
+    def from_key(cls, key: dict) -> 'RotorMachine':
+        """Build a machine from an export_key() or seeded_key() description."""
+        if key.get('version') != KEY_FORMAT_VERSION:
+            raise ValueError(f"Unsupported key format version: {key.get('version')}")
+        if 'seed' in key:
+            try:
+                return cls.from_seed(key['seed'], key['num_rotors'],
+                                     stepping_from_dict(key['stepping']))
+            except (KeyError, TypeError) as e:
+                raise ValueError(f"Malformed key: {e!r}")
+        try:
+            rotors = [Rotor(wiring=list(bytes.fromhex(rotor['wiring'])),
+                            position=rotor['position'] % 256,
+                            ring_setting=rotor['ring_setting'] % 256,
+                            notches=rotor['notches']) for rotor in key['rotors']]
+            reflector = dict(enumerate(bytes.fromhex(key['reflector'])))
+            plugboard = list(bytes.fromhex(key['plugboard']))
+            stepping = stepping_from_dict(key['stepping'])
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Malformed key: {e!r}")
+        if any(sorted(rotor.wiring) != list(range(256)) for rotor in rotors):
+            raise ValueError("Malformed key: rotor wiring is not a permutation of 0-255")
+        if len(reflector) != 256 or len(plugboard) != 256:
+            raise ValueError("Malformed key: reflector and plugboard need 256 entries")
+        machine = cls(stepping=stepping, rotors=rotors, reflector=reflector)
+        machine.plugboard = plugboard
+        return machine
+    
+    @classmethod
+    def from_seed(cls, seed: Union[bytes, str], num_rotors: int = 3,
+                  stepping: Optional[SteppingStrategy] = None) -> 'RotorMachine':
+        """
+        Build the machine a seed stands for.
+        
+        The wirings, reflector, ring settings and start positions are drawn
+        from a generator seeded with sha256(SEED_DOMAIN + seed), so a short
+        seed plus the rotor count and stepping is a complete key. Notches are
+        spaced as in __init__ and the plugboard is left empty.
+        
+        Args:
+            seed: Seed bytes, or their hex string
+            num_rotors: Number of rotors
+            stepping: Rotor stepping strategy (default: EnigmaStepping)
+        """
+        if isinstance(seed, str):
+            try:
+                seed = bytes.fromhex(seed)
+            except ValueError:
+                raise ValueError("Malformed key: seed is not a hex string")
+        if not isinstance(num_rotors, int) or num_rotors < 1:
+            raise ValueError("Number of rotors must be a positive integer")
+        rng = random.Random(hashlib.sha256(SEED_DOMAIN + seed).digest())
+        rotors = [Rotor(wiring=Rotor._generate_random_wiring(rng),
+                        notch=(i * (256 // num_rotors)) % 256) for i in range(num_rotors)]
+        reflector = cls._create_reflector(rng)
+        for rotor in rotors:
+            rotor.set_ring_setting(rng.randrange(256))
+            rotor.set_position(rng.randrange(256))
+        return cls(stepping=stepping, rotors=rotors, reflector=reflector)
+    
+    @staticmethod
+    def seeded_key(seed: Union[bytes, str], num_rotors: int = 3,
+                   stepping: Optional[SteppingStrategy] = None) -> dict:
+        """
+        Describe the machine from_seed() builds, in the export_key() format
+        family: from_key() accepts the result.
+        """
+        if isinstance(seed, bytes):
+            seed = seed.hex()
+        return {
+            'version': KEY_FORMAT_VERSION,
+            'seed': seed,
+            'num_rotors': num_rotors,
+            'stepping': (stepping if stepping is not None else EnigmaStepping()).to_dict(),
+        }
+    
+    def key_fingerprint(self, rings: bool = True) -> str:
+        """
+        Hex digest of the machine's key: everything that affects the output
+        except the rotor positions.
+        
+        The digest is cached until the key changes, since the result cache
+        asks for it on every bulk call.
+        
+        Args:
+            rings: Include the ring settings; leave them out to fingerprint
+                the fixed hardware when they are covered by a canonical_setting()
+        """
+        state = self._key_state(rings)
+        cached = self._fingerprints.get(rings)
+        if cached is not None and cached[0] == state:
+            return cached[1]
+        digest = hashlib.sha256(str(self.stepping).encode())
+        for rotor in self.rotors:
+            digest.update(bytes(rotor.wiring))
+            digest.update(rotor.notch_bitmap.to_bytes(32, 'little'))
+            if rings:
+                digest.update(bytes([rotor.ring_setting]))
+        digest.update(bytes(self.reflector.get(c, c) for c in range(256)))
+        digest.update(bytes(self.plugboard))
+        fingerprint = digest.hexdigest()
+        self._fingerprints[rings] = (state, fingerprint)
+        return fingerprint
+    
+    def canonical_setting(self) -> CanonicalSetting:
+        """Class of the current (positions, ring settings); see canonical.py."""
+        # The phase periods only depend on the key, so they are cached with it
+        state = self._key_state(False)
+        cached = self._phase_periods
+        if cached is None or cached[0] != state:
+            cached = self._phase_periods = (state, self.stepping.phase_periods(self.rotors))
+        return canonicalize(self.get_rotor_positions(), self.get_ring_settings(),
+                            self.rotors, self.stepping, cached[1])
+    
+    def _key_state(self, rings: bool) -> tuple:
+        """
+        Cheap stand-in for the key, to tell whether cached digests still hold.
+        
+        Like the composite tables, it takes wirings and the reflector by
+        identity (rotors aren't rewired in place) and the plugboard, notches,
+        stepping and, if asked for, ring settings by value.
+        """
+        return (str(self.stepping), self.reflector, list(self.plugboard),
+                [(rotor.wiring, rotor.notch_bitmap, rotor.ring_setting if rings else None)
+                 for rotor in self.rotors])
+    
     def reset(self) -> None:
         """Reset all rotors to position 0."""
         for rotor in self.rotors:
@@ -193,3 +622,10 @@ class RotorMachine:
             f"positions={self.get_rotor_positions()}, "
             f"rings={self.get_ring_settings()})"
         )
+
+
+def _shift_layers(rotor: Rotor, shift: int) -> Tuple[bytes, bytes]:
+    """A rotor's forward and backward mappings at one shift, as translation tables."""
+    forward, backward = rotor.shift_tables()
+    base = shift << 8
+    return bytes(forward[base:base + 256]), bytes(backward[base:base + 256])
@@ -1,8 +1,12 @@
+from startup_timing import startup_timer
+import os
 import sys
 from PyQt5.QtWidgets import QApplication, QStyleFactory
 from PyQt5.QtCore import Qt
 from gui_window import RotorMachineGUI
 
+startup_timer.mark("imports")
+
 def main():
     # Enable high DPI scaling
     if hasattr(Qt, 'AA_EnableHighDpiScaling'):
@@ -10,8 +14,17 @@ def main():
     if hasattr(Qt, 'AA_UseHighDpiPixmaps'):
         QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
     
+    # Print a start-up phase breakdown with --startup-timing or ROTOR_STARTUP_TIMING=1
+    report_timing = '--startup-timing' in sys.argv or bool(os.environ.get('ROTOR_STARTUP_TIMING'))
+    
+    # Log event-loop stalls with --stall-watchdog or ROTOR_STALL_WATCHDOG=<log file>
+    stall_log = os.environ.get('ROTOR_STALL_WATCHDOG')
+    if '--stall-watchdog' in sys.argv and not stall_log:
+        stall_log = 'stalls.log'
+    
     # Create the application
     app = QApplication(sys.argv)
+    startup_timer.mark("QApplication")
     
     try:
         # Set application style
@@ -20,6 +33,14 @@ def main():
         # Create and show the main window
         window = RotorMachineGUI()
         window.show()
+        startup_timer.mark("show")
+        if stall_log:
+            from stall_watchdog import StallWatchdog
+            watchdog = StallWatchdog(app, stall_log)
+            watchdog.start()
+            app.aboutToQuit.connect(watchdog.stop)
+        if report_timing:
+            window.panels_ready.connect(lambda: print(startup_timer.report()))
         
         # Start the application event loop
         sys.exit(app.exec_())
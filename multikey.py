@@ -0,0 +1,337 @@
+from typing import Iterable, List, Optional, Sequence, Union
+from concurrent.futures import ProcessPoolExecutor
+import os
+from rotor import Rotor
+from stepping import SteppingStrategy, EnigmaStepping, OdometerStepping, ControlRotorStepping
+from machine import RotorMachine
+from engines import MIN_PARALLEL_PART
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+# Working-set budget for one tile of keys x characters, in bytes; the tile's
+# int32 temporaries should stay in L2
+TILE_BYTES = 1 << 20
+
+
+class KeyStack:
+    """
+    Many keys for one stepping strategy, stored field by field.
+
+    Each field is one flat bytes object, key-major: wirings holds
+    len(self) * num_rotors * 256 bytes, reflectors and plugboards 256 per
+    key, positions and rings num_rotors per key and notches 32 per rotor
+    (a little-endian bitmap). With NumPy the fields are viewed as arrays of
+    shape (keys, rotors, 256), (keys, 256) and so on without copying.
+    """
+
+    def __init__(self, num_rotors: int, wirings: bytes, reflectors: bytes, plugboards: bytes,
+                 positions: bytes, rings: bytes, notches: bytes,
+                 stepping: Optional[SteppingStrategy] = None):
+        """
+        Args:
+            num_rotors: Rotors per key
+            wirings: Rotor wirings, leftmost rotor first within each key
+            reflectors: Reflector tables
+            plugboards: Plugboard tables
+            positions: Start positions
+            rings: Ring settings
+            notches: Notch bitmaps
+            stepping: Stepping shared by every key (default: EnigmaStepping)
+        """
+        if num_rotors < 1:
+            raise ValueError("Number of rotors must be a positive integer")
+        count, rest = divmod(len(reflectors), 256)
+        expected = {'wirings': (wirings, count * num_rotors * 256),
+                    'plugboards': (plugboards, count * 256),
+                    'positions': (positions, count * num_rotors),
+                    'rings': (rings, count * num_rotors),
+                    'notches': (notches, count * num_rotors * 32)}
+        if rest:
+            raise ValueError("reflectors must hold 256 bytes per key")
+        for name, (field, size) in expected.items():
+            if len(field) != size:
+                raise ValueError(f"{name} holds {len(field)} bytes, expected {size} for {count} keys")
+        self.num_rotors = num_rotors
+        self.count = count
+        self.wirings = bytes(wirings)
+        self.reflectors = bytes(reflectors)
+        self.plugboards = bytes(plugboards)
+        self.positions = bytes(positions)
+        self.rings = bytes(rings)
+        self.notches = bytes(notches)
+        self.stepping = stepping if stepping is not None else EnigmaStepping()
+
+    def __len__(self) -> int:
+        return self.count
+
+    @classmethod
+    def from_machines(cls, machines: Sequence[RotorMachine]) -> 'KeyStack':
+        """Stack the keys and current positions of machines with one stepping."""
+        if not machines:
+            raise ValueError("Need at least one machine")
+        stepping = machines[0].stepping
+        num_rotors = machines[0].num_rotors
+        fields = [bytearray() for _ in range(6)]
+        for machine in machines:
+            if str(machine.stepping) != str(stepping) or machine.num_rotors != num_rotors:
+                raise ValueError("All machines need the same stepping and number of rotors")
+            wirings, reflectors, plugboards, positions, rings, notches = fields
+            for rotor in machine.rotors:
+                wirings += bytes(rotor.wiring)
+                notches += rotor.notch_bitmap.to_bytes(32, 'little')
+            reflectors += bytes(machine.reflector.get(c, c) for c in range(256))
+            plugboards += bytes(machine.plugboard)
+            positions += bytes(machine.get_rotor_positions())
+            rings += bytes(machine.get_ring_settings())
+        return cls(num_rotors, *fields, stepping=stepping)
+
+    @classmethod
+    def from_keys(cls, keys: Iterable[dict]) -> 'KeyStack':
+        """Stack export_key() or seeded_key() descriptions."""
+        return cls.from_machines([RotorMachine.from_key(key) for key in keys])
+
+    @classmethod
+    def from_seeds(cls, seeds: Iterable[Union[bytes, str]], num_rotors: int = 3,
+                   stepping: Optional[SteppingStrategy] = None) -> 'KeyStack':
+        """Stack the machines RotorMachine.from_seed() builds for each seed."""
+        return cls.from_machines([RotorMachine.from_seed(seed, num_rotors, stepping)
+                                  for seed in seeds])
+
+    def slice(self, start: int, stop: int) -> 'KeyStack':
+        """Keys start to stop-1 as a stack of their own."""
+        n = self.num_rotors
+        return KeyStack(n, self.wirings[start * n * 256:stop * n * 256],
+                        self.reflectors[start * 256:stop * 256],
+                        self.plugboards[start * 256:stop * 256],
+                        self.positions[start * n:stop * n], self.rings[start * n:stop * n],
+                        self.notches[start * n * 32:stop * n * 32], self.stepping)
+
+    def rotors(self, index: int) -> List[Rotor]:
+        """Rotors for one key, at its start positions."""
+        n = self.num_rotors
+        rotors = []
+        for i in range(n):
+            j = index * n + i
+            bitmap = int.from_bytes(self.notches[j * 32:(j + 1) * 32], 'little')
+            rotor = Rotor(wiring=list(self.wirings[j * 256:(j + 1) * 256]),
+                          position=self.positions[j], ring_setting=self.rings[j],
+                          notches=[c for c in range(256) if (bitmap >> c) & 1])
+            rotors.append(rotor)
+        return rotors
+
+    def machine(self, index: int) -> RotorMachine:
+        """A RotorMachine for one key, e.g. to check a result against."""
+        reflector = dict(enumerate(self.reflectors[index * 256:(index + 1) * 256]))
+        machine = RotorMachine(stepping=self.stepping, rotors=self.rotors(index), reflector=reflector)
+        machine.plugboard = list(self.plugboards[index * 256:(index + 1) * 256])
+        return machine
+
+
+def evaluate(keys: KeyStack, data: bytes, workers: Optional[int] = None,
+             use_numpy: Optional[bool] = None) -> List[bytes]:
+    """
+    Process one input under every key of a stack.
+
+    Equivalent to building keys.machine(k) and calling process_bytes(data)
+    for each k, but no machine (or per-rotor table) is ever built. With
+    NumPy, keys are processed in tiles of keys x characters sized by
+    TILE_BYTES: the rotors of every key in a tile step together, one
+    vectorized step per character, and each rotor pass is one gather over
+    the tile. Without NumPy each key is walked character by character over
+    its raw wirings. Either way, large jobs are split by key over worker
+    processes. The gain is in skipping per-key setup, so it is largest for
+    many keys and short inputs; a long input under a few keys is better
+    served by process_bytes, whose table builds it amortizes.
+
+    Args:
+        keys: The keys
+        data: The input
+        workers: Worker processes (default: one per core)
+        use_numpy: Force the NumPy path on or off (default: on if installed)
+
+    Returns:
+        The output for each key, in stack order
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+    if use_numpy and np is None:
+        raise RuntimeError("The vectorized path requires NumPy")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(keys) * len(data) // MIN_PARALLEL_PART, len(keys)))
+    if workers == 1:
+        return _evaluate_part(keys, data, use_numpy)
+
+    size = -(-len(keys) // workers)
+    parts = [keys.slice(start, min(start + size, len(keys))) for start in range(0, len(keys), size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_evaluate_part, parts, [data] * len(parts), [use_numpy] * len(parts))
+        return [output for part in results for output in part]
+
+
+def _evaluate_part(keys: KeyStack, data: bytes, use_numpy: bool) -> List[bytes]:
+    """Worker entry point for evaluate."""
+    if not data:
+        return [b''] * len(keys)
+    if use_numpy:
+        return _evaluate_numpy(keys, data)
+    return [_evaluate_key(keys, k, data) for k in range(len(keys))]
+
+
+def _evaluate_key(keys: KeyStack, index: int, data: bytes) -> bytes:
+    """One key, character by character, as RotorMachine.encrypt does it."""
+    n = keys.num_rotors
+    rotors = keys.rotors(index)
+    wirings = [rotor.wiring for rotor in rotors]
+    reverse = [rotor.reverse_wiring for rotor in rotors]
+    rings = [rotor.ring_setting for rotor in rotors]
+    reflector = keys.reflectors[index * 256:(index + 1) * 256]
+    plugboard = keys.plugboards[index * 256:(index + 1) * 256]
+    positions = [rotor.position for rotor in rotors]
+    advance = keys.stepping.advance
+    order = range(n - 1, -1, -1)
+    out = bytearray(len(data))
+    for k, byte in enumerate(data):
+        advance(positions, rotors)
+        shifts = [(p - r) & 255 for p, r in zip(positions, rings)]
+        c = plugboard[byte]
+        for i in order:
+            s = shifts[i]
+            c = (wirings[i][(c + s) & 255] - s) & 255
+        c = reflector[c]
+        for i in range(n):
+            s = shifts[i]
+            c = (reverse[i][(c + s) & 255] - s) & 255
+        out[k] = plugboard[c]
+    return bytes(out)
+
+
+def _evaluate_numpy(keys: KeyStack, data: bytes) -> List[bytes]:
+    n = keys.num_rotors
+    count = len(keys)
+    length = len(data)
+    wirings = np.frombuffer(keys.wirings, dtype=np.uint8).reshape(count, n, 256)
+    # Inverse wirings: reverse[k, i, wirings[k, i, c]] = c
+    reverse = np.empty_like(wirings)
+    np.put_along_axis(reverse, wirings.astype(np.intp),
+                      np.broadcast_to(np.arange(256, dtype=np.uint8), wirings.shape), axis=2)
+    forward_flat = wirings.reshape(-1).astype(np.int32)
+    reverse_flat = reverse.reshape(-1).astype(np.int32)
+    reflectors = np.frombuffer(keys.reflectors, dtype=np.uint8).reshape(count, 256).astype(np.int32)
+    plugboards = np.frombuffer(keys.plugboards, dtype=np.uint8).reshape(count, 256).astype(np.int32)
+    positions = np.frombuffer(keys.positions, dtype=np.uint8).reshape(count, n).astype(np.int32)
+    rings = np.frombuffer(keys.rings, dtype=np.uint8).reshape(count, n).astype(np.int32)
+    bits = np.unpackbits(np.frombuffer(keys.notches, dtype=np.uint8), bitorder='little')
+    notches = bits.reshape(count, n, 256).astype(bool)
+    step = _VECTOR_STEPS.get(type(keys.stepping))
+    text = np.frombuffer(data, dtype=np.uint8).astype(np.intp)
+
+    out = np.empty((count, length), dtype=np.uint8)
+    # A tile's temporaries are a few int32 arrays of keys x characters
+    block = min(length, 4096)
+    tile_keys = max(1, TILE_BYTES // (16 * block))
+    for k0 in range(0, count, tile_keys):
+        k1 = min(count, k0 + tile_keys)
+        rows = np.arange(k0, k1)
+        pos = positions[k0:k1].copy()
+        if step is None:
+            # No vectorized rule: run the strategy per key for the whole input
+            schedules = np.stack([np.frombuffer(bytes(keys.stepping.schedule(keys.rotors(k), length)),
+                                                dtype=np.uint8).reshape(length, n) for k in rows])
+        for c0 in range(0, length, block):
+            c1 = min(length, c0 + block)
+            if step is None:
+                schedule = schedules[:, c0:c1].astype(np.int32)
+            else:
+                schedule = np.empty((k1 - k0, c1 - c0, n), dtype=np.int32)
+                for t in range(c1 - c0):
+                    step(keys.stepping, pos, notches[k0:k1], wirings[k0:k1])
+                    schedule[:, t] = pos
+            shifts = (schedule - rings[k0:k1, None, :]) & 255
+            # Row offsets into the flat (key, rotor, 256) tables
+            bases = (rows[:, None] * n) * 256
+            c = plugboards[rows[:, None], text[None, c0:c1]]
+            for i in range(n - 1, -1, -1):
+                s = shifts[:, :, i]
+                c = (forward_flat[bases + i * 256 + ((c + s) & 255)] - s) & 255
+            c = reflectors[rows[:, None], c]
+            for i in range(n):
+                s = shifts[:, :, i]
+                c = (reverse_flat[bases + i * 256 + ((c + s) & 255)] - s) & 255
+            out[k0:k1, c0:c1] = plugboards[rows[:, None], c]
+    return [row.tobytes() for row in out]
+
+
+# Stepping rules over a (keys, rotors) array of positions, in place. They
+# read the old positions, like the strategies' advance().
+
+def _step_odometer(stepping, pos, notches, wirings) -> None:
+    keys = np.arange(len(pos))
+    carry = np.ones(len(pos), dtype=bool)
+    for i in range(pos.shape[1] - 1, -1, -1):
+        at_notch = notches[keys, i, pos[:, i]]
+        pos[:, i] = (pos[:, i] + carry) & 255
+        carry &= at_notch
+
+
+def _step_enigma(stepping, pos, notches, wirings) -> None:
+    n = pos.shape[1]
+    keys = np.arange(len(pos))
+    at_notch = notches[keys[:, None], np.arange(n)[None, :], pos]
+    move = np.zeros_like(at_notch)
+    move[:, n - 1] = True
+    move[:, :-1] = at_notch[:, 1:]
+    # Rotors between the outermost ones (and the left one of a pair)
+    # double-step off their own notch
+    first = stepping.first_double_stepping(n)
+    move[:, first:-1] |= at_notch[:, first:-1]
+    pos += move
+    pos &= 255
+
+
+def _step_control(stepping, pos, notches, wirings) -> None:
+    n = pos.shape[1]
+    control = stepping.control % n
+    pattern = wirings[np.arange(len(pos)), control, pos[:, control]]
+    for i in range(n):
+        if i != control:
+            pos[:, i] = (pos[:, i] + ((pattern >> (i % 8)) & 1)) & 255
+    pos[:, control] = (pos[:, control] + 1) & 255
+
+
+_VECTOR_STEPS = {
+    OdometerStepping: _step_odometer,
+    EnigmaStepping: _step_enigma,
+    ControlRotorStepping: _step_control,
+}
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(
+        description="Time one input under many keys: per-machine loop against evaluate().")
+    parser.add_argument('--keys', type=int, default=1000)
+    parser.add_argument('--length', type=int, default=256)
+    parser.add_argument('--rotors', type=int, default=3)
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+
+    data = os.urandom(args.length)
+    stack = KeyStack.from_seeds([os.urandom(16) for _ in range(args.keys)], args.rotors)
+
+    start = time.perf_counter()
+    expected = [stack.machine(k).process_bytes(data) for k in range(len(stack))]
+    looped = time.perf_counter() - start
+    print(f"{'machines':>10s}: {looped:8.3f} s")
+    paths = [False] + ([True] if np is not None else [])
+    for use_numpy in paths:
+        start = time.perf_counter()
+        outputs = evaluate(stack, data, args.workers, use_numpy)
+        elapsed = time.perf_counter() - start
+        assert outputs == expected
+        print(f"{'numpy' if use_numpy else 'python':>10s}: {elapsed:8.3f} s ({looped / elapsed:.1f}x)")
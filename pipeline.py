@@ -0,0 +1,423 @@
+from typing import BinaryIO, Callable, List, Optional, Sequence
+import copy
+import hashlib
+import lzma
+import queue
+import threading
+import time
+import zlib
+from machine import RotorMachine
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_BUFFER_SIZE = 256 * 1024
+
+
+class Stage:
+    """
+    One step of a streaming pipeline.
+
+    A stage consumes chunks in order and may hold data back until flush().
+    inverse() returns the stage that undoes this one, for the mirror pipeline.
+    """
+
+    def process(self, chunk: bytes) -> bytes:
+        raise NotImplementedError
+
+    def flush(self) -> bytes:
+        return b''
+
+    def inverse(self) -> 'Stage':
+        raise NotImplementedError
+
+
+class CompressStage(Stage):
+    """Compress the stream with zlib or lzma."""
+
+    def __init__(self, method: str = 'zlib', level: Optional[int] = None):
+        if method not in ('zlib', 'lzma'):
+            raise ValueError(f"Unknown compression method: {method}")
+        self.method = method
+        self.level = level
+        if method == 'zlib':
+            self._compressor = zlib.compressobj(-1 if level is None else level)
+        else:
+            self._compressor = lzma.LZMACompressor(preset=level)
+
+    def process(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def inverse(self) -> Stage:
+        return DecompressStage(self.method)
+
+
+class DecompressStage(Stage):
+    """Decompress a zlib or lzma stream."""
+
+    def __init__(self, method: str = 'zlib'):
+        if method not in ('zlib', 'lzma'):
+            raise ValueError(f"Unknown compression method: {method}")
+        self.method = method
+        if method == 'zlib':
+            self._decompressor = zlib.decompressobj()
+        else:
+            self._decompressor = lzma.LZMADecompressor()
+
+    def process(self, chunk: bytes) -> bytes:
+        return self._decompressor.decompress(chunk)
+
+    def flush(self) -> bytes:
+        if self.method == 'zlib':
+            return self._decompressor.flush()
+        return b''
+
+    def inverse(self) -> Stage:
+        return CompressStage(self.method)
+
+
+class EncryptStage(Stage):
+    """
+    Run the stream through a rotor machine.
+
+    The machine's rotor positions when the stage is created are remembered,
+    so inverse() can decrypt from the same starting state on a copy of the
+    machine while this stage keeps advancing the original.
+    """
+
+    def __init__(self, machine: RotorMachine, engine: Optional[str] = None):
+        self.machine = machine
+        self.engine = engine
+        self.start_positions = machine.get_rotor_positions()
+
+    def process(self, chunk: bytes) -> bytes:
+        return self.machine.process_bytes(chunk, self.engine)
+
+    def inverse(self) -> Stage:
+        machine = copy.deepcopy(self.machine)
+        machine.set_rotor_positions(self.start_positions)
+        return EncryptStage(machine, self.engine)
+
+
+class ChecksumStage(Stage):
+    """
+    Pass data through unchanged while computing a CRC-32 or hashlib digest.
+
+    The mirror pipeline places the inverse checksum at the same point of the
+    stream, so comparing the two digests verifies the round trip.
+    """
+
+    def __init__(self, algorithm: str = 'crc32'):
+        self.algorithm = algorithm
+        if algorithm == 'crc32':
+            self._crc = 0
+            self._hash = None
+        else:
+            self._hash = hashlib.new(algorithm)
+
+    def process(self, chunk: bytes) -> bytes:
+        if self._hash is None:
+            self._crc = zlib.crc32(chunk, self._crc)
+        else:
+            self._hash.update(chunk)
+        return chunk
+
+    def digest(self) -> bytes:
+        if self._hash is None:
+            return self._crc.to_bytes(4, 'big')
+        return self._hash.digest()
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+    def inverse(self) -> Stage:
+        return ChecksumStage(self.algorithm)
+
+
+class Pipeline:
+    """
+    A chain of stages applied to a stream in a single pass.
+
+    Each chunk flows through every stage before the next one is read, so the
+    whole input is never held in memory and no stage re-reads another's
+    output. The decrypting pipeline is inverse(): the inverse of each stage,
+    in reverse order.
+    """
+
+    def __init__(self, stages: Sequence[Stage]):
+        self.stages: List[Stage] = list(stages)
+
+    def feed(self, chunk: bytes) -> bytes:
+        """Push one chunk through all stages and return what comes out."""
+        for stage in self.stages:
+            if not chunk:
+                break
+            chunk = stage.process(chunk)
+        return chunk
+
+    def finish(self) -> bytes:
+        """Flush every stage, passing each tail through the stages after it."""
+        out = []
+        for i, stage in enumerate(self.stages):
+            tail = stage.flush()
+            for later in self.stages[i + 1:]:
+                if not tail:
+                    break
+                tail = later.process(tail)
+            if tail:
+                out.append(tail)
+        return b''.join(out)
+
+    def run(self, source: BinaryIO, sink: BinaryIO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+        """
+        Stream source through the pipeline into sink.
+
+        Input is read into one reused buffer.
+
+        Returns:
+            int: Number of bytes read from source
+        """
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        total = 0
+        while True:
+            count = source.readinto(buffer)
+            if not count:
+                break
+            total += count
+            out = self.feed(view[:count])
+            if out:
+                sink.write(out)
+        tail = self.finish()
+        if tail:
+            sink.write(tail)
+        return total
+
+    def run_threaded(self, source: BinaryIO, sink: BinaryIO, buffer_count: int = 3,
+                     buffer_size: int = DEFAULT_BUFFER_SIZE,
+                     progress: Optional[Callable[[int], None]] = None) -> 'ThreadedRunner':
+        """
+        Stream source through the pipeline with read-ahead and write-behind
+        threads (see ThreadedRunner).
+
+        Returns:
+            The runner, whose report() shows where the time went
+        """
+        runner = ThreadedRunner(self.feed, self.finish, buffer_count, buffer_size)
+        runner.run(source, sink, progress)
+        return runner
+
+    def process(self, data: bytes) -> bytes:
+        """Run a complete in-memory payload through the pipeline."""
+        return self.feed(data) + self.finish()
+
+    def inverse(self) -> 'Pipeline':
+        return Pipeline([stage.inverse() for stage in reversed(self.stages)])
+
+    def checksums(self) -> List[ChecksumStage]:
+        return [stage for stage in self.stages if isinstance(stage, ChecksumStage)]
+
+
+def encryption_pipeline(machine: RotorMachine, compression: Optional[str] = 'zlib',
+                        checksum: Optional[str] = 'crc32') -> Pipeline:
+    """
+    Build the usual compress → encrypt → checksum pipeline.
+
+    Args:
+        machine: The machine to encrypt with
+        compression: 'zlib', 'lzma' or None
+        checksum: 'crc32', a hashlib algorithm name, or None
+    """
+    stages: List[Stage] = []
+    if compression:
+        stages.append(CompressStage(compression))
+    stages.append(EncryptStage(machine))
+    if checksum:
+        stages.append(ChecksumStage(checksum))
+    return Pipeline(stages)
+
+
+class StageTimes:
+    """Time one pipeline stage spent working and waiting on its neighbours."""
+
+    def __init__(self):
+        self.busy = 0.0
+        self.waiting = 0.0
+
+
+class ThreadedRunner:
+    """
+    Read-ahead / write-behind runner around a chunk transform.
+
+    A reader thread fills a fixed set of preallocated buffers from the
+    source, the calling thread runs the transform (typically a Pipeline's
+    feed, with the encryption core) on each filled buffer and hands the
+    buffer straight back to the reader, and a writer thread drains the
+    results to the sink. With buffer_count buffers the reader can be that
+    many chunks ahead, and at most buffer_count results wait for the writer,
+    so disk and CPU overlap while memory stays bounded.
+
+    Each stage's busy and waiting time is recorded; the busiest stage is the
+    bottleneck.
+    """
+
+    def __init__(self, transform: Callable[[memoryview], bytes],
+                 finish: Optional[Callable[[], bytes]] = None,
+                 buffer_count: int = 3, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        """
+        Args:
+            transform: Called with each chunk (a view of a reused buffer, only
+                valid during the call); returns the bytes to write
+            finish: Called once at the end; returns the final bytes to write
+            buffer_count: Number of read buffers in rotation (at least 2)
+            buffer_size: Bytes per buffer
+        """
+        if buffer_count < 2:
+            raise ValueError("buffer_count must be at least 2")
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be a positive integer")
+        self.transform = transform
+        self.finish = finish
+        self.buffer_count = buffer_count
+        self.buffer_size = buffer_size
+        self.buffers = [bytearray(buffer_size) for _ in range(buffer_count)]
+        self.times = {name: StageTimes() for name in ('read', 'transform', 'write')}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.seconds = 0.0
+
+    def run(self, source: BinaryIO, sink: BinaryIO,
+            progress: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Stream source through the transform into sink.
+
+        Args:
+            source: Readable binary file (must support readinto)
+            sink: Writable binary file
+            progress: Called from the calling thread with the number of
+                bytes transformed so far, after each chunk
+
+        Returns:
+            int: Number of bytes read from source
+        """
+        self.times = {name: StageTimes() for name in ('read', 'transform', 'write')}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        free: queue.Queue = queue.Queue()
+        for i in range(self.buffer_count):
+            free.put(i)
+        filled: queue.Queue = queue.Queue()
+        results: queue.Queue = queue.Queue(maxsize=self.buffer_count)
+        stop = threading.Event()
+        errors: List[BaseException] = []
+
+        def read() -> None:
+            times = self.times['read']
+            try:
+                while True:
+                    start = time.perf_counter()
+                    i = free.get()
+                    ready = time.perf_counter()
+                    times.waiting += ready - start
+                    if i is None or stop.is_set():
+                        break
+                    count = source.readinto(self.buffers[i])
+                    times.busy += time.perf_counter() - ready
+                    if not count:
+                        break
+                    filled.put((i, count))
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                filled.put(None)
+
+        def write() -> None:
+            times = self.times['write']
+            try:
+                while True:
+                    start = time.perf_counter()
+                    data = results.get()
+                    ready = time.perf_counter()
+                    times.waiting += ready - start
+                    if data is None:
+                        break
+                    if not stop.is_set():
+                        sink.write(data)
+                        self.bytes_written += len(data)
+                    times.busy += time.perf_counter() - ready
+            except BaseException as e:
+                errors.append(e)
+                # Unblock the other two stages
+                stop.set()
+                free.put(None)
+                while results.get() is not None:
+                    pass
+
+        reader = threading.Thread(target=read, name='pipeline-reader', daemon=True)
+        writer = threading.Thread(target=write, name='pipeline-writer', daemon=True)
+        run_start = time.perf_counter()
+        reader.start()
+        writer.start()
+        times = self.times['transform']
+        try:
+            while not stop.is_set():
+                start = time.perf_counter()
+                item = filled.get()
+                ready = time.perf_counter()
+                times.waiting += ready - start
+                if item is None:
+                    break
+                i, count = item
+                out = self.transform(memoryview(self.buffers[i])[:count])
+                # The output may be a view of the buffer (e.g. ChecksumStage
+                # passes its input through), so copy it before the reader
+                # gets the buffer back
+                out = bytes(out) if out else b''
+                free.put(i)
+                self.bytes_read += count
+                done = time.perf_counter()
+                times.busy += done - ready
+                if out:
+                    results.put(out)
+                times.waiting += time.perf_counter() - done
+                if progress is not None:
+                    progress(self.bytes_read)
+            if self.finish is not None and not stop.is_set() and not errors:
+                start = time.perf_counter()
+                tail = self.finish()
+                times.busy += time.perf_counter() - start
+                if tail:
+                    results.put(tail)
+        except BaseException:
+            stop.set()
+            free.put(None)
+            raise
+        finally:
+            results.put(None)
+            writer.join()
+            reader.join()
+            self.seconds = time.perf_counter() - run_start
+        if errors:
+            raise errors[0]
+        return self.bytes_read
+
+    def report(self) -> dict:
+        """Per-stage busy/waiting seconds and utilization, plus the bottleneck."""
+        stages = {}
+        for name, times in self.times.items():
+            stages[name] = {
+                'busy_seconds': times.busy,
+                'waiting_seconds': times.waiting,
+                'utilization': times.busy / self.seconds if self.seconds else 0.0,
+            }
+        return {
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'seconds': self.seconds,
+            'bytes_per_second': self.bytes_read / self.seconds if self.seconds else None,
+            'buffer_count': self.buffer_count,
+            'buffer_size': self.buffer_size,
+            'stages': stages,
+            'bottleneck': max(stages, key=lambda name: stages[name]['utilization']),
+        }
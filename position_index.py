@@ -0,0 +1,313 @@
+from bisect import bisect_left, bisect_right
+from itertools import product
+from typing import Callable, Iterator, List, Optional
+import copy
+import heapq
+import mmap
+import os
+import random
+import shutil
+import struct
+import tempfile
+import time
+from machine import RotorMachine
+from engines import encrypt_composite
+
+# Probe encrypted from every start state; its output identifies the state
+DEFAULT_PROBE = bytes(16)
+
+# File layout: header | probe | records sorted by (key, positions). The header
+# holds the magic, rotor count, key length, probe length, number of records,
+# number of distinct keys, sum of squared key counts and key fingerprint.
+MAGIC = b'RPI1'
+_HEADER = struct.Struct('>4sBBHQQQ32s')
+
+
+class PositionIndex:
+    """
+    Sorted, memory-mapped index from the first key_bytes output bytes of a
+    fixed probe to the rotor start positions that produce them, for one key.
+
+    Build it once with build_index(); looking up a session's leading output
+    is then a binary search over the file instead of a sweep over every start
+    state. The key length is the time-memory trade-off: each record costs
+    key_bytes + num_rotors bytes on disk, and shorter keys leave more
+    colliding candidates for recover() to rule out by re-encrypting.
+    """
+
+    def __init__(self, path: str):
+        """Open an index written by build_index()."""
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            (magic, self.num_rotors, self.key_bytes, probe_length, self.entries,
+             self.distinct_keys, self._sum_squares, fingerprint) = _HEADER.unpack_from(self._map, 0)
+        except (ValueError, struct.error):
+            self._file.close()
+            raise ValueError(f"Not a position index: {path}")
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Not a position index: {path}")
+        self.fingerprint = fingerprint.hex()
+        self.probe = bytes(self._map[_HEADER.size:_HEADER.size + probe_length])
+        self._start = _HEADER.size + probe_length
+        self._record = self.key_bytes + self.num_rotors
+        self._keys = _KeyView(self._map, self._start, self._record, self.key_bytes, self.entries)
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> 'PositionIndex':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.entries
+
+    @property
+    def expected_candidates(self) -> float:
+        """Average number of candidates returned for a real session's output."""
+        return self._sum_squares / self.entries if self.entries else 0.0
+
+    def lookup(self, output: bytes) -> List[List[int]]:
+        """
+        Start positions whose probe output begins with output[:key_bytes].
+
+        Args:
+            output: Machine output for the probe (at least key_bytes long)
+        """
+        if len(output) < self.key_bytes:
+            raise ValueError(f"Need at least {self.key_bytes} output bytes")
+        key = bytes(output[:self.key_bytes])
+        low = bisect_left(self._keys, key)
+        high = bisect_right(self._keys, key, low)
+        candidates = []
+        for i in range(low, high):
+            offset = self._start + i * self._record + self.key_bytes
+            candidates.append(list(self._map[offset:offset + self.num_rotors]))
+        return candidates
+
+    def recover(self, machine: RotorMachine, output: bytes) -> List[List[int]]:
+        """
+        Start positions consistent with all of output, which is the machine's
+        output for (a prefix of) the probe.
+
+        Candidates from lookup() are re-encrypted on a copy of machine to rule
+        out collisions on the indexed prefix.
+        """
+        if machine.key_fingerprint() != self.fingerprint:
+            raise ValueError("The index was built for a different key")
+        length = min(len(output), len(self.probe))
+        trial = copy.deepcopy(machine)
+        matches = []
+        for positions in self.lookup(output):
+            trial.set_rotor_positions(positions)
+            if trial.process_bytes(self.probe[:length]) == bytes(output[:length]):
+                matches.append(positions)
+        return matches
+
+    def report(self, samples: int = 1000) -> dict:
+        """Size on disk, candidate counts and measured lookup latency."""
+        size = os.path.getsize(self.path)
+        latency = None
+        if self.entries:
+            keys = [self._keys[random.randrange(self.entries)] for _ in range(samples)]
+            start = time.perf_counter()
+            for key in keys:
+                self.lookup(key)
+            latency = (time.perf_counter() - start) / samples
+        return {
+            'entries': self.entries,
+            'key_bytes': self.key_bytes,
+            'file_bytes': size,
+            'bytes_per_entry': size / self.entries if self.entries else None,
+            'distinct_keys': self.distinct_keys,
+            'expected_candidates': self.expected_candidates,
+            'lookup_seconds': latency,
+        }
+
+
+class _KeyView:
+    """Sequence view of the record keys, for bisect."""
+
+    def __init__(self, data: mmap.mmap, start: int, record: int, key_bytes: int, length: int):
+        self.data = data
+        self.start = start
+        self.record = record
+        self.key_bytes = key_bytes
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, i: int) -> bytes:
+        offset = self.start + i * self.record
+        return self.data[offset:offset + self.key_bytes]
+
+
+def build_index(machine: RotorMachine, path: str, key_bytes: int = 4,
+                probe: bytes = DEFAULT_PROBE, max_records: int = 1 << 20,
+                progress: Optional[Callable[[int, int], None]] = None) -> PositionIndex:
+    """
+    Index every start state of the machine's key by its probe output.
+
+    Records are produced one slow-rotor state at a time, sorted in runs of
+    at most max_records and merged into the final file, so memory stays
+    bounded whatever the number of rotors. The machine itself is not changed.
+
+    Args:
+        machine: Machine whose key (wirings, rings, reflector, plugboard,
+            stepping) is indexed; its positions don't matter
+        path: Output file
+        key_bytes: Output bytes per key
+        probe: Input encrypted from each start state (at least key_bytes long)
+        max_records: Records sorted in memory at a time
+        progress: Called with (records done, total records) after each slow state
+
+    Returns:
+        The opened index
+    """
+    if not 1 <= key_bytes <= len(probe):
+        raise ValueError("key_bytes must be between 1 and the probe length")
+    num_rotors = machine.num_rotors
+    record = key_bytes + num_rotors
+    total = 256 ** num_rotors
+    work_dir = tempfile.mkdtemp(prefix='position-index-', dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        runs = []
+        batch: List[bytes] = []
+        done = 0
+        for records in _records(machine, probe[:key_bytes]):
+            batch.extend(records)
+            done += len(records)
+            if len(batch) >= max_records:
+                runs.append(_write_run(sorted(batch), work_dir, len(runs)))
+                batch = []
+            if progress is not None:
+                progress(done, total)
+        if runs:
+            if batch:
+                runs.append(_write_run(sorted(batch), work_dir, len(runs)))
+            merged = heapq.merge(*(_read_run(run, record) for run in runs))
+        else:
+            merged = iter(sorted(batch))
+
+        tmp_path = os.path.join(work_dir, 'index.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(bytes(_HEADER.size))
+            f.write(probe)
+            entries = distinct = sum_squares = 0
+            previous = None
+            count = 0
+            for item in merged:
+                f.write(item)
+                key = item[:key_bytes]
+                if key != previous:
+                    sum_squares += count * count
+                    distinct += 1
+                    previous = key
+                    count = 0
+                count += 1
+                entries += 1
+            sum_squares += count * count
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, num_rotors, key_bytes, len(probe), entries, distinct,
+                                 sum_squares, bytes.fromhex(machine.key_fingerprint())))
+        os.replace(tmp_path, path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return PositionIndex(path)
+
+
+def _records(machine: RotorMachine, probe: bytes) -> Iterator[List[bytes]]:
+    """
+    Yield key | positions records, 256 at a time: every position of the fast
+    rotor for one state of the others.
+
+    While only the fast rotor moves, the output for start position p is
+    T[p + 1][probe[0]], T[p + 2][probe[1]], ... where T[s] is the whole
+    machine at fast-rotor shift s. So for each slow state the probe is pushed
+    through all 256 shifts once, and every key is then one strided slice.
+    Start states whose probe output would move another rotor are encrypted
+    normally.
+    """
+    machine = copy.deepcopy(machine)
+    rotors = machine.rotors
+    stepping = machine.stepping
+    n = len(rotors)
+    k = len(probe)
+    fast = (stepping.every_char if stepping.every_char is not None else -1) % n
+    forward, backward = rotors[fast].shift_tables()
+    layers = [(bytes(forward[s << 8:(s + 1) << 8]), bytes(backward[s << 8:(s + 1) << 8]))
+              for s in range(256)]
+    ring = rotors[fast].ring_setting
+    span = (k - 1) * (k + 1) + 1
+
+    for slow in product(range(256), repeat=n - 1):
+        positions = list(slow)
+        positions.insert(fast, 0)
+        outer_in, inner, outer_out = machine.composite_tables(positions, fast)
+        entry = probe.translate(outer_in)
+        # Row s holds the probe encrypted at fast shift s; the first k rows
+        # are repeated so keys can wrap around
+        rows = b''.join(entry.translate(f).translate(inner).translate(b).translate(outer_out)
+                        for f, b in layers)
+        rows += rows[:k * k]
+
+        records = []
+        quiet = 0
+        for p in range(256):
+            positions[fast] = p
+            # Reaching p + 1 from p is itself a quiet step, so the count
+            # only needs recomputing once it runs low
+            if quiet < k:
+                quiet = stepping.quiet_steps(positions, rotors, 256)
+            if quiet >= k:
+                base = ((p + 1 - ring) % 256) * k
+                key = rows[base:base + span:k + 1]
+            else:
+                machine.set_rotor_positions(positions)
+                key = encrypt_composite(machine, probe)
+            records.append(key + bytes(positions))
+            quiet -= 1
+        yield records
+
+
+def _write_run(records: List[bytes], directory: str, number: int) -> str:
+    path = os.path.join(directory, f"run-{number:05d}")
+    with open(path, 'wb') as f:
+        f.write(b''.join(records))
+    return path
+
+
+def _read_run(path: str, record: int) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(record * 4096)
+            if not block:
+                break
+            for offset in range(0, len(block), record):
+                yield block[offset:offset + record]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Build position indexes for a random key and report size against lookup cost.")
+    parser.add_argument('prefix', help="Output path prefix (one file per key length)")
+    parser.add_argument('--rotors', type=int, default=2)
+    parser.add_argument('--key-bytes', type=int, nargs='+', default=[2, 3, 4])
+    args = parser.parse_args()
+
+    machine = RotorMachine(num_rotors=args.rotors)
+    print(f"{'key bytes':>9s} {'file MB':>9s} {'B/entry':>8s} {'candidates':>10s} {'lookup us':>10s}")
+    for key_bytes in args.key_bytes:
+        with build_index(machine, f"{args.prefix}-k{key_bytes}.idx", key_bytes) as index:
+            report = index.report()
+        print(f"{key_bytes:9d} {report['file_bytes'] / 1e6:9.2f} {report['bytes_per_entry']:8.2f} "
+              f"{report['expected_candidates']:10.2f} {report['lookup_seconds'] * 1e6:10.1f}")
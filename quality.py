@@ -0,0 +1,365 @@
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+import copy
+import math
+import operator
+import os
+import time
+from machine import RotorMachine
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+# Bytes per bulk call; small enough that the dispatcher never picks the
+# parallel engine inside a worker
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Two-sided significance level for the pass/fail verdicts
+ALPHA = 1e-3
+
+
+class ByteFrequency:
+    """Byte counts, tested for uniformity with a chi-square test."""
+
+    def __init__(self):
+        self.counts = [0] * 256
+
+    def prime(self, history: bytes) -> None:
+        pass
+
+    def update(self, data: bytes) -> None:
+        counts = self.counts
+        if np is not None:
+            for value, count in enumerate(np.bincount(np.frombuffer(data, dtype=np.uint8),
+                                                      minlength=256).tolist()):
+                counts[value] += count
+        else:
+            for value, count in Counter(data).items():
+                counts[value] += count
+
+    def merge(self, other: 'ByteFrequency') -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    def result(self) -> dict:
+        total = sum(self.counts)
+        expected = total / 256
+        chi_square = sum((count - expected) ** 2 for count in self.counts) / expected if total else 0.0
+        p_value = _chi_square_p(chi_square, 255) if total else None
+        return {
+            'bytes': total,
+            'chi_square': chi_square,
+            'degrees_of_freedom': 255,
+            'p_value': p_value,
+            'missing_values': [v for v, count in enumerate(self.counts) if not count],
+            'pass': p_value is not None and p_value >= ALPHA,
+        }
+
+
+class SerialCorrelation:
+    """Correlation between each byte and the next (Knuth's serial test)."""
+
+    def __init__(self):
+        self.pairs = 0
+        self.sum_x = 0
+        self.sum_y = 0
+        self.sum_xx = 0
+        self.sum_yy = 0
+        self.sum_xy = 0
+        self.last: Optional[int] = None
+
+    def prime(self, history: bytes) -> None:
+        if history:
+            self.last = history[-1]
+
+    def update(self, data: bytes) -> None:
+        if not data:
+            return
+        # Pairs (x, y) = (byte, next byte), including the one across the
+        # previous call's boundary
+        xs = data[:-1] if self.last is None else bytes([self.last]) + data[:-1]
+        ys = data if self.last is not None else data[1:]
+        self.last = data[-1]
+        if not ys:
+            return
+        self.pairs += len(ys)
+        if np is not None:
+            x = np.frombuffer(xs, dtype=np.uint8).astype(np.int64)
+            y = np.frombuffer(ys, dtype=np.uint8).astype(np.int64)
+            self.sum_x += int(x.sum())
+            self.sum_y += int(y.sum())
+            self.sum_xx += int(np.dot(x, x))
+            self.sum_yy += int(np.dot(y, y))
+            self.sum_xy += int(np.dot(x, y))
+        else:
+            self.sum_x += sum(xs)
+            self.sum_y += sum(ys)
+            self.sum_xx += sum(map(operator.mul, xs, xs))
+            self.sum_yy += sum(map(operator.mul, ys, ys))
+            self.sum_xy += sum(map(operator.mul, xs, ys))
+
+    def merge(self, other: 'SerialCorrelation') -> None:
+        for name in ('pairs', 'sum_x', 'sum_y', 'sum_xx', 'sum_yy', 'sum_xy'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.last = other.last
+
+    def result(self) -> dict:
+        n = self.pairs
+        denominator = math.sqrt(max(n * self.sum_xx - self.sum_x ** 2, 0)
+                                * max(n * self.sum_yy - self.sum_y ** 2, 0))
+        coefficient = (n * self.sum_xy - self.sum_x * self.sum_y) / denominator if denominator else 0.0
+        z = coefficient * math.sqrt(n)
+        return {
+            'pairs': n,
+            'coefficient': coefficient,
+            'z': z,
+            'p_value': _normal_p(z),
+            'pass': n > 0 and _normal_p(z) >= ALPHA,
+        }
+
+
+class PeriodRepetition:
+    """How often a byte equals the byte one period later (1/256 if unrelated)."""
+
+    def __init__(self, period: int):
+        if period < 1:
+            raise ValueError("Period must be a positive integer")
+        self.period = period
+        self.compared = 0
+        self.matches = 0
+        self.tail = b''
+
+    def prime(self, history: bytes) -> None:
+        self.tail = bytes(history[-self.period:])
+
+    def update(self, data: bytes) -> None:
+        window = self.tail + bytes(data)
+        count = len(window) - self.period
+        if count > 0:
+            # Compare window[i] with window[i + period] for every i at once:
+            # equal bytes are the zero bytes of the XOR
+            difference = (int.from_bytes(window[:count], 'little')
+                          ^ int.from_bytes(window[self.period:], 'little'))
+            self.matches += difference.to_bytes(count, 'little').count(0)
+            self.compared += count
+        self.tail = window[-self.period:]
+
+    def merge(self, other: 'PeriodRepetition') -> None:
+        self.compared += other.compared
+        self.matches += other.matches
+        self.tail = other.tail
+
+    def result(self) -> dict:
+        n = self.compared
+        expected = n / 256
+        sigma = math.sqrt(n * (1 / 256) * (255 / 256))
+        z = (self.matches - expected) / sigma if sigma else 0.0
+        return {
+            'period': self.period,
+            'compared': n,
+            'matches': self.matches,
+            'rate': self.matches / n if n else None,
+            'expected_rate': 1 / 256,
+            'z': z,
+            'p_value': _normal_p(z),
+            'pass': n > 0 and _normal_p(z) >= ALPHA,
+        }
+
+
+class Avalanche:
+    """Output bits and bytes that change when one rotor starts one position later."""
+
+    def __init__(self, rotor: int):
+        self.rotor = rotor
+        self.bits = 0
+        self.flipped_bits = 0
+        self.changed_bytes = 0
+
+    def update(self, base: bytes, variant: bytes) -> None:
+        difference = int.from_bytes(base, 'little') ^ int.from_bytes(variant, 'little')
+        self.bits += 8 * len(base)
+        self.flipped_bits += difference.bit_count()
+        self.changed_bytes += len(base) - difference.to_bytes(len(base), 'little').count(0)
+
+    def merge(self, other: 'Avalanche') -> None:
+        self.bits += other.bits
+        self.flipped_bits += other.flipped_bits
+        self.changed_bytes += other.changed_bytes
+
+    def result(self) -> dict:
+        n = self.bits
+        z = (self.flipped_bits - n / 2) / math.sqrt(n / 4) if n else 0.0
+        return {
+            'rotor': self.rotor,
+            'bits': n,
+            'bit_flip_rate': self.flipped_bits / n if n else None,
+            'byte_change_rate': self.changed_bytes / (n // 8) if n else None,
+            'z': z,
+            'p_value': _normal_p(z),
+            'pass': n > 0 and _normal_p(z) >= ALPHA,
+        }
+
+
+def run_suite(machine: RotorMachine, total_bytes: int, plaintext: bytes = b'\x00',
+              periods: Sequence[int] = (256,), avalanche_bytes: int = 1 << 20,
+              chunk_size: int = DEFAULT_CHUNK_SIZE, workers: Optional[int] = None) -> dict:
+    """
+    Run the quality tests over total_bytes of the machine's output.
+
+    The output is produced and consumed chunk by chunk by the bulk engines
+    and every test keeps only running sums (plus one period of history), so
+    memory use doesn't depend on total_bytes. The stream is split into one
+    part per worker process; each part starts a little early to pick up the
+    history its tests need, and the per-part results are merged exactly.
+
+    Args:
+        machine: Machine to test, from its current positions (not modified)
+        total_bytes: Output bytes to test
+        plaintext: Input pattern, repeated (all zeros by default, so the
+            output depends on the machine alone)
+        periods: Distances for the repetition test (256 is one turn of the
+            fastest rotor)
+        avalanche_bytes: Output bytes compared for each rotor in the
+            avalanche test (each costs an extra encryption pass)
+        chunk_size: Bytes per bulk call
+        workers: Worker processes (default: one per core)
+
+    Returns:
+        A JSON-serializable report
+    """
+    if not plaintext:
+        raise ValueError("plaintext pattern must not be empty")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, total_bytes // chunk_size))
+    start_time = time.perf_counter()
+
+    context = max(periods, default=1)
+    avalanche_bytes = min(avalanche_bytes, total_bytes)
+    part_size = -(-total_bytes // workers) if total_bytes else 0
+    jobs = []
+    for start in range(0, total_bytes, part_size or 1):
+        end = min(start + part_size, total_bytes)
+        history = min(context, start)
+        base = copy.deepcopy(machine)
+        base.advance(start - history)
+        variants = None
+        if start < avalanche_bytes:
+            variants = []
+            for i in range(machine.num_rotors):
+                variant = copy.deepcopy(machine)
+                positions = variant.get_rotor_positions()
+                positions[i] += 1
+                variant.set_rotor_positions(positions)
+                variant.advance(start)
+                variants.append(variant)
+        jobs.append((base, variants, plaintext, start, end, history, periods,
+                     avalanche_bytes, chunk_size))
+
+    if len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_part, *zip(*jobs)))
+    else:
+        results = [_run_part(*job) for job in jobs]
+
+    tests = _new_tests(machine.num_rotors, periods)
+    for part in results:
+        for name, accumulators in part.items():
+            for accumulator, other in zip(tests[name], accumulators):
+                accumulator.merge(other)
+
+    seconds = time.perf_counter() - start_time
+    report_tests = {
+        'byte_frequency': tests['byte_frequency'][0].result(),
+        'serial_correlation': tests['serial_correlation'][0].result(),
+        'period_repetition': [test.result() for test in tests['period_repetition']],
+        'avalanche': [test.result() for test in tests['avalanche']],
+    }
+    verdicts = [report_tests['byte_frequency']['pass'], report_tests['serial_correlation']['pass']]
+    verdicts += [result['pass'] for result in report_tests['period_repetition']]
+    verdicts += [result['pass'] for result in report_tests['avalanche']]
+    return {
+        'key_fingerprint': machine.key_fingerprint(),
+        'stepping': str(machine.stepping),
+        'num_rotors': machine.num_rotors,
+        'start_positions': machine.get_rotor_positions(),
+        'plaintext': plaintext.hex(),
+        'bytes': total_bytes,
+        'workers': len(jobs),
+        'seconds': seconds,
+        'bytes_per_second': total_bytes / seconds if seconds else None,
+        'alpha': ALPHA,
+        'tests': report_tests,
+        'pass': all(verdicts),
+    }
+
+
+def _new_tests(num_rotors: int, periods: Sequence[int]) -> Dict[str, list]:
+    return {
+        'byte_frequency': [ByteFrequency()],
+        'serial_correlation': [SerialCorrelation()],
+        'period_repetition': [PeriodRepetition(period) for period in periods],
+        'avalanche': [Avalanche(i) for i in range(num_rotors)],
+    }
+
+
+def _run_part(machine: RotorMachine, variants: Optional[List[RotorMachine]], plaintext: bytes,
+              start: int, end: int, history: int, periods: Sequence[int],
+              avalanche_bytes: int, chunk_size: int) -> Dict[str, list]:
+    """Worker entry point: test output bytes [start, end)."""
+    tests = _new_tests(machine.num_rotors, periods)
+    streaming = tests['byte_frequency'] + tests['serial_correlation'] + tests['period_repetition']
+    if history:
+        context = machine.process_bytes(_pattern(plaintext, start - history, history))
+        for test in streaming:
+            test.prime(context)
+
+    for offset in range(start, end, chunk_size):
+        data = _pattern(plaintext, offset, min(chunk_size, end - offset))
+        output = machine.process_bytes(data)
+        for test in streaming:
+            test.update(output)
+        if variants is not None and offset < avalanche_bytes:
+            compared = min(len(data), avalanche_bytes - offset)
+            for test, variant in zip(tests['avalanche'], variants):
+                test.update(output[:compared], variant.process_bytes(data[:compared]))
+    return tests
+
+
+def _pattern(plaintext: bytes, offset: int, size: int) -> bytes:
+    """size bytes of the endlessly repeated plaintext, starting at offset."""
+    start = offset % len(plaintext)
+    repeated = plaintext * (-(-(start + size) // len(plaintext)))
+    return repeated[start:start + size]
+
+
+def _normal_p(z: float) -> float:
+    """Two-sided p-value of a standard normal statistic."""
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+def _chi_square_p(x: float, k: int) -> float:
+    """Upper-tail p-value of a chi-square statistic (Wilson-Hilferty approximation)."""
+    z = ((x / k) ** (1 / 3) - (1 - 2 / (9 * k))) / math.sqrt(2 / (9 * k))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Run the cipher quality tests on a random key.")
+    parser.add_argument('--rotors', type=int, default=3)
+    parser.add_argument('--bytes', type=int, default=16 * 1024 * 1024)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run_suite(RotorMachine(num_rotors=args.rotors), args.bytes, workers=args.workers)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,279 @@
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+
+# Spill file layout: number of rotors, then the rotor steps, then the output
+_SPILL_HEADER = struct.Struct('>H')
+
+
+class EncryptionCache:
+    """
+    Content-addressed cache of process_bytes results.
+
+    An entry is keyed by hash(key fingerprint, start state, input digest) and
+    holds the output and how far each rotor stepped, which is everything a
+    call changes, so a hit can stand in for running the machine. The machine
+    keys entries on its hardware fingerprint and canonical_setting(), so
+    equivalent (positions, ring settings) share one entry. Attach one to a
+    machine with machine.cache = EncryptionCache(...); several machines may
+    share a cache, since the fingerprint keeps their entries apart.
+
+    Entries live in memory under an LRU bound on their total size. With a
+    spill directory, entries evicted from memory are written there instead of
+    being dropped and are promoted back on their next hit.
+    """
+
+    def __init__(self, max_bytes: int = 64 << 20, spill_dir: Optional[str] = None,
+                 max_spill_bytes: Optional[int] = None):
+        """
+        Args:
+            max_bytes: Bound on the output bytes held in memory
+            spill_dir: Directory for entries evicted from memory (None drops them)
+            max_spill_bytes: Bound on the spill directory's size (None for no bound)
+        """
+        if max_bytes < 0:
+            raise ValueError("max_bytes must not be negative")
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = max_spill_bytes
+        self._lock = threading.Lock()
+        self._memory: 'OrderedDict[bytes, Tuple[bytes, Tuple[int, ...]]]' = OrderedDict()
+        self._memory_bytes = 0
+        self._spilled: 'OrderedDict[bytes, int]' = OrderedDict()
+        self._spilled_bytes = 0
+        self.hits = 0
+        self.memory_hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+        self.spills = 0
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._load_spilled()
+
+    @staticmethod
+    def key(fingerprint: str, state: Sequence[Sequence[int]], data: bytes) -> bytes:
+        """
+        Cache key for processing data from a start state under a key fingerprint.
+
+        Args:
+            fingerprint: Hex fingerprint of the machine's key
+            state: Sequences of bytes that fix the start state, e.g. a
+                CanonicalSetting (or just the rotor positions)
+            data: The input
+        """
+        digest = hashlib.sha256(bytes.fromhex(fingerprint))
+        for part in state:
+            digest.update(bytes([len(part)]))
+            digest.update(bytes(part))
+        digest.update(hashlib.sha256(data).digest())
+        return digest.digest()
+
+    def get(self, key: bytes, length: int) -> Optional[Tuple[bytes, Tuple[int, ...]]]:
+        """
+        Look up an entry, counting the hit or miss.
+
+        Args:
+            key: From key()
+            length: Length of the input, which the output must match; a
+                spilled entry that doesn't (a damaged file) counts as a miss
+
+        Returns:
+            (output, rotor steps), or None on a miss
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+            elif key in self._spilled:
+                entry = self._read_spilled(key, length)
+                if entry is not None:
+                    self.spill_hits += 1
+                    self._insert(key, entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.bytes_saved += len(entry[0])
+            return entry
+
+    def put(self, key: bytes, output: bytes, positions: Sequence[int]) -> None:
+        """Store the output and rotor steps (or final positions) of a call under key."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._insert(key, (bytes(output), tuple(positions)))
+
+    def clear(self) -> None:
+        """Drop every entry, including spilled ones; the counters are kept."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            for key in list(self._spilled):
+                self._remove_spilled(key)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._memory) + sum(1 for key in self._spilled if key not in self._memory)
+
+    def snapshot(self) -> dict:
+        """Copy of the counters and current sizes."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'memory_hits': self.memory_hits,
+                'spill_hits': self.spill_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'bytes_saved': self.bytes_saved,
+                'evictions': self.evictions,
+                'spills': self.spills,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'spilled_entries': len(self._spilled),
+                'spilled_bytes': self._spilled_bytes,
+            }
+
+    def __getstate__(self) -> dict:
+        # Locks can't be copied or pickled; copies get a fresh one
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _insert(self, key: bytes, entry: Tuple[bytes, Tuple[int, ...]]) -> None:
+        size = len(entry[0])
+        if size > self.max_bytes:
+            # Too big to hold in memory at all
+            self._spill(key, entry)
+            return
+        self._memory[key] = entry
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_bytes:
+            old_key, old_entry = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old_entry[0])
+            self.evictions += 1
+            self._spill(old_key, old_entry)
+
+    def _spill(self, key: bytes, entry: Tuple[bytes, Tuple[int, ...]]) -> None:
+        if self.spill_dir is None:
+            return
+        if key in self._spilled:
+            self._spilled.move_to_end(key)
+            return
+        output, positions = entry
+        size = len(output)
+        if self.max_spill_bytes is not None and size > self.max_spill_bytes:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.spill_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_SPILL_HEADER.pack(len(positions)))
+                f.write(bytes(positions))
+                f.write(output)
+            os.replace(tmp_path, self._spill_path(key))
+        except OSError:
+            # A failed spill only loses the entry
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self._spilled[key] = size
+        self._spilled_bytes += size
+        self.spills += 1
+        self._trim_spilled()
+
+    def _trim_spilled(self) -> None:
+        while self.max_spill_bytes is not None and self._spilled_bytes > self.max_spill_bytes:
+            self._remove_spilled(next(iter(self._spilled)))
+
+    def _read_spilled(self, key: bytes, length: int) -> Optional[Tuple[bytes, Tuple[int, ...]]]:
+        try:
+            with open(self._spill_path(key), 'rb') as f:
+                data = f.read()
+            (count,) = _SPILL_HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            self._remove_spilled(key)
+            return None
+        start = _SPILL_HEADER.size
+        if len(data) != start + count + length:
+            # Truncated or otherwise damaged
+            self._remove_spilled(key)
+            return None
+        positions = tuple(data[start:start + count])
+        self._spilled.move_to_end(key)
+        return data[start + count:], positions
+
+    def _remove_spilled(self, key: bytes) -> None:
+        self._spilled_bytes -= self._spilled.pop(key)
+        try:
+            os.remove(self._spill_path(key))
+        except OSError:
+            pass
+
+    def _spill_path(self, key: bytes) -> str:
+        return os.path.join(self.spill_dir, key.hex())
+
+    def _load_spilled(self) -> None:
+        """Pick up entries spilled by an earlier run, oldest first."""
+        found: List[Tuple[float, bytes, int]] = []
+        for name in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, name)
+            if name.endswith('.tmp'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                key = bytes.fromhex(name)
+                stat = os.stat(path)
+                with open(path, 'rb') as f:
+                    header = f.read(_SPILL_HEADER.size)
+            except (ValueError, OSError):
+                continue
+            if len(key) != hashlib.sha256().digest_size or len(header) < _SPILL_HEADER.size:
+                continue
+            (count,) = _SPILL_HEADER.unpack(header)
+            found.append((stat.st_mtime, key, stat.st_size - _SPILL_HEADER.size - count))
+        for _, key, size in sorted(found):
+            self._spilled[key] = size
+            self._spilled_bytes += size
+        self._trim_spilled()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from machine import RotorMachine
+
+    parser = argparse.ArgumentParser(
+        description="Time re-encrypting one template payload with and without the cache.")
+    parser.add_argument('--size', type=int, default=64 * 1024, help="Payload bytes")
+    parser.add_argument('--repeats', type=int, default=200)
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size)
+    machine = RotorMachine()
+    start_positions = machine.get_rotor_positions()
+    for label, cache in (('uncached', None), ('cached', EncryptionCache())):
+        machine.cache = cache
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            machine.set_rotor_positions(start_positions)
+            machine.process_bytes(payload)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>9s}: {elapsed / args.repeats * 1e3:8.3f} ms/call")
+    print(machine.cache.snapshot())
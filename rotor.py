@@ -1,9 +1,12 @@
 import random
-from typing import List, Optional, Dict
+from typing import Iterable, List, Optional, Dict, Sequence, Tuple
 
 class Rotor:
     def __init__(self, wiring: Optional[List[int]] = None, position: int = 0, 
-                 ring_setting: int = 0, notch: Optional[int] = None):
+                 ring_setting: int = 0, notch: Optional[int] = None,
+                 notches: Optional[Iterable[int]] = None,
+                 reverse_wiring: Optional[Sequence[int]] = None,
+                 shift_tables: Optional[Tuple[Sequence[int], Sequence[int]]] = None):
         """
         Initialize a rotor with the specified wiring, position, and ring setting.
         
@@ -12,23 +15,44 @@ class Rotor:
             position: Initial position (0-255)
             ring_setting: Ring setting (0-255)
             notch: Notch position where rotor causes next rotor to step (0-255)
+            notches: Optional set of notch positions, overrides notch
+            reverse_wiring: Optional precomputed inverse of wiring
+            shift_tables: Optional precomputed result of shift_tables()
         """
         # Initialize wiring with random permutation if not provided
         self.wiring = wiring if wiring is not None else self._generate_random_wiring()
         self.position = position % 256
         self.ring_setting = ring_setting % 256
-        self.notch = random.randint(0, 255) if notch is None else (notch % 256)
+        if notches is None:
+            notches = [random.randint(0, 255) if notch is None else notch]
+        self.set_notches(notches)
         
         # Create reverse mapping for backward pass
-        self.reverse_wiring = [0] * 256
-        for i, val in enumerate(self.wiring):
-            self.reverse_wiring[val] = i
+        if reverse_wiring is None:
+            reverse_wiring = [0] * 256
+            for i, val in enumerate(self.wiring):
+                reverse_wiring[val] = i
+        self.reverse_wiring = reverse_wiring
+        self._shift_tables = shift_tables
     
-    def _generate_random_wiring(self) -> List[int]:
-        """Generate a random but valid wiring configuration."""
+    def __getstate__(self) -> dict:
+        # Tables loaded from a memory-mapped catalog are memoryviews, which
+        # cannot be pickled; ship them as plain bytes instead
+        state = self.__dict__.copy()
+        if isinstance(state['wiring'], memoryview):
+            state['wiring'] = bytes(state['wiring'])
+        if isinstance(state['reverse_wiring'], memoryview):
+            state['reverse_wiring'] = bytes(state['reverse_wiring'])
+        if state['_shift_tables'] is not None:
+            state['_shift_tables'] = tuple(bytes(table) for table in state['_shift_tables'])
+        return state
+    
+    @staticmethod
+    def _generate_random_wiring(rng: Optional[random.Random] = None) -> List[int]:
+        """Generate a random but valid wiring configuration (from rng if given)."""
         # Create a list of 256 unique integers (0-255)
         wiring = list(range(256))
-        random.shuffle(wiring)
+        (rng or random).shuffle(wiring)
         
         # Ensure no character maps to itself (like in real Enigma)
         for i in range(256):
@@ -39,6 +63,19 @@ class Rotor:
         
         return wiring
     
+    def shift_tables(self) -> Tuple[Sequence[int], Sequence[int]]:
+        """
+        Get the compiled forward and backward lookup tables.
+        
+        Only shift = (position - ring_setting) % 256 affects the substitution,
+        so each table holds 256 rows of 256 bytes, one row per shift:
+        forward[shift * 256 + c] == forward(c) for any rotor at that shift.
+        The tables are built on first use and cached.
+        """
+        if self._shift_tables is None:
+            self._shift_tables = build_shift_tables(self.wiring, self.reverse_wiring)
+        return self._shift_tables
+    
     def set_position(self, position: int) -> None:
         """Set the rotor position (0-255)."""
         self.position = position % 256
@@ -47,6 +84,100 @@ class Rotor:
         """Set the ring setting (0-255)."""
         self.ring_setting = setting % 256
     
+    def set_notches(self, notches: Iterable[int]) -> None:
+        """
+        Set the notch positions (any subset of 0-255).
+        
+        The notches are kept as a 256-bit bitmap plus a prefix-count table,
+        where notch_prefix[i] is the number of notches below position i.
+        """
+        bitmap = 0
+        for notch in notches:
+            bitmap |= 1 << (notch % 256)
+        self.notch_bitmap = bitmap
+        
+        self.notch_prefix = [0] * 257
+        for i in range(256):
+            self.notch_prefix[i + 1] = self.notch_prefix[i] + ((bitmap >> i) & 1)
+    
+    @property
+    def notches(self) -> List[int]:
+        """Sorted list of notch positions."""
+        return [i for i in range(256) if (self.notch_bitmap >> i) & 1]
+    
+    @property
+    def notch(self) -> Optional[int]:
+        """The lowest notch position, or None if the rotor has no notches."""
+        bitmap = self.notch_bitmap
+        return (bitmap & -bitmap).bit_length() - 1 if bitmap else None
+    
+    @notch.setter
+    def notch(self, notch: Optional[int]) -> None:
+        self.set_notches([] if notch is None else [notch])
+    
+    def count_carries(self, step: int, position: Optional[int] = None) -> int:
+        """
+        Count the notches passed when rotating by the given number of steps.
+        
+        Stepping forward from position p passes the notches at p, p+1, ...,
+        p+step-1; stepping backward passes p-1, ..., p+step. The count is
+        computed in O(1) from the prefix table, for steps of any size.
+        
+        Args:
+            step: Number of steps (can be negative)
+            position: Start position (default: the current position)
+            
+        Returns:
+            int: Number of notches passed
+        """
+        if position is None:
+            position = self.position
+        if step < 0:
+            # Walking back over [p+step, p) passes the same notches as
+            # walking forward over it
+            position = (position + step) % 256
+            step = -step
+        
+        prefix = self.notch_prefix
+        full, rest = divmod(step, 256)
+        end = position + rest
+        if end <= 256:
+            partial = prefix[end] - prefix[position]
+        else:
+            partial = prefix[256] - prefix[position] + prefix[end - 256]
+        return full * prefix[256] + partial
+    
+    def distance_to_notch(self, position: Optional[int] = None) -> Optional[int]:
+        """
+        Number of forward steps from position to the next notch (0 if already
+        at one), or None if the rotor has no notches.
+        """
+        if position is None:
+            position = self.position
+        bitmap = self.notch_bitmap
+        if not bitmap:
+            return None
+        # Rotate the bitmap so that bit 0 is the start position
+        ahead = (bitmap >> position) | (bitmap << (256 - position))
+        return (ahead & -ahead).bit_length() - 1
+    
+    def notch_period(self) -> int:
+        """
+        Smallest rotation that maps the notch set onto itself: 1 for no
+        notches (or all of them), 256 for a set with no rotational symmetry.
+        Positions this far apart look the same to notch-driven stepping.
+        """
+        bitmap = self.notch_bitmap
+        mask = (1 << 256) - 1
+        # The rotations that fix the set form a subgroup of Z/256, so the
+        # period is a power of two
+        period = 1
+        while period < 256:
+            if ((bitmap >> period) | (bitmap << (256 - period))) & mask == bitmap:
+                return period
+            period *= 2
+        return 256
+    
     def rotate(self, step: int = 1) -> bool:
         """
         Rotate the rotor by the specified number of steps.
@@ -55,20 +186,11 @@ class Rotor:
             step: Number of steps to rotate (can be negative)
             
         Returns:
-            bool: True if the rotor made a full rotation (passed a notch)
+            bool: True if the rotor passed at least one notch
         """
-        old_position = self.position
+        carries = self.count_carries(step)
         self.position = (self.position + step) % 256
-        
-        # Check if we passed the notch position
-        if step > 0:
-            return old_position <= self.notch < self.position or \
-                   self.position < old_position <= self.notch or \
-                   self.notch < self.position < old_position
-        else:
-            return old_position > self.notch >= self.position or \
-                   self.position > old_position > self.notch or \
-                   self.notch >= old_position > self.position
+        return carries > 0
     
     def forward(self, char_code: int) -> int:
         """
@@ -112,8 +234,29 @@ class Rotor:
     
     def is_at_notch(self) -> bool:
         """Check if the rotor is at the notch position."""
-        return self.position == self.notch
+        return bool((self.notch_bitmap >> self.position) & 1)
     
     def __str__(self) -> str:
         """String representation of the rotor's current state."""
-        return f"Rotor(pos={self.position:02X}, notch={self.notch:02X}, ring={self.ring_setting:02X})"
\ No newline at end of file
+        notches = ",".join(f"{notch:02X}" for notch in self.notches)
+        return f"Rotor(pos={self.position:02X}, notch={notches}, ring={self.ring_setting:02X})"
+
+
+def build_shift_tables(wiring: Sequence[int],
+                       reverse_wiring: Sequence[int]) -> Tuple[bytes, bytes]:
+    """
+    Build the per-shift forward and backward tables for a rotor wiring.
+    
+    Row s maps c to (wiring[(c + s) % 256] - s) % 256, which is the rotor's
+    substitution when (position - ring_setting) % 256 == s.
+    
+    Returns:
+        Tuple[bytes, bytes]: forward and backward tables, 65536 bytes each
+    """
+    # subtract[s] maps v to (v - s) % 256, applied with bytes.translate
+    subtract = [bytes((v - s) % 256 for v in range(256)) for s in range(256)]
+    tables = []
+    for mapping in (bytes(wiring), bytes(reverse_wiring)):
+        rows = [(mapping[s:] + mapping[:s]).translate(subtract[s]) for s in range(256)]
+        tables.append(b''.join(rows))
+    return tables[0], tables[1]
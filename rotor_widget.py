@@ -1,25 +1,158 @@
 from PyQt5.QtWidgets import QWidget
-from PyQt5.QtGui import QPainter, QColor, QFont
+from PyQt5.QtCore import Qt, QTimer, QRectF
+from PyQt5.QtGui import QPainter, QColor, QFont, QPixmap, QPen, QLinearGradient
+
+class GlyphAtlas:
+    """
+    All 256 drum symbols pre-rendered into a single pixmap.
+
+    Each cell shows the byte in hex next to its printable character, so
+    painting a symbol is one pixmap blit instead of text layout.
+    """
+    COLUMNS = 16
+
+    def __init__(self, cell_width, cell_height, ratio=1.0):
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.ratio = ratio
+        rows = 256 // self.COLUMNS
+        self.pixmap = QPixmap(int(cell_width * self.COLUMNS * ratio), int(cell_height * rows * ratio))
+        self.pixmap.setDevicePixelRatio(ratio)
+        self.pixmap.fill(Qt.transparent)
+
+        painter = QPainter(self.pixmap)
+        painter.setRenderHint(QPainter.TextAntialiasing)
+        hex_font = QFont("Consolas", 9)
+        char_font = QFont("Consolas", 12, QFont.Bold)
+        for value in range(256):
+            x, y = self._origin(value)
+            char = chr(value) if 32 <= value <= 126 else '·'
+            painter.setFont(hex_font)
+            painter.setPen(QColor("#4a9cff"))
+            painter.drawText(QRectF(x + 4, y, cell_width / 2, cell_height),
+                             Qt.AlignVCenter | Qt.AlignLeft, f"{value:02X}")
+            painter.setFont(char_font)
+            painter.setPen(QColor("white"))
+            painter.drawText(QRectF(x + cell_width / 2, y, cell_width / 2 - 4, cell_height),
+                             Qt.AlignVCenter | Qt.AlignRight, char)
+        painter.end()
+
+    def _origin(self, value):
+        return ((value % self.COLUMNS) * self.cell_width,
+                (value // self.COLUMNS) * self.cell_height)
+
+    def source_rect(self, value):
+        """Cell of a symbol, in the atlas's device pixels."""
+        x, y = self._origin(value)
+        ratio = self.ratio
+        return QRectF(x * ratio, y * ratio, self.cell_width * ratio, self.cell_height * ratio)
+
 
 class RotorWidget(QWidget):
+    """
+    Drum view of a rotor showing its 256 symbols rolling past a window.
+
+    The symbols come from a glyph atlas built once per size and DPI, and the
+    drum glides to new positions on a 60 fps timer, taking the short way
+    round the ring. Click the upper half to step back, the lower half to
+    step forward, or use the mouse wheel.
+    """
+    ROW_HEIGHT = 24
+    FRAME_MS = 16
+    # Fraction of the remaining distance covered per frame
+    EASING = 0.35
+
     def __init__(self, rotor, parent=None):
         super().__init__(parent)
         self.rotor = rotor
         self.setFixedSize(100, 300)
+        self.offset = float(rotor.position)
+        self._atlas = None
+        self._background = None
+        self._overlay = None
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.FRAME_MS)
+        self._timer.timeout.connect(self._animate)
+
+    def sync(self):
+        """Start gliding towards the rotor's current position."""
+        if not self._timer.isActive() and self.offset != self.rotor.position:
+            self._timer.start()
+
+    def _animate(self):
+        target = self.rotor.position
+        # Signed shortest distance around the 256-symbol ring
+        distance = (target - self.offset + 128) % 256 - 128
+        if abs(distance) < 0.01:
+            self.offset = float(target)
+            self._timer.stop()
+        else:
+            self.offset = (self.offset + distance * self.EASING) % 256
+        self.update()
+
+    def _ensure_layers(self):
+        """(Re)build the cached layers if the size or DPI changed."""
+        ratio = self.devicePixelRatioF()
+        if self._atlas is None or self._atlas.ratio != ratio:
+            self._atlas = GlyphAtlas(self.width(), self.ROW_HEIGHT, ratio)
+            self._background = None
+        if self._background is not None:
+            return
+
+        self._background = self._new_layer(ratio)
+        self._background.fill(QColor("#444"))
+
+        self._overlay = self._new_layer(ratio)
+        self._overlay.fill(Qt.transparent)
+        painter = QPainter(self._overlay)
+        center_y = self.height() / 2
+        # Shade the top and bottom so the drum looks curved
+        for top in (True, False):
+            gradient = QLinearGradient(0, 0 if top else self.height(), 0, center_y)
+            gradient.setColorAt(0, QColor(0, 0, 0, 200))
+            gradient.setColorAt(1, QColor(0, 0, 0, 0))
+            painter.fillRect(QRectF(0, 0 if top else center_y, self.width(), center_y), gradient)
+        # Window around the current symbol
+        painter.setPen(QPen(QColor("#ff4a4a"), 2))
+        painter.drawRect(QRectF(1, center_y - self.ROW_HEIGHT / 2, self.width() - 2, self.ROW_HEIGHT))
+        painter.end()
+
+    def _new_layer(self, ratio):
+        pixmap = QPixmap(int(self.width() * ratio), int(self.height() * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        return pixmap
+
+    def resizeEvent(self, event):
+        self._atlas = None
+        self._background = None
+        super().resizeEvent(event)
 
     def paintEvent(self, event):
+        self._ensure_layers()
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        painter.setBrush(QColor("#444"))
-        painter.drawRect(0, 0, self.width(), self.height())
-        
-        painter.setFont(QFont("Consolas", 14))
-        for i in range(26):
-            y = (i * 12 + (self.rotor.position % 12))
-            c = chr((i + 65) % 256)
-            painter.setPen(QColor("white"))
-            painter.drawText(40, y + 20, c)
+        painter.drawPixmap(0, 0, self._background)
+
+        # Only the moving part is drawn per frame: the rows that fit,
+        # centred on the current offset
+        center_y = self.height() / 2
+        first, fraction = divmod(self.offset, 1)
+        first = int(first)
+        half_rows = int(center_y // self.ROW_HEIGHT) + 2
+        for row in range(-half_rows, half_rows + 1):
+            value = (first + row) % 256
+            y = center_y + (row - fraction) * self.ROW_HEIGHT - self.ROW_HEIGHT / 2
+            target = QRectF(0, y, self.width(), self.ROW_HEIGHT)
+            painter.drawPixmap(target, self._atlas.pixmap, self._atlas.source_rect(value))
+
+        painter.drawPixmap(0, 0, self._overlay)
 
     def mousePressEvent(self, event):
-        self.rotor.step()
-        self.update()
+        self.rotor.rotate(-1 if event.y() < self.height() / 2 else 1)
+        self.sync()
+
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() // 120
+        if steps:
+            self.rotor.rotate(-steps)
+            self.sync()
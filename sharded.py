@@ -0,0 +1,438 @@
+from typing import BinaryIO, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import ipaddress
+import json
+import multiprocessing
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+import zlib
+from machine import RotorMachine
+
+DEFAULT_SHARD_SIZE = 4 * 1024 * 1024
+
+# Message layout: header length | JSON header | payload. The header's
+# 'length' field gives the payload size.
+_LENGTH = struct.Struct('>I')
+MAX_HEADER_SIZE = 1024 * 1024
+
+Address = Tuple[str, int]
+
+
+class Shard(NamedTuple):
+    index: int
+    offset: int  # Byte offset of the shard in the stream
+    length: int
+    positions: List[int]  # Rotor positions at the start of the shard
+
+
+class ShardError(Exception):
+    """A worker returned a missing, damaged or wrong shard."""
+
+
+def send_message(sock: socket.socket, header: dict, payload: bytes = b'') -> None:
+    """Send one header + payload message."""
+    encoded = json.dumps(dict(header, length=len(payload))).encode()
+    sock.sendall(_LENGTH.pack(len(encoded)) + encoded)
+    if payload:
+        sock.sendall(payload)
+
+
+def recv_message(sock: socket.socket) -> Tuple[dict, bytes]:
+    """Receive one header + payload message."""
+    (size,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    if size > MAX_HEADER_SIZE:
+        raise ConnectionError("Message header too large")
+    try:
+        header = json.loads(_recv_exact(sock, size))
+        length = header.get('length', 0)
+    except (ValueError, AttributeError):
+        raise ConnectionError("Malformed message header") from None
+    if not isinstance(length, int) or length < 0:
+        raise ConnectionError("Malformed message header")
+    return header, _recv_exact(sock, length)
+
+
+def _recv_exact(sock: socket.socket, count: int) -> bytes:
+    buffer = bytearray(count)
+    view = memoryview(buffer)
+    received = 0
+    while received < count:
+        n = sock.recv_into(view[received:])
+        if not n:
+            raise ConnectionError("Connection closed mid-message")
+        received += n
+    return bytes(buffer)
+
+
+# Worker side
+
+def serve_worker(host: str = '127.0.0.1', port: int = 0,
+                 ready: Optional[Callable[[Address], None]] = None,
+                 idle_timeout: Optional[float] = 300.0) -> None:
+    """
+    Run a shard worker until the process is stopped.
+
+    The worker has no authentication: anyone who can reach the port can
+    submit work, so keep it on a loopback or otherwise trusted interface.
+    Each connection is served on its own thread, so a slow or stalled peer
+    only holds up its own requests, and is dropped after idle_timeout.
+
+    Each request carries a serialized key (RotorMachine.export_key()), the
+    rotor positions the shard starts from and its plaintext. The worker
+    sets its machine to those positions, encrypts the shard and sends it
+    back with its CRC-32. Each connection caches machines per key, so only
+    its first shard of a key pays for building one. A connection that sends a
+    malformed message is dropped.
+
+    Args:
+        host, port: Address to listen on (port 0 picks a free port)
+        ready: Called with the bound address once the worker is listening
+        idle_timeout: Seconds a connection may wait mid-message or between
+            requests (None for no limit)
+    """
+    with socket.create_server((host, port)) as server:
+        if ready is not None:
+            ready(server.getsockname()[:2])
+        while True:
+            conn, _ = server.accept()
+            conn.settimeout(idle_timeout)
+            threading.Thread(target=_serve_connection, args=(conn,), daemon=True).start()
+
+
+def _serve_connection(conn: socket.socket) -> None:
+    with conn:
+        try:
+            _serve_requests(conn)
+        except (ConnectionError, OSError):
+            pass  # The coordinator went away or stalled
+
+
+def _serve_requests(conn: socket.socket) -> None:
+    # Machines are stepped per request, so each connection has its own
+    machines: Dict[str, RotorMachine] = {}
+    while True:
+        header, payload = recv_message(conn)
+        try:
+            key = header['key']
+            cache_key = json.dumps(key, sort_keys=True)
+            machine = machines.get(cache_key)
+            if machine is None:
+                if len(machines) >= 8:
+                    machines.clear()
+                machine = machines[cache_key] = RotorMachine.from_key(key)
+            machine.set_rotor_positions(header['positions'])
+            result = machine.process_bytes(payload)
+            shard = header['shard']
+        except (KeyError, TypeError, ValueError) as e:
+            send_message(conn, {'ok': False, 'shard': header.get('shard'), 'error': repr(e)})
+            continue
+        send_message(conn, {'ok': True, 'shard': shard, 'crc32': zlib.crc32(result)}, result)
+
+
+# Coordinator side
+
+class ShardCoordinator:
+    """
+    Splits a stream into offset ranges and has remote workers encrypt them.
+
+    Every worker address gets its own connection and thread pulling shards
+    from a shared queue, so faster workers take more shards. A shard that
+    fails (connection loss, timeout, worker error, bad checksum or a wrong
+    result) goes back on the queue for another worker, up to retries times.
+    A worker whose connection fails repeatedly is dropped. Each returned
+    shard is verified against its CRC-32 and against a few bytes encrypted
+    locally from the same start positions.
+
+    The start positions of all shards are worked out up front in one pass
+    over the stream, so neither side fast-forwards from the stream start
+    per shard, which with some steppings costs time linear in the offset.
+    """
+
+    def __init__(self, workers: Sequence[Address], shard_size: int = DEFAULT_SHARD_SIZE,
+                 retries: int = 3, timeout: float = 60.0, verify_bytes: int = 64,
+                 max_worker_failures: int = 3):
+        """
+        Args:
+            workers: (host, port) of each worker
+            shard_size: Bytes per shard
+            retries: Extra attempts per shard before giving up
+            timeout: Socket timeout per request, in seconds
+            verify_bytes: Leading bytes of each shard re-encrypted locally
+            max_worker_failures: Consecutive failures before a worker is dropped
+        """
+        if not workers:
+            raise ValueError("At least one worker is needed")
+        if shard_size < 1:
+            raise ValueError("shard_size must be a positive integer")
+        self.workers = list(workers)
+        self.shard_size = shard_size
+        self.retries = retries
+        self.timeout = timeout
+        self.verify_bytes = verify_bytes
+        self.max_worker_failures = max_worker_failures
+        self.last_report: Optional[dict] = None
+
+    def encrypt(self, machine: RotorMachine, data: bytes) -> bytes:
+        """
+        Encrypt data on the workers.
+
+        Like process_bytes, the machine is left where it would be after
+        processing data locally.
+        """
+        out = bytearray(len(data))
+
+        def write(offset: int, result: bytes) -> None:
+            out[offset:offset + len(result)] = result
+
+        self._run(machine, len(data), lambda offset, length: data[offset:offset + length], write)
+        return bytes(out)
+
+    decrypt = encrypt
+
+    def encrypt_file(self, machine: RotorMachine, source: BinaryIO, target: BinaryIO) -> dict:
+        """
+        Encrypt a seekable file into another without loading either into memory.
+
+        Returns:
+            The run report (also kept in last_report)
+        """
+        source.seek(0, os.SEEK_END)
+        total = source.tell()
+        target.truncate(total)
+        lock = threading.Lock()
+
+        def read(offset: int, length: int) -> bytes:
+            with lock:
+                source.seek(offset)
+                return source.read(length)
+
+        def write(offset: int, result: bytes) -> None:
+            with lock:
+                target.seek(offset)
+                target.write(result)
+
+        self._run(machine, total, read, write)
+        return self.last_report
+
+    decrypt_file = encrypt_file
+
+    def _run(self, machine: RotorMachine, total: int,
+             read: Callable[[int, int], bytes], write: Callable[[int, bytes], None]) -> None:
+        start_time = time.perf_counter()
+        key = machine.export_key()
+        cursor = RotorMachine.from_key(key)
+        shards = []
+        for i, offset in enumerate(range(0, total, self.shard_size)):
+            length = min(self.shard_size, total - offset)
+            shards.append(Shard(i, offset, length, cursor.get_rotor_positions()))
+            cursor.advance(length)
+        pending: queue.Queue = queue.Queue()
+        for shard in shards:
+            pending.put(shard)
+        attempts = [0] * len(shards)
+        state = {'remaining': len(shards), 'error': None}
+        lock = threading.Lock()
+        finished = threading.Event()
+        if not shards:
+            finished.set()
+        done_by: Dict[str, int] = {}
+        failures: List[str] = []
+
+        def fail(shard: Shard, reason: str, counted: bool = True) -> None:
+            with lock:
+                failures.append(f"shard {shard.index}: {reason}")
+                if not counted:
+                    pending.put(shard)
+                    return
+                attempts[shard.index] += 1
+                if attempts[shard.index] > self.retries:
+                    state['error'] = f"Shard {shard.index} failed {attempts[shard.index]} times: {reason}"
+                    finished.set()
+                    return
+            pending.put(shard)
+
+        def work(address: Address) -> None:
+            name = f"{address[0]}:{address[1]}"
+            local = RotorMachine.from_key(key)
+            conn = None
+            strikes = 0
+            while not finished.is_set() and strikes < self.max_worker_failures:
+                try:
+                    shard = pending.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if conn is None:
+                    try:
+                        conn = socket.create_connection(address, timeout=self.timeout)
+                    except OSError as e:
+                        # The shard never left, so this doesn't use up one of its attempts
+                        strikes += 1
+                        fail(shard, f"{name}: {e}", counted=False)
+                        continue
+                try:
+                    plaintext = read(shard.offset, shard.length)
+                    send_message(conn, {'key': key, 'shard': shard.index,
+                                        'positions': shard.positions}, plaintext)
+                    header, result = recv_message(conn)
+                    self._check(header, result, shard, plaintext, local)
+                except (OSError, ConnectionError, ValueError, ShardError) as e:
+                    if conn is not None:
+                        conn.close()
+                        conn = None
+                    if not isinstance(e, ShardError):
+                        strikes += 1
+                    fail(shard, f"{name}: {e}")
+                    continue
+                strikes = 0
+                write(shard.offset, result)
+                with lock:
+                    done_by[name] = done_by.get(name, 0) + 1
+                    state['remaining'] -= 1
+                    if not state['remaining']:
+                        finished.set()
+            if conn is not None:
+                conn.close()
+
+        threads = [threading.Thread(target=work, args=(address,), daemon=True)
+                   for address in self.workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        seconds = time.perf_counter() - start_time
+        self.last_report = {
+            'bytes': total,
+            'shards': len(shards),
+            'shard_size': self.shard_size,
+            'seconds': seconds,
+            'bytes_per_second': total / seconds if seconds else None,
+            'shards_by_worker': done_by,
+            'retries': sum(attempts),
+            'failures': failures,
+        }
+        if state['error'] is not None:
+            raise RuntimeError(state['error'])
+        if state['remaining']:
+            raise RuntimeError("All workers failed before the stream was finished")
+        machine.set_rotor_positions(cursor.get_rotor_positions())
+
+    def _check(self, header: dict, result: bytes, shard: Shard, plaintext: bytes,
+               local: RotorMachine) -> None:
+        """Raise ShardError unless result is the right encryption of the shard."""
+        if not header.get('ok'):
+            raise ShardError(f"worker error: {header.get('error')}")
+        if header.get('shard') != shard.index or len(result) != shard.length:
+            raise ShardError("result does not match the shard")
+        if zlib.crc32(result) != header.get('crc32'):
+            raise ShardError("checksum mismatch")
+        if self.verify_bytes:
+            local.set_rotor_positions(shard.positions)
+            sample = plaintext[:self.verify_bytes]
+            if local.process_bytes(sample) != result[:len(sample)]:
+                raise ShardError("result does not decrypt with this key")
+
+
+# Local stand-ins for worker nodes
+
+class LocalCluster:
+    """
+    Worker processes on this machine, for testing the coordinator end to end.
+
+    Use as a context manager; addresses lists where the workers listen.
+    """
+
+    def __init__(self, count: int):
+        self.count = count
+        self.processes: List[multiprocessing.Process] = []
+        self.addresses: List[Address] = []
+
+    def __enter__(self) -> 'LocalCluster':
+        context = multiprocessing.get_context()
+        ready = context.Queue()
+        for _ in range(self.count):
+            process = context.Process(target=_local_worker, args=(ready,), daemon=True)
+            process.start()
+            self.processes.append(process)
+        try:
+            self.addresses = [tuple(ready.get(timeout=30)) for _ in range(self.count)]
+        except queue.Empty:
+            self.close()
+            raise RuntimeError("Local workers failed to start")
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def kill(self, index: int) -> None:
+        """Stop one worker, to simulate a node failure."""
+        self.processes[index].terminate()
+        self.processes[index].join()
+
+    def close(self) -> None:
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            process.join()
+
+
+def _local_worker(ready) -> None:
+    serve_worker('127.0.0.1', 0, ready.put)
+
+
+def _is_loopback(host: str) -> bool:
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+if __name__ == "__main__":
+    import argparse
+    import contextlib
+
+    parser = argparse.ArgumentParser(description="Sharded rotor-machine encryption.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    worker_parser = commands.add_parser('worker', help="Run a shard worker")
+    worker_parser.add_argument('--host', default='127.0.0.1')
+    worker_parser.add_argument('--port', type=int, default=9470)
+    worker_parser.add_argument('--allow-remote', action='store_true',
+                               help="Allow a --host other than loopback; the worker has no "
+                                    "authentication, so only use this on a trusted network")
+    encrypt_parser = commands.add_parser('encrypt', help="Encrypt (or decrypt) a file on workers")
+    encrypt_parser.add_argument('key', help="JSON key file written from RotorMachine.export_key()")
+    encrypt_parser.add_argument('source')
+    encrypt_parser.add_argument('target')
+    encrypt_parser.add_argument('--workers', help="Comma-separated host:port list")
+    encrypt_parser.add_argument('--local', type=int, default=0,
+                                help="Start this many local worker processes instead")
+    encrypt_parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE)
+    args = parser.parse_args()
+
+    if args.command == 'worker':
+        if not args.allow_remote and not _is_loopback(args.host):
+            parser.error(f"{args.host} is not a loopback address; the worker has no "
+                         f"authentication, pass --allow-remote to listen there anyway")
+        serve_worker(args.host, args.port,
+                     lambda address: print(f"Listening on {address[0]}:{address[1]}", flush=True))
+    else:
+        with open(args.key, 'r', encoding='utf-8') as f:
+            machine = RotorMachine.from_key(json.load(f))
+        if not args.local and not args.workers:
+            parser.error("Give --workers or --local")
+        with LocalCluster(args.local) if args.local else contextlib.nullcontext() as cluster:
+            if cluster is not None:
+                addresses = cluster.addresses
+            else:
+                addresses = [(host, int(port)) for host, port in
+                             (item.rsplit(':', 1) for item in args.workers.split(','))]
+            coordinator = ShardCoordinator(addresses, args.shard_size)
+            with open(args.source, 'rb') as source, open(args.target, 'w+b') as target:
+                report = coordinator.encrypt_file(machine, source, target)
+        print(json.dumps(report, indent=2))
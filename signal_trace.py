@@ -0,0 +1,162 @@
+from array import array
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional
+import csv
+import json
+
+class TraceRecord(NamedTuple):
+    index: int            # Position of the byte in the traced stream
+    char: int             # Input byte
+    positions: List[int]  # Rotor positions used for it, leftmost first
+    path: List[int]       # RotorMachine.signal_path() values; path[-1] is the output
+
+
+class TraceBuffer:
+    """
+    Fixed-size ring buffer of trace records.
+
+    All storage is allocated up front; once full, each new record overwrites
+    the oldest one.
+    """
+
+    def __init__(self, num_rotors: int, capacity: int = 4096):
+        """
+        Args:
+            num_rotors: Number of rotors of the traced machine
+            capacity: Maximum number of records kept
+        """
+        if capacity < 1:
+            raise ValueError("Trace buffer capacity must be a positive integer")
+        self.num_rotors = num_rotors
+        self.capacity = capacity
+        # Record layout: char | positions | signal path
+        self.width = 1 + num_rotors + (2 * num_rotors + 3)
+        self._indices = array('Q', bytes(8 * capacity))
+        self._records = bytearray(capacity * self.width)
+        self.written = 0
+
+    def write(self, index: int, char: int, positions: List[int], path: List[int]) -> None:
+        slot = self.written % self.capacity
+        self._indices[slot] = index
+        start = slot * self.width
+        self._records[start] = char
+        self._records[start + 1:start + 1 + self.num_rotors] = bytes(positions)
+        self._records[start + 1 + self.num_rotors:start + self.width] = bytes(path)
+        self.written += 1
+
+    def __len__(self) -> int:
+        return min(self.written, self.capacity)
+
+    def records(self) -> Iterator[TraceRecord]:
+        """The buffered records, oldest first."""
+        n = self.num_rotors
+        first = max(0, self.written - self.capacity)
+        for number in range(first, self.written):
+            slot = number % self.capacity
+            start = slot * self.width
+            record = self._records[start:start + self.width]
+            yield TraceRecord(self._indices[slot], record[0],
+                              list(record[1:1 + n]), list(record[1 + n:]))
+
+    def clear(self) -> None:
+        self.written = 0
+
+
+class Tracer:
+    """
+    Samples the signal paths of selected bytes during bulk processing.
+
+    Bytes are selected by position (every Nth byte of the stream), by value
+    (any byte in values) and/or by a predicate(index, byte); when several
+    filters are given a byte must pass all of them. Filtering by position or
+    value runs at C speed; a predicate is called once per byte.
+
+    Only the selected bytes are traced: their rotor positions are replayed
+    from the start of the block and their intermediate values recomputed,
+    so the bulk engine itself runs untouched.
+    """
+
+    def __init__(self, buffer: TraceBuffer, every: Optional[int] = None,
+                 values: Optional[Iterable[int]] = None,
+                 predicate: Optional[Callable[[int, int], bool]] = None):
+        """
+        Args:
+            buffer: Where the records go
+            every: Trace every Nth byte of the stream (starting with the first)
+            values: Trace bytes with one of these values
+            predicate: Trace bytes for which predicate(stream index, byte) is true
+        """
+        if every is not None and every < 1:
+            raise ValueError("every must be a positive integer")
+        self.buffer = buffer
+        self.every = every
+        self.predicate = predicate
+        self._value_table = None
+        if values is not None:
+            selected = set(v % 256 for v in values)
+            self._value_table = bytes(1 if v in selected else 0 for v in range(256))
+        # Number of bytes seen so far, i.e. the stream index of the next block
+        self.offset = 0
+
+    def select(self, data: bytes) -> List[int]:
+        """Indices (within data) of the bytes to trace."""
+        count = len(data)
+        if self.every is not None:
+            indices = range((-self.offset) % self.every, count, self.every)
+        else:
+            indices = range(count)
+
+        if self._value_table is not None:
+            marks = data.translate(self._value_table)
+            if self.every is not None:
+                indices = [k for k in indices if marks[k]]
+            else:
+                indices = []
+                k = marks.find(1)
+                while k >= 0:
+                    indices.append(k)
+                    k = marks.find(1, k + 1)
+
+        if self.predicate is not None:
+            offset = self.offset
+            indices = [k for k in indices if self.predicate(offset + k, data[k])]
+        return list(indices)
+
+    def capture(self, machine, start_positions: List[int], data: bytes) -> None:
+        """
+        Trace the selected bytes of a block processed from start_positions.
+
+        Called by RotorMachine.process_bytes.
+        """
+        positions = list(start_positions)
+        steps_done = 0
+        for k in self.select(data):
+            # The machine steps before each byte, hence the + 1
+            machine.stepping.jump(positions, machine.rotors, k + 1 - steps_done)
+            steps_done = k + 1
+            char = data[k]
+            self.buffer.write(self.offset + k, char, positions,
+                              machine.signal_path(char, positions))
+        self.offset += len(data)
+
+
+def export_json(records: Iterable[TraceRecord], path: str) -> None:
+    """Write trace records to a JSON file (readable by load_json)."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'records': [record._asdict() for record in records]}, f)
+
+
+def export_csv(records: Iterable[TraceRecord], path: str) -> None:
+    """Write trace records to a CSV file, one row per byte."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['index', 'char', 'positions', 'path'])
+        for record in records:
+            writer.writerow([record.index, record.char,
+                             ' '.join(f"{p:02X}" for p in record.positions),
+                             ' '.join(f"{v:02X}" for v in record.path)])
+
+
+def load_json(path: str) -> List[TraceRecord]:
+    """Read trace records written by export_json."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [TraceRecord(**record) for record in json.load(f)['records']]
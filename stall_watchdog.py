@@ -0,0 +1,197 @@
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from typing import List, Optional
+import logging
+import sys
+import threading
+import time
+import traceback
+from PyQt5.QtCore import QObject, QEvent, QTimer, Qt
+
+# One frame at 60 Hz
+FRAME_SECONDS = 0.016
+
+# Names of the QEvent types, for the log
+_EVENT_NAMES = {int(value): name for name, value in vars(QEvent).items()
+                if isinstance(value, QEvent.Type)}
+
+
+class StallWatchdog(QObject):
+    """
+    Opt-in detector for event-loop stalls.
+
+    An application-wide event filter notes the time of every event the loop
+    dispatches, and a heartbeat timer makes sure there is one every few
+    milliseconds even when the application is idle. A gap longer than the
+    threshold therefore means a slot, paint or other handler held the loop.
+
+    A background thread polls the last dispatch time; once a gap passes the
+    threshold it samples the main thread's Python stack, catching the
+    offender in the act. When the loop comes back the stall is logged with
+    its length, the last event dispatched before it and the stack sample to
+    a rotating log file. Writing happens on the background thread, so
+    logging never adds to a stall. Handlers stuck in C++ that holds the GIL
+    can only be sampled once they return to Python; the event is still logged.
+    """
+
+    def __init__(self, app, log_path: str = 'stalls.log', threshold: float = FRAME_SECONDS,
+                 heartbeat_ms: int = 5, max_bytes: int = 1 << 20, backups: int = 3,
+                 latency_window: int = 4096):
+        """
+        Args:
+            app: The QApplication to watch
+            log_path: Rolling log file
+            threshold: Gap (seconds) that counts as a stall
+            heartbeat_ms: Heartbeat timer interval
+            max_bytes: Size at which the log is rolled over
+            backups: Number of rolled-over logs kept
+            latency_window: Number of recent heartbeat latencies kept for percentiles
+        """
+        super().__init__()
+        self.app = app
+        self.threshold = threshold
+        self.heartbeat_ms = heartbeat_ms
+        self.stalls = 0
+        self.stalled_seconds = 0.0
+        self.worst = 0.0
+        self._latencies = deque(maxlen=latency_window)
+        self._last_beat = time.perf_counter()
+        self._last_event = None
+        self._expected_tick = None
+        self._sample = None  # (beat the stall started from, stack summary)
+        self._pending = deque()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.logger = logging.getLogger(f'{__name__}.{id(self)}')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self._handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backups,
+                                            encoding='utf-8', delay=True)
+        self._handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        self.logger.addHandler(self._handler)
+
+        self.heartbeat = QTimer(self)
+        self.heartbeat.setTimerType(Qt.PreciseTimer)
+        self.heartbeat.setInterval(heartbeat_ms)
+        self.heartbeat.timeout.connect(self._tick)
+
+    def start(self) -> None:
+        """Begin watching; call from the GUI thread."""
+        if self._thread is not None:
+            return
+        self._last_beat = time.perf_counter()
+        self._expected_tick = None
+        self._stop.clear()
+        self.app.installEventFilter(self)
+        self.heartbeat.start()
+        self._thread = threading.Thread(target=self._watch, name='stall-watchdog', daemon=True)
+        self._thread.start()
+        self.logger.info(f"watchdog started, threshold {self.threshold * 1000:.0f} ms")
+
+    def stop(self) -> None:
+        """Stop watching, flush the log and write a summary line."""
+        if self._thread is None:
+            return
+        self.heartbeat.stop()
+        self.app.removeEventFilter(self)
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._flush()
+        snapshot = self.snapshot()
+        self.logger.info(f"watchdog stopped: {snapshot['stalls']} stalls, "
+                         f"{snapshot['stalled_seconds'] * 1000:.0f} ms stalled, "
+                         f"worst {snapshot['worst'] * 1000:.1f} ms, "
+                         f"heartbeat latency p99 {_ms(snapshot['latency']['p99'])}")
+        self._handler.close()
+
+    def eventFilter(self, obj, event):
+        # Runs before every event the application dispatches, so keep it lean
+        now = time.perf_counter()
+        gap = now - self._last_beat
+        if gap > self.threshold:
+            self._record_stall(gap)
+        self._last_beat = now
+        self._last_event = (obj, event.type())
+        return False
+
+    def snapshot(self) -> dict:
+        """Stall counters and heartbeat latency percentiles."""
+        latencies = sorted(self._latencies)
+        return {
+            'stalls': self.stalls,
+            'stalled_seconds': self.stalled_seconds,
+            'worst': self.worst,
+            'latency': {
+                'p50': _percentile(latencies, 0.50),
+                'p99': _percentile(latencies, 0.99),
+                'max': latencies[-1] if latencies else None,
+            },
+        }
+
+    def _tick(self) -> None:
+        """Heartbeat: record how late the timer fired."""
+        now = time.perf_counter()
+        if self._expected_tick is not None:
+            self._latencies.append(max(0.0, now - self._expected_tick))
+        self._expected_tick = now + self.heartbeat_ms / 1000
+
+    def _record_stall(self, gap: float) -> None:
+        self.stalls += 1
+        self.stalled_seconds += gap
+        self.worst = max(self.worst, gap)
+        sample = self._sample
+        stack = sample[1] if sample is not None and sample[0] == self._last_beat else None
+        # Formatting the stack is left to the thread
+        self._pending.append((time.time() - gap, gap, _describe(self._last_event), stack))
+
+    def _watch(self) -> None:
+        """Background thread: sample stalled stacks and write the log."""
+        main = threading.main_thread().ident
+        poll = self.threshold / 4
+        sampled = None
+        while not self._stop.wait(poll):
+            beat = self._last_beat
+            if time.perf_counter() - beat > self.threshold and sampled != beat:
+                frame = sys._current_frames().get(main)
+                if frame is not None:
+                    self._sample = (beat, traceback.extract_stack(frame))
+                    del frame
+                sampled = beat
+            self._flush()
+
+    def _flush(self) -> None:
+        while self._pending:
+            started, gap, last_event, stack = self._pending.popleft()
+            lines = [f"stall {gap * 1000:.1f} ms after {last_event} "
+                     f"(began {time.strftime('%H:%M:%S', time.localtime(started))})"]
+            if stack is not None:
+                lines.extend(line.rstrip('\n') for line in traceback.format_list(stack))
+            else:
+                lines.append("  (no stack sample: the stall ended before it could be taken)")
+            self.logger.warning('\n'.join(lines))
+
+
+def _describe(last_event) -> str:
+    if last_event is None:
+        return "start-up"
+    obj, event_type = last_event
+    name = _EVENT_NAMES.get(int(event_type), str(int(event_type)))
+    try:
+        object_name = obj.objectName()
+    except RuntimeError:
+        # The receiver was deleted since
+        object_name = ''
+    receiver = type(obj).__name__ + (f" '{object_name}'" if object_name else '')
+    return f"{name} event to {receiver}"
+
+
+def _percentile(ordered: List[float], fraction: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _ms(seconds: Optional[float]) -> str:
+    return '-' if seconds is None else f"{seconds * 1000:.1f} ms"
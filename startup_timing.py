@@ -0,0 +1,49 @@
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+import time
+
+class StartupTimer:
+    """
+    Records how long each phase of application start-up takes.
+
+    mark(name) closes a phase that started at the previous mark (or when the
+    timer was created); phase(name) times a block of code on its own.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self._last = self.start
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, name: str) -> None:
+        """Record the time since the previous mark as the named phase."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as the named phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.phases.append((name, now - start))
+            self._last = now
+
+    def elapsed(self) -> float:
+        """Seconds since the timer was created."""
+        return time.perf_counter() - self.start
+
+    def report(self) -> str:
+        """Phase breakdown, one line per phase, in milliseconds."""
+        lines = ["Startup timing:"]
+        for name, seconds in self.phases:
+            lines.append(f"  {name:<28s} {seconds * 1000:8.1f} ms")
+        lines.append(f"  {'total':<28s} {self.elapsed() * 1000:8.1f} ms")
+        return '\n'.join(lines)
+
+
+# Shared timer, created as early as possible in the process
+startup_timer = StartupTimer()
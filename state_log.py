@@ -0,0 +1,96 @@
+from array import array
+from bisect import bisect_right
+from typing import List, Optional, Sequence
+from rotor import Rotor
+from stepping import SteppingStrategy
+
+class StateLog:
+    """
+    Compact record of the rotor positions over a run of the machine.
+
+    Instead of storing every character's positions, the log keeps sparse
+    checkpoints (at least one every interval characters, plus one at the
+    start of every bulk call) and replays the stepping strategy from the
+    nearest checkpoint on lookup. Each checkpoint costs an 8-byte index plus
+    num_rotors position bytes, so memory is about (8 + num_rotors) / interval
+    bytes per character, plus one byte per character for the input when
+    keep_data is set. A lookup replays at most interval steps; with
+    interval=1 every character's positions are stored.
+    """
+
+    def __init__(self, rotors: Sequence[Rotor], stepping: SteppingStrategy,
+                 interval: int = 256, keep_data: bool = True):
+        """
+        Args:
+            rotors: The machine's rotors (for their notches and wirings)
+            stepping: The machine's stepping strategy
+            interval: Maximum characters between checkpoints
+            keep_data: Also keep the input bytes, so each character's signal
+                path can be reconstructed later
+        """
+        if interval < 1:
+            raise ValueError("Checkpoint interval must be a positive integer")
+        self.rotors = rotors
+        self.stepping = stepping
+        self.interval = interval
+        self.num_rotors = len(rotors)
+        self.length = 0
+        # Checkpoint i: positions before character indices[i]
+        self.indices = array('Q')
+        self.positions = bytearray()
+        self.data: Optional[bytearray] = bytearray() if keep_data else None
+
+    def clear(self) -> None:
+        """Forget everything recorded so far."""
+        self.length = 0
+        self.indices = array('Q')
+        self.positions = bytearray()
+        if self.data is not None:
+            self.data = bytearray()
+
+    def record(self, start_positions: List[int], data: bytes) -> None:
+        """
+        Record a block of characters processed from the given start positions.
+
+        Called by RotorMachine.process_bytes before the block is processed.
+        """
+        count = len(data)
+        if not count:
+            return
+        positions = list(start_positions)
+        offset = 0
+        while offset < count:
+            self.indices.append(self.length + offset)
+            self.positions.extend(positions)
+            step = min(self.interval, count - offset)
+            offset += step
+            if offset < count:
+                self.stepping.jump(positions, self.rotors, step)
+        self.length += count
+        if self.data is not None:
+            self.data.extend(data)
+
+    def positions_at(self, index: int) -> List[int]:
+        """Rotor positions used to process the character at index."""
+        if not 0 <= index < self.length:
+            raise IndexError("State log index out of range")
+        checkpoint = bisect_right(self.indices, index) - 1
+        start = checkpoint * self.num_rotors
+        positions = list(self.positions[start:start + self.num_rotors])
+        # The machine steps before each character, hence the + 1
+        self.stepping.jump(positions, self.rotors, index - self.indices[checkpoint] + 1)
+        return positions
+
+    def byte_at(self, index: int) -> Optional[int]:
+        """Input byte at index, if the log keeps data."""
+        if self.data is None:
+            return None
+        return self.data[index]
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the log."""
+        data = len(self.data) if self.data is not None else 0
+        return self.indices.itemsize * len(self.indices) + len(self.positions) + data
+
+    def __len__(self) -> int:
+        return self.length
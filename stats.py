@@ -0,0 +1,105 @@
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+import threading
+import time
+
+class MachineStats:
+    """
+    Running counters for a RotorMachine's bulk calls.
+
+    Updated once per process_bytes call, never per byte, and read by
+    sampling snapshot() on a timer, so collecting them costs next to nothing.
+    """
+
+    def __init__(self, latency_window: int = 1024):
+        """
+        Args:
+            latency_window: Number of recent call latencies kept for percentiles
+        """
+        self._lock = threading.Lock()
+        self.created = time.perf_counter()
+        self.calls = 0
+        self.total_bytes = 0
+        self.total_seconds = 0.0
+        self.engine_calls: Dict[str, int] = {}
+        self.last_engine: Optional[str] = None
+        self.rotor_steps: List[int] = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._latencies = deque(maxlen=latency_window)
+
+    def __getstate__(self) -> dict:
+        # Locks can't be copied or pickled; copies get a fresh one
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def record(self, count: int, seconds: float, engine: Optional[str],
+               before: Sequence[int], after: Sequence[int], every_char: Optional[int]) -> None:
+        """
+        Record one bulk call.
+
+        Per-rotor steps are taken from the position change over the call, and
+        the rotor that steps on every character (if any) is credited with
+        count steps. This is exact as long as no other rotor makes a full turn
+        within a single call.
+        """
+        steps = [(a - b) % 256 for a, b in zip(after, before)]
+        if every_char is not None and steps:
+            steps[every_char % len(steps)] = count
+        with self._lock:
+            self.calls += 1
+            self.total_bytes += count
+            self.total_seconds += seconds
+            if engine is not None:
+                self.engine_calls[engine] = self.engine_calls.get(engine, 0) + 1
+                self.last_engine = engine
+            if len(self.rotor_steps) != len(steps):
+                self.rotor_steps = [0] * len(steps)
+            for i, step in enumerate(steps):
+                self.rotor_steps[i] += step
+            self._latencies.append(seconds)
+
+    def record_cache(self, hit: bool) -> None:
+        """Count a cache lookup made on behalf of this machine."""
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    def snapshot(self) -> dict:
+        """Copy of the counters plus latency percentiles, safe to read from any thread."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            snapshot = {
+                'time': time.perf_counter(),
+                'calls': self.calls,
+                'bytes': self.total_bytes,
+                'seconds': self.total_seconds,
+                'engine_calls': dict(self.engine_calls),
+                'last_engine': self.last_engine,
+                'rotor_steps': list(self.rotor_steps),
+                'cache_hits': self.cache_hits,
+                'cache_misses': self.cache_misses,
+            }
+        snapshot['latency'] = {
+            'p50': _percentile(latencies, 0.50),
+            'p90': _percentile(latencies, 0.90),
+            'p99': _percentile(latencies, 0.99),
+        }
+        return snapshot
+
+    def reset(self) -> None:
+        """Zero all counters."""
+        self.__init__(self._latencies.maxlen)
+
+
+def _percentile(ordered: List[float], fraction: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
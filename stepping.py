@@ -0,0 +1,255 @@
+from typing import List, Sequence
+from rotor import Rotor
+
+class SteppingStrategy:
+    """
+    Base class for the rule that decides which rotors step before each character.
+
+    Subclasses implement advance(), which works on a plain list of positions so
+    that the same rule can drive the live rotors (step) or be run ahead of time
+    to produce a packed step schedule for bulk engines (schedule).
+    """
+    # Index of a rotor that steps on every character, if there is one
+    every_char = None
+    # Whether quiet_steps() can find runs in which only that rotor moves
+    has_quiet_runs = False
+
+    def advance(self, positions: List[int], rotors: Sequence[Rotor]) -> None:
+        """
+        Advance the given positions by one character, in place.
+
+        Args:
+            positions: Current rotor positions, leftmost rotor first
+            rotors: The rotors, used for their notches and wirings only
+        """
+        raise NotImplementedError
+
+    def step(self, rotors: Sequence[Rotor]) -> None:
+        """Step the rotors themselves by one character."""
+        positions = [rotor.position for rotor in rotors]
+        self.advance(positions, rotors)
+        for rotor, position in zip(rotors, positions):
+            rotor.position = position
+
+    def jump(self, positions: List[int], rotors: Sequence[Rotor], count: int) -> None:
+        """
+        Advance the given positions by count characters, in place.
+
+        Strategies with a closed form override this to skip the step loop;
+        otherwise quiet runs (see quiet_steps) are skipped in one go.
+        """
+        advance = self.advance
+        if not self.has_quiet_runs:
+            for _ in range(count):
+                advance(positions, rotors)
+            return
+        fast = self.every_char % len(positions)
+        while count:
+            run = self.quiet_steps(positions, rotors, count)
+            if run:
+                positions[fast] = (positions[fast] + run) % 256
+                count -= run
+            else:
+                advance(positions, rotors)
+                count -= 1
+
+    def quiet_steps(self, positions: List[int], rotors: Sequence[Rotor], limit: int) -> int:
+        """
+        Count the upcoming steps that move only the every_char rotor.
+
+        Args:
+            positions: Current rotor positions, leftmost rotor first
+            rotors: The rotors, used for their notches and wirings only
+            limit: Largest count of interest
+
+        Returns:
+            int: Number of steps (at most limit) after which every other
+            rotor is still where it is now; 0 if the next step may move one
+        """
+        return 0
+
+    def phase_periods(self, rotors: Sequence[Rotor]) -> List[int]:
+        """
+        For each rotor, the period of its position as far as stepping goes.
+
+        Positions of rotor i that are congruent modulo periods[i] give the
+        same stepping from then on; 1 means the rule never looks at that
+        rotor's position. The default of 256 for every rotor assumes nothing.
+        """
+        return [256] * len(rotors)
+
+    def schedule(self, rotors: Sequence[Rotor], count: int) -> bytearray:
+        """
+        Compute the rotor positions for the next count characters.
+
+        The rotors themselves are not moved. Row k of the result holds the
+        positions used to encrypt character k, i.e. after k + 1 steps.
+
+        Args:
+            rotors: The rotors, in their current positions
+            count: Number of characters to schedule
+
+        Returns:
+            bytearray: count rows of len(rotors) positions, packed row-major
+        """
+        positions = [rotor.position for rotor in rotors]
+        out = bytearray()
+        advance = self.advance
+        for _ in range(count):
+            advance(positions, rotors)
+            out.extend(positions)
+        return out
+
+    def to_dict(self) -> dict:
+        """JSON-serializable description, the inverse of stepping_from_dict()."""
+        return {'type': type(self).__name__}
+
+    def __str__(self) -> str:
+        return f"{type(self).__name__}()"
+
+
+class OdometerStepping(SteppingStrategy):
+    """Plain odometer: a rotor steps only when the rotor to its right carries."""
+    every_char = -1
+    has_quiet_runs = True
+
+    def advance(self, positions: List[int], rotors: Sequence[Rotor]) -> None:
+        for i in range(len(positions) - 1, -1, -1):
+            position = positions[i]
+            positions[i] = (position + 1) % 256
+            if not (rotors[i].notch_bitmap >> position) & 1:
+                break
+
+    def phase_periods(self, rotors: Sequence[Rotor]) -> List[int]:
+        # Only notches carry, and the leftmost rotor's carry goes nowhere
+        return [1] + [rotor.notch_period() for rotor in rotors[1:]]
+
+    def jump(self, positions: List[int], rotors: Sequence[Rotor], count: int) -> None:
+        # Each rotor moves once per carry out of its right-hand neighbour,
+        # and the carries over any distance come from the prefix tables
+        for i in range(len(positions) - 1, -1, -1):
+            if not count:
+                break
+            position = positions[i]
+            positions[i] = (position + count) % 256
+            count = rotors[i].count_carries(count, position)
+
+    def quiet_steps(self, positions: List[int], rotors: Sequence[Rotor], limit: int) -> int:
+        if len(positions) == 1:
+            return limit
+        # The rightmost rotor carries when it steps off a notch
+        distance = rotors[-1].distance_to_notch(positions[-1])
+        return limit if distance is None else min(distance, limit)
+
+
+class EnigmaStepping(SteppingStrategy):
+    """
+    Enigma pawl-and-ratchet stepping generalized to any number of rotors.
+
+    A pawl sits between each pair of neighbouring rotors. When the right-hand
+    rotor is at a notch, the pawl pushes both rotors, so every rotor except the
+    outermost ones double-steps when it reaches its own notch. The rightmost
+    rotor always steps. As in the original three-rotor mechanism, the second
+    rotor from the right double-steps even when it is the leftmost, so
+    two-rotor machines keep their original stepping.
+    """
+    every_char = -1
+    has_quiet_runs = True
+
+    @staticmethod
+    def first_double_stepping(num_rotors: int) -> int:
+        """Index of the leftmost rotor that double-steps off its own notch."""
+        return 0 if num_rotors == 2 else 1
+
+    def advance(self, positions: List[int], rotors: Sequence[Rotor]) -> None:
+        first = self.first_double_stepping(len(positions))
+        # The rightmost rotor is pushed on every character
+        right_at_notch = True
+        for i in range(len(positions) - 1, -1, -1):
+            position = positions[i]
+            at_notch = (rotors[i].notch_bitmap >> position) & 1
+            if right_at_notch or (i >= first and at_notch):
+                positions[i] = (position + 1) % 256
+            right_at_notch = at_notch
+
+    def phase_periods(self, rotors: Sequence[Rotor]) -> List[int]:
+        # With three or more rotors the leftmost rotor's notch has no pawl to
+        # its left to push, and nothing looks at its position
+        first = self.first_double_stepping(len(rotors))
+        return [1] * first + [rotor.notch_period() for rotor in rotors[first:]]
+
+    def quiet_steps(self, positions: List[int], rotors: Sequence[Rotor], limit: int) -> int:
+        # A rotor that double-steps and rests on its notch moves on the next
+        # character
+        for i in range(self.first_double_stepping(len(positions)), len(positions) - 1):
+            if (rotors[i].notch_bitmap >> positions[i]) & 1:
+                return 0
+        if len(positions) == 1:
+            return limit
+        distance = rotors[-1].distance_to_notch(positions[-1])
+        return limit if distance is None else min(distance, limit)
+
+
+class ControlRotorStepping(SteppingStrategy):
+    """
+    Irregular stepping driven by a control rotor.
+
+    The control rotor steps on every character. Every other rotor steps when
+    the bit of the control rotor's wiring output that belongs to it is set,
+    so the stepping pattern depends on the key rather than on fixed notches.
+    """
+
+    def __init__(self, control: int = 0):
+        """
+        Args:
+            control: Index of the control rotor (default: leftmost)
+        """
+        self.control = control
+
+    @property
+    def every_char(self) -> int:
+        return self.control
+
+    def advance(self, positions: List[int], rotors: Sequence[Rotor]) -> None:
+        control = self.control % len(positions)
+        control_position = positions[control]
+        pattern = rotors[control].wiring[control_position]
+        for i in range(len(positions)):
+            if i != control and (pattern >> (i % 8)) & 1:
+                positions[i] = (positions[i] + 1) % 256
+        positions[control] = (control_position + 1) % 256
+
+    def phase_periods(self, rotors: Sequence[Rotor]) -> List[int]:
+        # Only the control rotor's position matters, through the bits of its
+        # wiring output that some rotor listens to
+        control = self.control % len(rotors)
+        mask = 0
+        for i in range(len(rotors)):
+            if i != control:
+                mask |= 1 << (i % 8)
+        pattern = [value & mask for value in rotors[control].wiring]
+        period = 1
+        while period < 256 and pattern != pattern[period:] + pattern[:period]:
+            period *= 2
+        periods = [1] * len(rotors)
+        periods[control] = period
+        return periods
+
+    def to_dict(self) -> dict:
+        return {'type': type(self).__name__, 'control': self.control}
+
+    def __str__(self) -> str:
+        return f"ControlRotorStepping(control={self.control})"
+
+
+STEPPING_STRATEGIES = {cls.__name__: cls for cls in
+                       (OdometerStepping, EnigmaStepping, ControlRotorStepping)}
+
+
+def stepping_from_dict(description: dict) -> SteppingStrategy:
+    """Rebuild a stepping strategy from its to_dict() description."""
+    options = dict(description)
+    name = options.pop('type', None)
+    if name not in STEPPING_STRATEGIES:
+        raise ValueError(f"Unknown stepping strategy: {name}")
+    return STEPPING_STRATEGIES[name](**options)
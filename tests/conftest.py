@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# The modules live at the top level of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Don't pick up engine calibration results stored by the user
+os.environ.setdefault('ROTOR_MACHINE_CALIBRATION',
+                      os.path.join(tempfile.mkdtemp(prefix='rotor-tests-'), 'calibration.json'))
+# Qt tests run without a display
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
@@ -0,0 +1,48 @@
+import copy
+import os
+import pytest
+from armor import (ARMORS, ArmorDecoder, armor_stream, decrypt_text, encrypt_text,
+                   unarmor_stream)
+from machine import RotorMachine
+
+
+def pieces(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('armor', list(ARMORS))
+@pytest.mark.parametrize('line_length', [None, 1, 7, 76])
+def test_stream_round_trip(armor, line_length):
+    data = os.urandom(1001)
+    whole = b''.join(armor_stream([data], armor, line_length))
+    assert b''.join(armor_stream(pieces(data, 13), armor, line_length)) == whole
+    assert b''.join(unarmor_stream(pieces(whole, 11), armor)) == data
+    assert b''.join(unarmor_stream([whole.decode('ascii')], armor)) == data
+
+
+@pytest.mark.parametrize('armor', list(ARMORS))
+# None of these characters is in any of the alphabets
+@pytest.mark.parametrize('garbage', ['....', '[[]]', ',:,:', 'éééé'])
+def test_invalid_armor_is_rejected(armor, garbage):
+    decoder = ArmorDecoder(armor)
+    with pytest.raises(ValueError):
+        decoder.update(garbage * 4)
+        decoder.finish()
+
+
+def test_base64_rejects_characters_inside_valid_text():
+    text = b''.join(armor_stream([os.urandom(30)], 'base64'))
+    with pytest.raises(ValueError):
+        b''.join(unarmor_stream([text[:8] + b'*' + text[8:]], 'base64'))
+
+
+@pytest.mark.parametrize('armor', list(ARMORS))
+def test_text_round_trip(armor):
+    text = 'Grüße, 世界! 😀 ' * 50
+    machine = RotorMachine(3)
+    start = machine.get_rotor_positions()
+    armored = encrypt_text(copy.deepcopy(machine), text, armor)
+    assert armored.isascii()
+    assert decrypt_text(copy.deepcopy(machine), armored, armor) == text
+    machine.set_rotor_positions(start)
+    assert decrypt_text(machine, armored, armor, chunk_size=5) == text
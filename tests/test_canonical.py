@@ -0,0 +1,39 @@
+import os
+import random
+import pytest
+from canonical import canonicalize, class_count, class_size, dedupe, representative
+from machine import RotorMachine
+from stepping import ControlRotorStepping, EnigmaStepping, OdometerStepping
+
+
+@pytest.mark.parametrize('stepping', [EnigmaStepping(), OdometerStepping(), ControlRotorStepping()])
+@pytest.mark.parametrize('num_rotors', [2, 3])
+def test_members_behave_like_their_representative(stepping, num_rotors):
+    machine = RotorMachine(num_rotors, stepping=stepping)
+    machine.rotors[-1].set_notches(range(0, 256, 64))
+    data = os.urandom(3000)
+    for _ in range(10):
+        positions = [random.randrange(256) for _ in range(num_rotors)]
+        rings = [random.randrange(256) for _ in range(num_rotors)]
+        setting = canonicalize(positions, rings, machine.rotors, stepping)
+        results = []
+        for p, r in ((positions, rings), representative(setting)):
+            machine.set_ring_settings(r)
+            machine.set_rotor_positions(p)
+            out = machine.process_bytes(data)
+            results.append((out, [(a - b) % 256 for a, b in zip(machine.get_rotor_positions(), p)]))
+        assert results[0] == results[1]
+        assert canonicalize(*representative(setting), machine.rotors, stepping) == setting
+
+
+def test_class_sizes_cover_the_space():
+    machine = RotorMachine(3)
+    size = class_size(machine.rotors, machine.stepping)
+    assert size * class_count(machine.rotors, machine.stepping) == 256 ** 6
+
+
+def test_dedupe_keeps_one_per_class():
+    machine = RotorMachine(1, stepping=OdometerStepping())
+    # With one rotor only the shift matters
+    configurations = [([p], [(p - 5) % 256]) for p in range(256)]
+    assert len(dedupe(configurations, machine.rotors, machine.stepping)) == 1
@@ -0,0 +1,60 @@
+import copy
+import os
+import pytest
+from chunked import decrypt_chunked, decrypt_chunks, encrypt_chunked, iter_chunks, verify_chunked
+from machine import RotorMachine
+from stepping import ControlRotorStepping
+
+
+@pytest.fixture
+def key():
+    return RotorMachine(3, stepping=ControlRotorStepping())
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_round_trip_and_end_state(key, workers):
+    data = os.urandom(20000)
+    machine, reference = copy.deepcopy(key), copy.deepcopy(key)
+    stream = encrypt_chunked(machine, data, chunk_size=3000, workers=workers)
+    reference.process_bytes(data)
+    assert machine.get_rotor_positions() == reference.get_rotor_positions()
+    assert decrypt_chunked(key, stream, workers=workers) == (data, [])
+
+
+def test_empty_input(key):
+    stream = encrypt_chunked(copy.deepcopy(key), b'', chunk_size=100, workers=1)
+    assert decrypt_chunked(key, stream, workers=1) == (b'', [])
+    assert decrypt_chunked(key, b'', workers=1) == (b'', [0])
+
+
+def test_damage_stays_in_its_chunk(key):
+    data = os.urandom(10000)
+    stream = bytearray(encrypt_chunked(copy.deepcopy(key), data, chunk_size=1000, workers=1))
+    chunks = list(iter_chunks(bytes(stream)))
+    stream[chunks[3].offset + 100] ^= 1   # Header of chunk 3
+    stream[chunks[6].offset + 60] ^= 1    # Ciphertext of chunk 6
+    plaintext, damaged = decrypt_chunked(key, bytes(stream), workers=1)
+    assert damaged == [3, 6]
+    assert plaintext == data[:3000] + data[4000:6000] + data[7000:]
+    assert dict(verify_chunked(bytes(stream), workers=1))[6] is False
+
+
+@pytest.mark.parametrize('cut', ['boundary', 'inside'])
+def test_truncation_is_reported(key, cut):
+    data = os.urandom(10000)
+    stream = encrypt_chunked(copy.deepcopy(key), data, chunk_size=1000, workers=1)
+    offset = list(iter_chunks(stream))[7].offset
+    end = offset if cut == 'boundary' else offset + 50
+    plaintext, damaged = decrypt_chunked(key, stream[:end], workers=1)
+    assert damaged == [7, 8, 9]
+    assert plaintext == data[:7000]
+
+
+def test_decrypt_chunks_reports_each_chunk(key):
+    data = os.urandom(2500)
+    stream = encrypt_chunked(copy.deepcopy(key), data, chunk_size=1000, workers=1)
+    assert [chunk.index for chunk in iter_chunks(stream)] == [0, 1, 2]
+    results = list(decrypt_chunks(key, stream, workers=1))
+    assert [result.index for result in results] == [0, 1, 2]
+    assert b''.join(result.data for result in results) == data
+    assert verify_chunked(stream, workers=1) == [(0, True), (1, True), (2, True)]
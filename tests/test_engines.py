@@ -0,0 +1,70 @@
+import copy
+import os
+import pytest
+import engines
+from engines import ENGINES, EngineDispatcher, available_engines, encrypt_python
+from machine import RotorMachine
+from stepping import ControlRotorStepping, EnigmaStepping, OdometerStepping
+
+STEPPINGS = [EnigmaStepping, OdometerStepping, ControlRotorStepping]
+
+
+def make_machine(num_rotors, stepping):
+    machine = RotorMachine(num_rotors, stepping=stepping())
+    machine.set_rotor_positions([(37 * i + 250) % 256 for i in range(num_rotors)])
+    machine.set_ring_settings([(11 * i) % 256 for i in range(num_rotors)])
+    machine.set_plugboard([(1, 2), (65, 97)])
+    machine.rotors[-1].set_notches([3, 130])
+    return machine
+
+
+@pytest.mark.parametrize('engine', [name for name in available_engines() if name != 'parallel'])
+@pytest.mark.parametrize('stepping', STEPPINGS)
+@pytest.mark.parametrize('num_rotors', [1, 2, 3, 5])
+def test_engine_matches_reference(engine, stepping, num_rotors):
+    data = os.urandom(3000)
+    reference = make_machine(num_rotors, stepping)
+    machine = copy.deepcopy(reference)
+    expected = encrypt_python(reference, data)
+    assert ENGINES[engine](machine, data) == expected
+    assert machine.get_rotor_positions() == reference.get_rotor_positions()
+
+
+def test_parallel_engine_matches_reference():
+    data = os.urandom(2 * engines.MIN_PARALLEL_PART + 123)
+    reference = make_machine(3, EnigmaStepping)
+    machine = copy.deepcopy(reference)
+    expected = encrypt_python(reference, data)
+    assert engines.encrypt_parallel(machine, data, workers=2) == expected
+    assert machine.get_rotor_positions() == reference.get_rotor_positions()
+
+
+def test_engines_round_trip():
+    data = os.urandom(1000)
+    machine = make_machine(3, EnigmaStepping)
+    start = machine.get_rotor_positions()
+    ciphertext = machine.process_bytes(data)
+    machine.set_rotor_positions(start)
+    assert machine.process_bytes(ciphertext) == data
+
+
+def test_dispatcher_does_not_calibrate_unasked(tmp_path, monkeypatch):
+    monkeypatch.delenv('ROTOR_MACHINE_CALIBRATE', raising=False)
+    dispatcher = EngineDispatcher(str(tmp_path / 'calibration.json'))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("calibrated without being asked")
+
+    monkeypatch.setattr(dispatcher, 'calibrate', fail)
+    machine = make_machine(3, EnigmaStepping)
+    machine.dispatcher = dispatcher
+    machine.process_bytes(os.urandom(10 * engines.MIN_PARALLEL_PART))
+    assert machine.last_engine != 'parallel'
+    assert not os.listdir(tmp_path)
+
+
+def test_dispatcher_uses_stored_calibration(tmp_path):
+    path = str(tmp_path / 'calibration.json')
+    calibrated = EngineDispatcher(path).calibrate(small=16, large=1024)
+    assert EngineDispatcher(path).load() == calibrated
+    assert EngineDispatcher(path, auto_calibrate=False).choose(100, 3) in available_engines()
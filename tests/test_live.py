@@ -0,0 +1,87 @@
+import copy
+import pytest
+from live import LiveEncryptor, code_point_index, utf16_length
+from machine import RotorMachine
+
+
+def fresh(machine, start_positions, text):
+    reference = copy.deepcopy(machine)
+    reference.set_rotor_positions(start_positions)
+    return reference.process_text(text)
+
+
+@pytest.fixture
+def machine():
+    machine = RotorMachine(3)
+    machine.set_rotor_positions([10, 200, 37])
+    return machine
+
+
+def test_utf16_positions():
+    text = 'a😀b'
+    assert utf16_length(text) == 4
+    assert [code_point_index(text, p) for p in range(5)] == [0, 1, 1, 2, 3]
+    assert code_point_index('abc', 10) == 3
+
+
+def test_typing_matches_full_encryption(machine):
+    live = LiveEncryptor(machine, interval=16)
+    start = live.start_positions
+    text = ''
+    for char in 'The quick brown fox jumps over the lazy dog. ' * 4:
+        text += char
+        live.update(text, len(text) - 1)
+    assert live.output == fresh(machine, start, text)
+
+
+@pytest.mark.parametrize('change_start', [None, 0, 5, 100, 1000])
+def test_edit_in_the_middle(machine, change_start):
+    live = LiveEncryptor(machine, interval=8)
+    start = live.start_positions
+    live.update('x' * 200)
+    text = 'x' * 100 + 'yz' + 'x' * 120
+    known = change_start if change_start is None or change_start <= 100 else None
+    live.update(text, known)
+    assert live.output == fresh(machine, start, text)
+
+
+def test_edit_after_astral_characters(machine):
+    # Qt reports edit positions in UTF-16 code units; each emoji takes two
+    live = LiveEncryptor(machine, interval=64)
+    start = live.start_positions
+    live.update('😀' * 300 + 'a' * 300)
+    text = '😀' * 300 + 'a' * 150 + 'b' + 'a' * 149
+    position = 2 * 300 + 150
+    live.update(text, code_point_index(text, position))
+    assert live.output == fresh(machine, start, text)
+
+
+def test_gui_live_mode_with_astral_characters():
+    QtWidgets = pytest.importorskip('PyQt5.QtWidgets')
+    from PyQt5.QtGui import QTextCursor
+    from gui_window import RotorMachineGUI
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    window = RotorMachineGUI()
+    try:
+        window.live_btn.setChecked(True)
+        start = window.live.start_positions
+        window.input_text.setPlainText('😀' * 300 + 'a' * 300)
+
+        cursor = QTextCursor(window.input_text.document())
+        cursor.setPosition(2 * 300 + 150)
+        cursor.setPosition(2 * 300 + 151, QTextCursor.KeepAnchor)
+        cursor.insertText('b')
+
+        text = window.input_text.toPlainText()
+        assert text == '😀' * 300 + 'a' * 150 + 'b' + 'a' * 149
+        expected = fresh(window.machine, start, text)
+        assert window.live.output == expected
+        # The pane normalises some control characters, as it would for a full refresh
+        reference = QtWidgets.QTextEdit()
+        reference.setPlainText(expected)
+        assert window.output_text.toPlainText() == reference.toPlainText()
+    finally:
+        window.close()
+        window.deleteLater()
+        app.processEvents()
@@ -0,0 +1,112 @@
+import asyncio
+import copy
+import json
+import os
+import pytest
+from engines import encrypt_python
+from machine import RotorMachine
+from stepping import ControlRotorStepping, OdometerStepping
+
+
+def test_bulk_matches_per_character_encryption():
+    machine = RotorMachine(3)
+    reference = copy.deepcopy(machine)
+    data = os.urandom(2000)
+    assert machine.process_bytes(data) == encrypt_python(reference, data)
+    assert machine.get_rotor_positions() == reference.get_rotor_positions()
+
+
+def test_round_trip_and_text():
+    machine = RotorMachine(4, stepping=OdometerStepping())
+    machine.set_plugboard([(1, 2), ('a', 'b')])
+    start = machine.get_rotor_positions()
+    text = 'Hello, wörld 😀 ' * 20
+    encrypted = machine.process_text(text)
+    assert '😀' in encrypted
+    machine.set_rotor_positions(start)
+    assert machine.process_text(encrypted) == text
+
+
+def test_memoryview_input():
+    machine = RotorMachine(3)
+    reference = copy.deepcopy(machine)
+    data = bytearray(os.urandom(300))
+    machine.start_state_log()
+    machine.start_trace(every=7)
+    assert machine.process_bytes(memoryview(data)) == reference.process_bytes(bytes(data))
+
+
+@pytest.mark.parametrize('stepping', [None, ControlRotorStepping(2)])
+def test_key_export_round_trip(stepping):
+    machine = RotorMachine(3, stepping=stepping)
+    machine.set_plugboard([(3, 4)])
+    machine.set_ring_settings([1, 2, 3])
+    machine.rotors[1].set_notches([10, 20])
+    copy_ = RotorMachine.from_key(json.loads(json.dumps(machine.export_key())))
+    assert copy_.key_fingerprint() == machine.key_fingerprint()
+    assert copy_.get_rotor_positions() == machine.get_rotor_positions()
+    data = os.urandom(500)
+    assert copy_.process_bytes(data) == machine.process_bytes(data)
+
+
+def test_seeded_keys_are_reproducible():
+    first = RotorMachine.from_seed(b'seed', 3)
+    second = RotorMachine.from_key(RotorMachine.seeded_key(b'seed', 3))
+    assert first.key_fingerprint() == second.key_fingerprint()
+    assert RotorMachine.from_seed(b'other', 3).key_fingerprint() != first.key_fingerprint()
+
+
+def test_advance_matches_processing():
+    machine = RotorMachine(3, stepping=ControlRotorStepping())
+    reference = copy.deepcopy(machine)
+    machine.advance(12345)
+    reference.process_bytes(bytes(12345))
+    assert machine.get_rotor_positions() == reference.get_rotor_positions()
+
+
+def test_trace_records_signal_paths():
+    machine = RotorMachine(3)
+    reference = copy.deepcopy(machine)
+    buffer = machine.start_trace(every=10)
+    data = os.urandom(100)
+    out = machine.process_bytes(data)
+    records = list(buffer.records())
+    assert [record.index for record in records] == list(range(0, 100, 10))
+    for record in records:
+        assert record.char == data[record.index]
+        assert record.path[-1] == out[record.index]
+        assert reference.signal_path(record.char, record.positions) == record.path
+
+
+def chunks_of(data, size):
+    async def generate():
+        for i in range(0, len(data), size):
+            yield data[i:i + size]
+    return generate()
+
+
+def test_aencrypt_matches_process_bytes():
+    machine = RotorMachine(3)
+    reference = copy.deepcopy(machine)
+    data = os.urandom(5000)
+
+    async def run():
+        return b''.join([chunk async for chunk in machine.aencrypt(chunks_of(data, 333))])
+
+    assert asyncio.run(run()) == reference.process_bytes(data)
+    assert machine.get_rotor_positions() == reference.get_rotor_positions()
+
+
+def test_aencrypt_closed_early_leaves_no_task_behind():
+    machine = RotorMachine(3)
+
+    async def run():
+        stream = machine.aencrypt(chunks_of(bytes(10000), 10), max_in_flight=2)
+        async for _ in stream:
+            await asyncio.sleep(0.01)
+            break
+        await stream.aclose()
+        await asyncio.sleep(0.01)
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
@@ -0,0 +1,43 @@
+import copy
+import os
+import pytest
+from machine import RotorMachine
+from multikey import KeyStack, evaluate, np
+from stepping import ControlRotorStepping, EnigmaStepping, OdometerStepping
+
+PATHS = [False] + ([True] if np is not None else [])
+
+
+def machines(count, num_rotors, stepping):
+    result = []
+    for k in range(count):
+        machine = RotorMachine.from_seed(f'test-{k}'.encode(), num_rotors, stepping)
+        machine.rotors[-1].set_notches([k % 256, (k + 100) % 256])
+        machine.set_rotor_positions([(k * 7 + i * 50) % 256 for i in range(num_rotors)])
+        result.append(machine)
+    return result
+
+
+@pytest.mark.parametrize('use_numpy', PATHS)
+@pytest.mark.parametrize('stepping', [EnigmaStepping(), OdometerStepping(), ControlRotorStepping(1)])
+@pytest.mark.parametrize('num_rotors', [1, 2, 3, 4])
+def test_evaluate_matches_each_machine(use_numpy, stepping, num_rotors):
+    keys = machines(12, num_rotors, stepping)
+    data = os.urandom(700)
+    stack = KeyStack.from_machines(keys)
+    expected = [copy.deepcopy(machine).process_bytes(data) for machine in keys]
+    assert evaluate(stack, data, workers=1, use_numpy=use_numpy) == expected
+
+
+def test_stack_round_trips_machines():
+    keys = machines(3, 3, EnigmaStepping())
+    stack = KeyStack.from_machines(keys)
+    data = os.urandom(100)
+    for index, machine in enumerate(keys):
+        assert stack.machine(index).process_bytes(data) == copy.deepcopy(machine).process_bytes(data)
+    assert len(stack.slice(1, 3)) == 2
+
+
+def test_mixed_steppings_are_refused():
+    with pytest.raises(ValueError):
+        KeyStack.from_machines([RotorMachine(3), RotorMachine(3, stepping=OdometerStepping())])
@@ -0,0 +1,33 @@
+import copy
+import io
+import os
+import pytest
+from machine import RotorMachine
+from pipeline import ThreadedRunner, encryption_pipeline
+
+
+@pytest.mark.parametrize('compression', [None, 'zlib', 'lzma'])
+@pytest.mark.parametrize('threaded', [False, True])
+def test_round_trip(compression, threaded):
+    data = os.urandom(50000) + bytes(50000)
+    key = RotorMachine(3)
+    encrypt = encryption_pipeline(copy.deepcopy(key), compression)
+    encrypted, decrypted = io.BytesIO(), io.BytesIO()
+    if threaded:
+        encrypt.run_threaded(io.BytesIO(data), encrypted, buffer_size=4096)
+    else:
+        encrypt.run(io.BytesIO(data), encrypted, chunk_size=4096)
+    assert encryption_pipeline(copy.deepcopy(key), compression).process(data) == encrypted.getvalue()
+    if compression is None:
+        assert encrypted.getvalue() == copy.deepcopy(key).process_bytes(data)
+    decrypt = encryption_pipeline(copy.deepcopy(key), compression).inverse()
+    decrypt.run(io.BytesIO(encrypted.getvalue()), decrypted, chunk_size=1000)
+    assert decrypted.getvalue() == data
+
+
+def test_threaded_runner_output_survives_buffer_reuse():
+    # An identity transform returns views of the reused read buffers
+    data = os.urandom(100000)
+    sink = io.BytesIO()
+    ThreadedRunner(lambda chunk: chunk, buffer_count=2, buffer_size=1000).run(io.BytesIO(data), sink)
+    assert sink.getvalue() == data
@@ -0,0 +1,30 @@
+import copy
+import pytest
+from machine import RotorMachine
+from position_index import PositionIndex, build_index
+
+
+@pytest.mark.parametrize('max_records', [1 << 20, 5000])
+def test_recovers_start_positions(tmp_path, max_records):
+    machine = RotorMachine(2)
+    machine.set_plugboard([(1, 2)])
+    path = str(tmp_path / 'index.rpi')
+    with build_index(machine, path, key_bytes=3, max_records=max_records) as index:
+        assert len(index) == 256 ** 2
+        for positions in ([0, 0], [17, 200], [255, 255]):
+            session = copy.deepcopy(machine)
+            session.set_rotor_positions(positions)
+            output = session.process_bytes(index.probe)
+            assert positions in index.recover(machine, output)
+
+    with PositionIndex(path) as reopened:
+        assert reopened.fingerprint == machine.key_fingerprint()
+        with pytest.raises(ValueError):
+            reopened.recover(RotorMachine(2), output)
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'junk'
+    path.write_bytes(b'x' * 200)
+    with pytest.raises(ValueError):
+        PositionIndex(str(path))
@@ -0,0 +1,81 @@
+import copy
+import os
+import pytest
+from machine import RotorMachine
+from result_cache import EncryptionCache
+from stepping import ControlRotorStepping
+
+
+def reference(machine, data):
+    plain = copy.deepcopy(machine)
+    plain.cache = None
+    return plain.process_bytes(data), plain.get_rotor_positions()
+
+
+@pytest.mark.parametrize('stepping', [None, ControlRotorStepping()])
+def test_hits_match_uncached_results(stepping):
+    machine = RotorMachine(3, stepping=stepping)
+    machine.cache = EncryptionCache()
+    data = os.urandom(500)
+    start = machine.get_rotor_positions()
+    for _ in range(3):
+        machine.set_rotor_positions(start)
+        expected = reference(machine, data)
+        assert machine.process_bytes(data) == expected[0]
+        assert machine.get_rotor_positions() == expected[1]
+    assert machine.cache.hits == 2 and machine.last_engine == 'cache'
+
+
+@pytest.mark.parametrize('change', [
+    lambda m: m.set_plugboard([(1, 2)]),
+    lambda m: m.rotors[0].set_notches([5, 6]),
+    lambda m: m.set_ring_settings([9, 9, 9]),
+    lambda m: m.rotors.__setitem__(1, copy.deepcopy(RotorMachine(1).rotors[0])),
+])
+def test_key_changes_are_not_served_stale_results(change):
+    machine = RotorMachine(3)
+    machine.cache = EncryptionCache()
+    data = os.urandom(300)
+    start = machine.get_rotor_positions()
+    machine.process_bytes(data)
+    fingerprint = machine.key_fingerprint()
+    change(machine)
+    assert machine.key_fingerprint() != fingerprint
+    machine.set_rotor_positions(start)
+    expected = reference(machine, data)
+    assert machine.process_bytes(data) == expected[0]
+    assert machine.get_rotor_positions() == expected[1]
+
+
+def test_spilled_entries_survive_a_restart(tmp_path):
+    machine = RotorMachine(3)
+    machine.cache = EncryptionCache(max_bytes=0, spill_dir=str(tmp_path))
+    data = os.urandom(1000)
+    start = machine.get_rotor_positions()
+    expected = machine.process_bytes(data)
+    machine.cache = EncryptionCache(max_bytes=0, spill_dir=str(tmp_path))
+    machine.set_rotor_positions(start)
+    assert machine.process_bytes(data) == expected
+    assert machine.cache.spill_hits == 1
+
+
+def test_damaged_spill_file_is_a_miss(tmp_path):
+    machine = RotorMachine(3)
+    machine.cache = EncryptionCache(max_bytes=0, spill_dir=str(tmp_path))
+    data = os.urandom(1000)
+    start = machine.get_rotor_positions()
+    expected = machine.process_bytes(data)
+    (path,) = tmp_path.iterdir()
+    path.write_bytes(path.read_bytes()[:-10])
+
+    machine.set_rotor_positions(start)
+    assert machine.process_bytes(data) == expected
+    assert machine.cache.misses == 2 and machine.cache.hits == 0
+
+
+def test_spill_bound_is_enforced(tmp_path):
+    cache = EncryptionCache(max_bytes=0, spill_dir=str(tmp_path), max_spill_bytes=2500)
+    for i in range(5):
+        cache.put(EncryptionCache.key('00', [[i]], b'x'), os.urandom(1000), [1, 2, 3])
+    assert cache.snapshot()['spilled_bytes'] <= 2500
+    assert len(os.listdir(tmp_path)) == 2
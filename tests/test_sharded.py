@@ -0,0 +1,71 @@
+import copy
+import io
+import os
+import socket
+import struct
+import subprocess
+import sys
+import pytest
+from machine import RotorMachine
+from sharded import LocalCluster, ShardCoordinator, recv_message, send_message
+from stepping import ControlRotorStepping
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def cluster():
+    with LocalCluster(2) as cluster:
+        yield cluster
+
+
+@pytest.mark.parametrize('stepping', [None, ControlRotorStepping(1)])
+def test_matches_local_encryption(cluster, stepping):
+    machine = RotorMachine(3, stepping=stepping)
+    machine.set_plugboard([(1, 2)])
+    reference = copy.deepcopy(machine)
+    data = os.urandom(100_000)
+    coordinator = ShardCoordinator(cluster.addresses, shard_size=7_000)
+    assert coordinator.encrypt(machine, data) == reference.process_bytes(data)
+    assert machine.get_rotor_positions() == reference.get_rotor_positions()
+
+
+def test_file_round_trip(cluster):
+    machine = RotorMachine(3)
+    start = machine.get_rotor_positions()
+    data = os.urandom(50_000)
+    coordinator = ShardCoordinator(cluster.addresses, shard_size=6_000)
+    encrypted, decrypted = io.BytesIO(), io.BytesIO()
+    coordinator.encrypt_file(machine, io.BytesIO(data), encrypted)
+    machine.set_rotor_positions(start)
+    coordinator.decrypt_file(machine, encrypted, decrypted)
+    assert decrypted.getvalue() == data
+
+
+@pytest.mark.parametrize('header', [b'not json', b'[1, 2]', b'{"length": -1}',
+                                    b'{"length": "x"}', b'\xff\xfe'])
+def test_malformed_header_drops_only_that_connection(cluster, header):
+    with socket.create_connection(cluster.addresses[0], timeout=10) as conn:
+        conn.sendall(struct.pack('>I', len(header)) + header)
+        assert conn.recv(16) == b''
+    with socket.create_connection(cluster.addresses[0], timeout=10) as conn:
+        send_message(conn, {'shard': 0, 'positions': [0]})
+        reply, _ = recv_message(conn)
+        assert reply['ok'] is False
+
+
+def test_stalled_connection_does_not_block_others(cluster):
+    with socket.create_connection(cluster.addresses[0], timeout=10) as stalled:
+        stalled.sendall(struct.pack('>I', 100))  # A header that never arrives
+        machine = RotorMachine(3)
+        reference = copy.deepcopy(machine)
+        data = os.urandom(20_000)
+        coordinator = ShardCoordinator(cluster.addresses[:1], shard_size=5_000, timeout=10)
+        assert coordinator.encrypt(machine, data) == reference.process_bytes(data)
+
+
+def test_cli_refuses_non_loopback_without_flag():
+    result = subprocess.run([sys.executable, os.path.join(ROOT, 'sharded.py'), 'worker',
+                             '--host', '0.0.0.0', '--port', '0'],
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode != 0 and '--allow-remote' in result.stderr
@@ -0,0 +1,42 @@
+import copy
+import os
+import pickle
+import random
+import pytest
+import engines
+from machine import RotorMachine
+from stepping import ControlRotorStepping, EnigmaStepping
+
+
+@pytest.mark.parametrize('stepping', [EnigmaStepping(), ControlRotorStepping()])
+@pytest.mark.parametrize('interval', [1, 100])
+def test_positions_match_stepping(stepping, interval):
+    machine = RotorMachine(4, stepping)
+    reference = copy.deepcopy(machine)
+    log = machine.start_state_log(interval)
+    data = os.urandom(3000)
+    out = b''.join(machine.process_bytes(data[i:i + 700]) for i in range(0, len(data), 700))
+    assert len(log) == len(data)
+    for k in random.sample(range(len(data)), 100):
+        replay = copy.deepcopy(reference)
+        replay.advance(k + 1)
+        assert log.positions_at(k) == replay.get_rotor_positions()
+        assert log.byte_at(k) == data[k]
+        assert replay.signal_path(data[k])[-1] == out[k]
+
+
+def test_copies_do_not_carry_the_log():
+    machine = RotorMachine(3)
+    machine.start_state_log()
+    machine.process_bytes(b'abc')
+    assert copy.deepcopy(machine).state_log is None
+    assert pickle.loads(pickle.dumps(machine)).state_log is None
+    assert len(machine.state_log) == 3
+
+
+def test_parallel_engine_records_once():
+    machine = RotorMachine(3)
+    log = machine.start_state_log()
+    data = os.urandom(2 * engines.MIN_PARALLEL_PART)
+    machine.process_bytes(data, engine='parallel')
+    assert len(log) == len(data)
@@ -0,0 +1,74 @@
+import random
+import pytest
+from machine import RotorMachine
+from rotor import Rotor
+from stepping import ControlRotorStepping, EnigmaStepping, OdometerStepping
+
+
+def original_enigma_step(positions, notches):
+    """The three-rotor pawl mechanism the machine started out with."""
+    positions = list(positions)
+    carry = positions[-1] == notches[-1]
+    positions[-1] = (positions[-1] + 1) % 256
+    if len(positions) > 1:
+        if positions[-2] == notches[-2]:
+            carry = True
+        if carry:
+            carry = positions[-2] == notches[-2]
+            positions[-2] = (positions[-2] + 1) % 256
+            if len(positions) > 2 and carry:
+                positions[-3] = (positions[-3] + 1) % 256
+    return positions
+
+
+@pytest.mark.parametrize('num_rotors', [1, 2, 3])
+def test_enigma_matches_original_stepping(num_rotors):
+    rng = random.Random(num_rotors)
+    rotors = [Rotor(notch=rng.randrange(256)) for _ in range(num_rotors)]
+    notches = [rotor.notch for rotor in rotors]
+    stepping = EnigmaStepping()
+    for _ in range(20):
+        positions = [rng.choice([n, (n - 1) % 256, rng.randrange(256)]) for n in notches]
+        expected = list(positions)
+        for _ in range(600):
+            expected = original_enigma_step(expected, notches)
+            stepping.advance(positions, rotors)
+            assert positions == expected
+
+
+@pytest.mark.parametrize('stepping', [EnigmaStepping(), OdometerStepping(),
+                                      ControlRotorStepping(), ControlRotorStepping(1)])
+@pytest.mark.parametrize('num_rotors', [1, 2, 3, 4])
+def test_jump_and_schedule_match_advance(stepping, num_rotors):
+    machine = RotorMachine(num_rotors, stepping=stepping)
+    machine.rotors[-1].set_notches([0, 77, 200])
+    rotors = machine.rotors
+    start = [random.randrange(256) for _ in range(num_rotors)]
+    stepped = list(start)
+    rows = []
+    for _ in range(5000):
+        stepping.advance(stepped, rotors)
+        rows.extend(stepped)
+    jumped = list(start)
+    stepping.jump(jumped, rotors, 5000)
+    assert jumped == stepped
+    machine.set_rotor_positions(start)
+    assert machine.step_schedule(5000) == bytearray(rows)
+
+
+@pytest.mark.parametrize('stepping', [EnigmaStepping(), OdometerStepping(), ControlRotorStepping()])
+@pytest.mark.parametrize('num_rotors', [2, 3])
+def test_phase_periods_give_equal_stepping(stepping, num_rotors):
+    machine = RotorMachine(num_rotors, stepping=stepping)
+    rotors = machine.rotors
+    periods = stepping.phase_periods(rotors)
+    for _ in range(20):
+        positions = [random.randrange(256) for _ in range(num_rotors)]
+        shifted = [(p + period * random.randrange(256 // period)) % 256
+                   for p, period in zip(positions, periods)]
+        a, b = list(positions), list(shifted)
+        for _ in range(2000):
+            stepping.advance(a, rotors)
+            stepping.advance(b, rotors)
+            assert [(x - y) % 256 for x, y in zip(a, b)] == \
+                   [(x - y) % 256 for x, y in zip(positions, shifted)]